@@ -66,20 +66,28 @@ def __init__(self):
 
         # handlers is a dictionary of lists {"alert_type": [handler1,h2,..]}
         self.handlers = {}
+        # batch_handlers is a dictionary of lists of the handlers that are
+        # called with all of the alerts of a type popped in an update
+        self.batch_handlers = {}
 
-        self.delayed_calls = []
+        # The number of alerts popped in the last update, the most popped in
+        # an update and in total
+        self.queue_size = 0
+        self.max_queue_size = 0
+        self.num_alerts = 0
+
+        # The call dispatching the alerts popped in the last update
+        self.dispatch_call = None
 
     def update(self):
-        self.delayed_calls = [dc for dc in self.delayed_calls if dc.active()]
         self.handle_alerts()
 
     def stop(self):
-        for dc in self.delayed_calls:
-            if dc.active():
-                dc.cancel()
-        self.delayed_calls = []
+        if self.dispatch_call and self.dispatch_call.active():
+            self.dispatch_call.cancel()
+        self.dispatch_call = None
 
-    def register_handler(self, alert_type, handler):
+    def register_handler(self, alert_type, handler, batch=False):
         """
         Registers a function that will be called when 'alert_type' is pop'd
         in handle_alerts.  The handler function should look like: handler(alert)
@@ -87,14 +95,21 @@ def register_handler(self, alert_type, handler):
 
         :param alert_type: str, this is string representation of the alert name
         :param handler: func(alert), the function to be called when the alert is raised
+        :param batch: bool, if True the handler is called once with the list
+            of the 'alert_type' alerts popped together, handler(alerts), after
+            the handlers of single alerts
         """
-        if alert_type not in self.handlers:
+        if batch:
+            handlers = self.batch_handlers
+        else:
+            handlers = self.handlers
+        if alert_type not in handlers:
             # There is no entry for this alert type yet, so lets make it with an
             # empty list.
-            self.handlers[alert_type] = []
+            handlers[alert_type] = []
 
         # Append the handler to the list in the handlers dictionary
-        self.handlers[alert_type].append(handler)
+        handlers[alert_type].append(handler)
         log.debug("Registered handler for alert %s", alert_type)
 
     def deregister_handler(self, handler):
@@ -104,31 +119,82 @@ def deregister_handler(self, handler):
         :param handler: func, the handler function to deregister
         """
         # Iterate through all handlers and remove 'handler' where found
-        for (key, value) in self.handlers.items():
-            if handler in value:
-                # Handler is in this alert type list
-                value.remove(handler)
+        for handlers in (self.handlers, self.batch_handlers):
+            for (key, value) in handlers.items():
+                if handler in value:
+                    # Handler is in this alert type list
+                    value.remove(handler)
+
+    def get_stats(self):
+        """
+        Returns the size of the alert queue.
+
+        :returns: the number of alerts popped in the last update, the most
+            popped in an update and the total number of alerts popped
+        :rtype: dict
+        """
+        return {
+            "queue_size": self.queue_size,
+            "max_queue_size": self.max_queue_size,
+            "num_alerts": self.num_alerts
+        }
 
     def handle_alerts(self, wait=False):
         """
         Pops all libtorrent alerts in the session queue and handles them
-        appropriately.
+        appropriately.  The alerts are dispatched to the handlers together in
+        a single call, see :meth:`dispatch_alerts`.
 
         :param wait: bool, if True then the handler functions will be run right
-            away and waited to return before processing the next alert
+            away and waited to return
         """
+        alerts = []
         alert = self.session.pop_alert()
-        # Loop through all alerts in the queue
         while alert is not None:
+            alerts.append(alert)
+            alert = self.session.pop_alert()
+
+        self.queue_size = len(alerts)
+        if not alerts:
+            return
+        self.max_queue_size = max(self.max_queue_size, self.queue_size)
+        self.num_alerts += self.queue_size
+
+        if wait:
+            self.dispatch_alerts(alerts)
+        else:
+            self.dispatch_call = reactor.callLater(0, self.dispatch_alerts, alerts)
+
+    def dispatch_alerts(self, alerts):
+        """
+        Calls the handlers of single alerts in the order the alerts were
+        popped, then the batch handlers with the alerts grouped by type.
+
+        :param alerts: the alerts popped from the session
+        :type alerts: list
+        """
+        debug = log.isEnabledFor(logging.DEBUG)
+        # {alert_type: [alerts]}, only for the types with batch handlers
+        batches = {}
+        # Loop through all alerts in the queue
+        for alert in alerts:
             alert_type = type(alert).__name__
             # Display the alert message
-            log.debug("%s: %s", alert_type, alert.message())
+            if debug:
+                log.debug("%s: %s", alert_type, alert.message())
             # Call any handlers for this alert type
             if alert_type in self.handlers:
                 for handler in self.handlers[alert_type]:
-                    if not wait:
-                        self.delayed_calls.append(reactor.callLater(0, handler, alert))
-                    else:
-                        handler(alert)
-
-            alert = self.session.pop_alert()
+                    self.call_handler(handler, alert)
+            if alert_type in self.batch_handlers:
+                batches.setdefault(alert_type, []).append(alert)
+
+        for alert_type, alerts in batches.iteritems():
+            for handler in self.batch_handlers[alert_type]:
+                self.call_handler(handler, alerts)
+
+    def call_handler(self, handler, alert):
+        try:
+            handler(alert)
+        except Exception, e:
+            log.exception(e)
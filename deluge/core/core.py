@@ -57,6 +57,7 @@
 from deluge.core.authmanager import AUTH_LEVEL_ADMIN, AUTH_LEVEL_NONE
 from deluge.core.authmanager import AUTH_LEVELS_MAPPING, AUTH_LEVELS_MAPPING_REVERSE
 from deluge.core.torrentmanager import TorrentManager
+from deluge.core.torrent import STATUS_FUNCS
 from deluge.core.pluginmanager import PluginManager
 from deluge.core.alertmanager import AlertManager
 from deluge.core.filtermanager import FilterManager
@@ -427,20 +428,70 @@ def resume_torrent(self, torrent_ids):
         for torrent_id in torrent_ids:
             self.torrentmanager[torrent_id].resume()
 
+    def separate_keys(self, keys):
+        """
+        Splits the status keys into the keys provided by the torrents and the
+        keys that need to be filled in by plugins.
+
+        :param keys: the status keys
+        :type keys: list
+        :returns: (torrent_keys, plugin_keys)
+        :rtype: tuple
+
+        """
+        torrent_keys = []
+        plugin_keys = []
+        for key in keys:
+            if key in STATUS_FUNCS:
+                torrent_keys.append(key)
+            else:
+                plugin_keys.append(key)
+        return torrent_keys, plugin_keys
+
+    def create_torrents_status(self, torrent_ids, keys, diff=False):
+        """
+        Builds the status dicts for several torrents in a single pass.  The
+        keys are only split once and the plugin status functions are only
+        looked up once for the whole list of torrents.
+
+        :returns: a dictionary of {torrent_id: status_dict, ...}
+        :rtype: dict
+
+        """
+        torrent_keys, plugin_keys = self.separate_keys(keys)
+        plugin_funcs = self.pluginmanager.get_status_funcs(plugin_keys)
+        torrents = self.torrentmanager.torrents
+
+        status_dict = {}
+        for torrent_id in torrent_ids:
+            try:
+                torrent = torrents[torrent_id]
+            except KeyError:
+                # Torrent was probaly removed meanwhile
+                status_dict[torrent_id] = {}
+                continue
+
+            if keys and not torrent_keys:
+                # Only plugin keys were asked for
+                status = {}
+            else:
+                status = torrent.get_status(torrent_keys, diff)
+
+            # Ask the plugins to fill in their fields
+            for field, func in plugin_funcs:
+                try:
+                    status[field] = func(torrent_id)
+                except KeyError:
+                    pass
+
+            status_dict[torrent_id] = status
+
+        return status_dict
+
     @export
     def get_torrent_status(self, torrent_id, keys, diff=False):
         # Build the status dictionary
-        try:
-            status = self.torrentmanager[torrent_id].get_status(keys, diff)
-        except KeyError:
-            # Torrent was probaly removed meanwhile
-            return {}
-
-        # Get the leftover fields and ask the plugin manager to fill them
-        leftover_fields = list(set(keys) - set(status.keys()))
-        if len(leftover_fields) > 0:
-            status.update(self.pluginmanager.get_status(torrent_id, leftover_fields))
-        return status
+        return self.create_torrents_status([torrent_id], keys, diff)[torrent_id]
 
     @export
     def get_torrents_status(self, filter_dict, keys, diff=False):
@@ -448,13 +499,7 @@ def get_torrents_status(self, filter_dict, keys, diff=False):
         returns all torrents , optionally filtered by filter_dict.
         """
         torrent_ids = self.filtermanager.filter_torrent_ids(filter_dict)
-        status_dict = {}.fromkeys(torrent_ids)
-
-        # Get the torrent status for each torrent_id
-        for torrent_id in torrent_ids:
-            status_dict[torrent_id] = self.get_torrent_status(torrent_id, keys, diff)
-
-        return status_dict
+        return self.create_torrents_status(torrent_ids, keys, diff)
 
     @export
     def get_filter_tree(self , show_zero_hits=True, hide_cat=None):
@@ -470,6 +515,18 @@ def get_session_state(self):
         # Get the torrent list from the TorrentManager
         return self.torrentmanager.get_torrent_list()
 
+    @export
+    def get_session_load_progress(self):
+        """
+        Returns the progress of loading the torrents from the state when the
+        daemon is started.
+
+        :returns: the number of torrents loaded and the number to load
+        :rtype: tuple
+
+        """
+        return self.torrentmanager.get_load_progress()
+
     @export
     def get_config(self):
         """Get all the preferences as a dictionary"""
@@ -550,7 +607,9 @@ def set_torrent_options(self, torrent_ids, options):
     @export
     def set_torrent_trackers(self, torrent_id, trackers):
         """Sets a torrents tracker list.  trackers will be [{"url", "tier"}]"""
-        return self.torrentmanager[torrent_id].set_trackers(trackers)
+        result = self.torrentmanager[torrent_id].set_trackers(trackers)
+        self.filtermanager.update_torrent(torrent_id, ["tracker_host"])
+        return result
 
     @export
     def set_torrent_max_connections(self, torrent_id, value):
@@ -634,6 +693,7 @@ def set_torrents_owner(self, torrent_ids, username):
             torrent_ids = [torrent_ids]
         for torrent_id in torrent_ids:
             self.torrentmanager[torrent_id].set_owner(username)
+            self.filtermanager.update_torrent(torrent_id, ["owner"])
         return None
 
     @export
@@ -41,6 +41,7 @@
 import deluge.configmanager
 import deluge.common
 from deluge.core.rpcserver import RPCServer, export
+from deluge.core.authmanager import AUTH_LEVEL_ADMIN
 import deluge.error
 
 log = logging.getLogger(__name__)
@@ -141,6 +142,9 @@ def win_handler(ctrl_type):
             interface=interface
         )
 
+        if options and options.perf_stats:
+            self.rpcserver.set_perf_stats_dump(os.path.abspath(options.perf_stats))
+
         # Register the daemon and the core RPCs
         self.rpcserver.register_object(self.core)
         self.rpcserver.register_object(self)
@@ -184,6 +188,24 @@ def get_method_list(self):
         """
         return self.rpcserver.get_method_list()
 
+    @export(AUTH_LEVEL_ADMIN)
+    def get_perf_stats(self, reset=False):
+        """
+        Returns the performance stats of the daemon: the calls, latencies and
+        response sizes of each rpc, the compression of the sent messages, the
+        reactor lag and the alert queue stats.
+
+        :param reset: if True, the rpc counters are cleared afterwards
+        :type reset: bool
+
+        :returns: the stats
+        :rtype: dict
+
+        """
+        stats = self.rpcserver.get_perf_stats(reset)
+        stats["alerts"] = component.get("AlertManager").get_stats()
+        return stats
+
     @export(1)
     def authorized_call(self, rpc):
         """
@@ -99,28 +99,13 @@ def filter_by_name(torrent_ids, search_string):
         if search_string in torrent_name:
             yield torrent_id
 
-def tracker_error_filter(torrent_ids, values):
-    filtered_torrent_ids = []
-    tm = component.get("TorrentManager")
-
-    # If this is a tracker_host, then we need to filter on it
-    if values[0] != "Error":
-        for torrent_id in torrent_ids:
-            if values[0] == tm[torrent_id].get_status(["tracker_host"])["tracker_host"]:
-                filtered_torrent_ids.append(torrent_id)
-        return filtered_torrent_ids
-
-    # Check all the torrent's tracker_status for 'Error:' and only return torrent_ids
-    # that have this substring in their tracker_status
-    for torrent_id in torrent_ids:
-        if _("Error") + ":" in tm[torrent_id].get_status(["tracker_status"])["tracker_status"]:
-            filtered_torrent_ids.append(torrent_id)
-
-    return filtered_torrent_ids
-
 class FilterManager(component.Component):
     """FilterManager
 
+    Keeps inverted indexes of the tree fields, {field: {value: set(torrent_ids)}},
+    so that the filter tree and filtering on these fields don't need to get
+    the status of every torrent in the session.  The indexes are updated on
+    torrent added, removed and state changed events and on tracker alerts.
     """
     def __init__(self, core):
         component.Component.__init__(self, "FilterManager")
@@ -132,17 +117,38 @@ def __init__(self, core):
         self.register_filter("name", filter_by_name)
         self.tree_fields = {}
 
+        # {field: {value: set(torrent_ids)}}
+        self.tree_index = {}
+        # {field: {torrent_id: value}}
+        self.tree_values = {}
+        # The torrents with a tracker error in their tracker status
+        self.tracker_error_ids = set()
+
         self.register_tree_field("state", self._init_state_tree)
         def _init_tracker_tree():
             return {"Error": 0}
         self.register_tree_field("tracker_host", _init_tracker_tree)
 
-        self.register_filter("tracker_host", tracker_error_filter)
+        self.register_filter("tracker_host", self.filter_tracker_host)
 
         def _init_users_tree():
             return {"": 0}
         self.register_tree_field("owner", _init_users_tree)
 
+        event_manager = component.get("EventManager")
+        event_manager.register_event_handler("TorrentAddedEvent",
+                                             self.on_torrent_added)
+        event_manager.register_event_handler("TorrentRemovedEvent",
+                                             self.on_torrent_removed)
+        event_manager.register_event_handler("TorrentStateChangedEvent",
+                                             self.on_torrent_state_changed)
+
+        alert_manager = component.get("AlertManager")
+        for alert_type in ("tracker_reply_alert", "tracker_announce_alert",
+                           "tracker_warning_alert", "tracker_error_alert"):
+            alert_manager.register_handler(alert_type, self.on_alerts_tracker,
+                                           batch=True)
+
     def filter_torrent_ids(self, filter_dict):
         """
         returns a list of torrent_id's matching filter_dict.
@@ -186,20 +192,28 @@ def filter_torrent_ids(self, filter_dict):
                 torrent_ids = list(set(self.registered_filters[field](torrent_ids, values)))
                 del filter_dict[field]
 
+        if not filter_dict: #return if there's  nothing more to filter
+            return torrent_ids
+
+        #Indexed fields:
+        for field, values in filter_dict.items():
+            if field in self.tree_index:
+                torrent_ids = list(self._get_indexed_ids(field, values).intersection(torrent_ids))
+                del filter_dict[field]
 
         if not filter_dict: #return if there's  nothing more to filter
             return torrent_ids
 
         #leftover filter arguments:
         #default filter on status fields.
-        status_func = self.core.get_torrent_status #premature optimalisation..
-        for torrent_id in list(torrent_ids):
-            status = status_func(torrent_id, filter_dict.keys()) #status={key:value}
+        status = self.core.create_torrents_status(torrent_ids, filter_dict.keys())
+        def matches(torrent_status):
             for field, values in filter_dict.iteritems():
-                if (not status[field] in values) and torrent_id in torrent_ids:
-                    torrent_ids.remove(torrent_id)
+                if torrent_status.get(field) not in values:
+                    return False
+            return True
 
-        return torrent_ids
+        return [torrent_id for torrent_id in torrent_ids if matches(status[torrent_id])]
 
     def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
         """
@@ -207,7 +221,6 @@ def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
         for use in sidebar.
         """
         torrent_ids = self.torrents.get_torrent_list()
-        status_func = self.core.get_torrent_status #premature optimalisation..
         tree_keys = list(self.tree_fields.keys())
         if hide_cat:
             for cat in hide_cat:
@@ -215,16 +228,25 @@ def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
 
         items = dict( (field, self.tree_fields[field]()) for field in tree_keys)
 
+        # Only count the torrents this session can see
+        if len(torrent_ids) == len(self.torrents.torrents):
+            visible_ids = None
+        else:
+            visible_ids = set(torrent_ids)
+
         #count status fields.
-        for torrent_id in list(torrent_ids):
-            status = status_func(torrent_id, tree_keys) #status={key:value}
-            for field in tree_keys:
-                value = status[field]
-                items[field][value] = items[field].get(value, 0) + 1
+        for field in tree_keys:
+            for value, value_ids in self.tree_index[field].iteritems():
+                if visible_ids is None:
+                    count = len(value_ids)
+                else:
+                    count = len(visible_ids.intersection(value_ids))
+                if count:
+                    items[field][value] = items[field].get(value, 0) + count
 
         if "tracker_host" in items:
             items["tracker_host"]["All"] = len(torrent_ids)
-            items["tracker_host"]["Error"] = len(tracker_error_filter(torrent_ids, ("Error",)))
+            items["tracker_host"]["Error"] = len(self.filter_tracker_host(torrent_ids, ("Error",)))
 
         if "state" in tree_keys and not show_zero_hits:
             self._hide_state_items(items["state"])
@@ -257,22 +279,127 @@ def deregister_filter(self, id):
         del self.registered_filters[id]
 
     def register_tree_field(self, field, init_func = lambda : {}):
+        """
+        Registers a field to be shown in the filter tree.  The field is indexed,
+        so whoever provides the field's status value needs to call
+        update_torrent() when it changes outside of the torrent added and state
+        changed events and the tracker alerts.
+        """
         self.tree_fields[field] = init_func
+        self.tree_index[field] = {}
+        self.tree_values[field] = {}
+        torrent_ids = self.torrents.torrents.keys()
+        status = self.core.create_torrents_status(torrent_ids, [field])
+        for torrent_id in torrent_ids:
+            self._update_index(torrent_id, field, status[torrent_id])
 
     def deregister_tree_field(self, field):
         if field in self.tree_fields:
             del self.tree_fields[field]
+            del self.tree_index[field]
+            del self.tree_values[field]
 
-    def filter_state_active(self, torrent_ids):
-        get_status = self.core.get_torrent_status
-        for torrent_id in list(torrent_ids):
-            status = get_status(torrent_id, ["download_payload_rate", "upload_payload_rate"])
-            if status["download_payload_rate"] or status["upload_payload_rate"]:
-                pass #ok
-            else:
-                torrent_ids.remove(torrent_id)
+    def update_torrent(self, torrent_id, fields=None):
+        """
+        Updates the indexes of a torrent.
+
+        :param torrent_id: the torrent to update
+        :type torrent_id: string
+        :param fields: the tree fields to update, all if None
+        :type fields: list
+
+        """
+        if fields is None:
+            fields = self.tree_index.keys()
+        else:
+            fields = [field for field in fields if field in self.tree_index]
+
+        status = self.core.create_torrents_status([torrent_id], fields)[torrent_id]
+        for field in fields:
+            self._update_index(torrent_id, field, status)
+
+    def _update_index(self, torrent_id, field, status):
+        """Moves torrent_id to the bucket of its new value for field"""
+        index = self.tree_index[field]
+        values = self.tree_values[field]
+        if torrent_id in values:
+            old_value = values[torrent_id]
+            if field in status and status[field] == old_value:
+                return
+            del values[torrent_id]
+            value_ids = index[old_value]
+            value_ids.discard(torrent_id)
+            if not value_ids:
+                del index[old_value]
+
+        if field in status:
+            value = status[field]
+            values[torrent_id] = value
+            index.setdefault(value, set()).add(torrent_id)
+
+    def _remove_from_index(self, torrent_id):
+        for field, values in self.tree_values.iteritems():
+            if torrent_id in values:
+                value = values.pop(torrent_id)
+                value_ids = self.tree_index[field][value]
+                value_ids.discard(torrent_id)
+                if not value_ids:
+                    del self.tree_index[field][value]
+        self.tracker_error_ids.discard(torrent_id)
+
+    def _get_indexed_ids(self, field, values):
+        """Returns the set of torrent_ids with any of values for field"""
+        torrent_ids = set()
+        for value in values:
+            torrent_ids.update(self.tree_index[field].get(value, ()))
         return torrent_ids
 
+    ## Event and alert handlers ##
+    def on_torrent_added(self, torrent_id, from_state):
+        self.update_torrent(torrent_id)
+
+    def on_torrent_removed(self, torrent_id):
+        self._remove_from_index(torrent_id)
+
+    def on_torrent_state_changed(self, torrent_id, state):
+        if torrent_id in self.torrents.torrents:
+            self._update_index(torrent_id, "state", {"state": state})
+
+    def on_alerts_tracker(self, alerts):
+        # A torrent usually has several tracker alerts in a batch, only its
+        # latest tracker status matters
+        for torrent_id in set(str(alert.handle.info_hash()) for alert in alerts):
+            try:
+                torrent = self.torrents[torrent_id]
+            except KeyError:
+                continue
+
+            self.update_torrent(torrent_id, ["tracker_host"])
+            if _("Error") + ":" in torrent.tracker_status:
+                self.tracker_error_ids.add(torrent_id)
+            else:
+                self.tracker_error_ids.discard(torrent_id)
+
+    def filter_tracker_host(self, torrent_ids, values):
+        # If this is a tracker_host, then we need to filter on it
+        if values[0] != "Error":
+            return list(self._get_indexed_ids("tracker_host", values[:1]).intersection(torrent_ids))
+
+        # Only return the torrent_ids that have 'Error:' in their tracker_status
+        return list(self.tracker_error_ids.intersection(torrent_ids))
+
+    def filter_state_active(self, torrent_ids):
+        # Paused and queued torrents are not transferring
+        inactive_ids = self._get_indexed_ids("state", ("Paused", "Queued"))
+        torrent_ids = [torrent_id for torrent_id in torrent_ids
+                       if torrent_id not in inactive_ids]
+
+        status = self.core.create_torrents_status(torrent_ids,
+            ["download_payload_rate", "upload_payload_rate"])
+        return [torrent_id for torrent_id in torrent_ids
+                if status[torrent_id].get("download_payload_rate") or
+                status[torrent_id].get("upload_payload_rate")]
+
     def _hide_state_items(self, state_items):
         "for hide(show)-zero hits"
         for (value, count)  in state_items.items():
@@ -0,0 +1,198 @@
+#
+# journal.py
+#
+# Copyright (C) 2011 Deluge Team
+#
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+# 	The Free Software Foundation, Inc.,
+# 	51 Franklin Street, Fifth Floor
+# 	Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+#
+
+"""
+The Journal stores {key: value} records in an append only file.  Saving only
+appends the records that changed and the file is compacted once it holds a lot
+more records than there are live keys.  All of the file writes are done in a
+thread so they don't block the reactor.
+"""
+
+import os
+import struct
+import shutil
+import cPickle
+import logging
+
+from twisted.internet import threads
+from twisted.internet.defer import DeferredLock
+
+log = logging.getLogger(__name__)
+
+MAGIC = "DELUGEJ"
+VERSION = 1
+HEADER = MAGIC + chr(VERSION)
+RECORD_HEADER = struct.Struct(">I")
+
+class JournalError(Exception):
+    pass
+
+class Journal(object):
+    """
+    An append only store of {key: value} records.  A record with a None value
+    deletes the key.  The values need to be picklable and should be built out
+    of the builtin types so the journal does not depend on any classes.
+
+    :param path: the journal file path
+    :type path: string
+    :param compact_ratio: compact the file when it holds more than this many
+        records per live key
+    :type compact_ratio: int
+
+    """
+    def __init__(self, path, compact_ratio=3):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        # The number of records in the file
+        self.num_records = 0
+        # The size of the valid part of the file, anything after it is the
+        # remains of an interrupted write
+        self.size = 0
+        self.lock = DeferredLock()
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def load(self):
+        """
+        Reads the journal file.
+
+        :returns: the records in the file, {key: value}
+        :rtype: dict
+
+        :raises JournalError: if the file is not a journal or is of an
+            unknown version
+        :raises IOError: if the file could not be read
+
+        """
+        data = open(self.path, "rb").read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise JournalError("%s is not a journal file" % self.path)
+        if data[len(MAGIC):len(HEADER)] != chr(VERSION):
+            raise JournalError("Unknown journal version in %s" % self.path)
+
+        records = {}
+        num_records = 0
+        offset = len(HEADER)
+        while offset + RECORD_HEADER.size <= len(data):
+            length, = RECORD_HEADER.unpack_from(data, offset)
+            end = offset + RECORD_HEADER.size + length
+            if end > len(data):
+                break
+            try:
+                key, value = cPickle.loads(data[offset + RECORD_HEADER.size:end])
+            except Exception, e:
+                log.warning("Bad record in %s: %s", self.path, e)
+                break
+            if value is None:
+                records.pop(key, None)
+            else:
+                records[key] = value
+            num_records += 1
+            offset = end
+
+        if offset != len(data):
+            log.warning("Ignoring %d bytes of an interrupted write in %s",
+                        len(data) - offset, self.path)
+
+        self.num_records = num_records
+        self.size = offset
+        return records
+
+    def save(self, changes, values):
+        """
+        Writes the changed records to the journal in a thread.
+
+        :param changes: the changed records, {key: value}, a None value
+            deletes the key
+        :type changes: dict
+        :param values: all of the live records after the changes, these are
+            used if the file needs to be compacted.  Neither dict must be
+            modified afterwards, put new values in a new dict.
+        :type values: dict
+
+        :returns: a Deferred fired once the records are written
+        :rtype: twisted.internet.defer.Deferred
+
+        """
+        return self.lock.run(threads.deferToThread, self._write, changes, values)
+
+    def _write(self, changes, values):
+        if not changes and self.size:
+            return
+
+        if not self.size or self.num_records + len(changes) > \
+                self.compact_ratio * len(values) + 100:
+            self._write_compacted(values)
+            return
+
+        journal = open(self.path, "r+b")
+        try:
+            # Drop any remains of an interrupted write
+            journal.truncate(self.size)
+            journal.seek(self.size)
+            journal.write(self._dump_records(changes.iteritems()))
+            journal.flush()
+            os.fsync(journal.fileno())
+            self.size = journal.tell()
+        finally:
+            journal.close()
+        self.num_records += len(changes)
+
+    def _write_compacted(self, values):
+        log.debug("Compacting journal %s", self.path)
+        new_path = self.path + ".new"
+        journal = open(new_path, "wb")
+        try:
+            journal.write(HEADER)
+            journal.write(self._dump_records(values.iteritems()))
+            journal.flush()
+            os.fsync(journal.fileno())
+            size = journal.tell()
+        finally:
+            journal.close()
+
+        shutil.move(new_path, self.path)
+        self.num_records = len(values)
+        self.size = size
+
+    def _dump_records(self, records):
+        data = []
+        for record in records:
+            record = cPickle.dumps(record, cPickle.HIGHEST_PROTOCOL)
+            data.append(RECORD_HEADER.pack(len(record)))
+            data.append(record)
+        return "".join(data)
@@ -73,7 +73,9 @@ def __init__(self):
         self.config = ConfigManager("core.conf")
         self.state05_location = os.path.join(get_config_dir(), "persistent.state")
         self.state10_location = os.path.join(get_config_dir(), "state", "torrents.state")
-        if os.path.exists(self.state05_location) and not os.path.exists(self.state10_location):
+        self.journal_location = os.path.join(get_config_dir(), "state", "torrents.state.journal")
+        if os.path.exists(self.state05_location) and not os.path.exists(self.state10_location) \
+                and not os.path.exists(self.journal_location):
             # If the 0.5 state file exists and the 1.0 doesn't, then let's upgrade it
             self.upgrade05()
 
@@ -0,0 +1,232 @@
+#
+# perfstats.py
+#
+# Copyright (C) 2011 Deluge Team
+#
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+# 	The Free Software Foundation, Inc.,
+# 	51 Franklin Street, Fifth Floor
+# 	Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+#
+"""
+PerfStats keeps the counters used to find out which RPCs are slow or heavy:
+the calls, latencies and response sizes of each exported method, how well
+the sent messages compress and how late the reactor runs its timed calls.
+"""
+
+import os
+import time
+import shutil
+import bisect
+import logging
+
+from twisted.internet.task import LoopingCall
+
+from deluge.common import json
+
+log = logging.getLogger(__name__)
+
+# The upper bounds in seconds of the latency histogram buckets, the last
+# bucket holds everything slower
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+# How often the reactor lag is sampled, in seconds
+LAG_SAMPLE_INTERVAL = 0.5
+# How often the stats are dumped to the dump file, in seconds
+DUMP_INTERVAL = 60
+
+class Histogram(object):
+    """Counts the values falling in each of the LATENCY_BUCKETS"""
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def get_stats(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "average": self.count and self.total / self.count,
+            "max": self.max,
+            "histogram": list(self.counts)
+        }
+
+class MethodStats(object):
+    """The stats of a single exported method"""
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        # The time spent in the method itself
+        self.sync_time = Histogram()
+        # The time until the response was sent, including the time waiting
+        # for a returned Deferred
+        self.time = Histogram()
+        self.response_bytes = 0
+        self.max_response_bytes = 0
+
+    def get_stats(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "sync_time": self.sync_time.get_stats(),
+            "time": self.time.get_stats(),
+            "response_bytes": self.response_bytes,
+            "max_response_bytes": self.max_response_bytes
+        }
+
+class PerfStats(object):
+    """
+    The performance counters of the RPCServer.
+
+    :param dump_path: if set, the stats are written to this file as json
+        every DUMP_INTERVAL seconds while started
+    :type dump_path: string
+
+    """
+    def __init__(self, dump_path=None):
+        self.dump_path = dump_path
+        self.reset()
+        self.lag_timer = LoopingCall(self.sample_lag)
+        self.dump_timer = LoopingCall(self.dump)
+        self.last_sample = None
+
+    def reset(self):
+        """Clears all of the counters"""
+        self.start_time = time.time()
+        self.methods = {}
+        self.payload_bytes = 0
+        self.frame_bytes = 0
+        self.frames = 0
+        self.reactor_lag = Histogram()
+
+    def start(self):
+        """Starts sampling the reactor lag and dumping the stats"""
+        if not self.lag_timer.running:
+            self.last_sample = time.time()
+            self.lag_timer.start(LAG_SAMPLE_INTERVAL, now=False)
+        if self.dump_path and not self.dump_timer.running:
+            self.dump_timer.start(DUMP_INTERVAL, now=False)
+
+    def stop(self):
+        if self.lag_timer.running:
+            self.lag_timer.stop()
+        if self.dump_timer.running:
+            self.dump_timer.stop()
+            self.dump()
+
+    def sample_lag(self):
+        """Records how much later than asked for the reactor ran this call"""
+        now = time.time()
+        self.reactor_lag.add(max(0.0, now - self.last_sample - LAG_SAMPLE_INTERVAL))
+        self.last_sample = now
+
+    def record_call(self, method, start, sync_end, end=None, response_bytes=0,
+                    error=False):
+        """
+        Records a finished call of an exported method.
+
+        :param method: the name of the method, eg, "core.get_torrents_status"
+        :type method: string
+        :param start: when the method was called
+        :type start: float
+        :param sync_end: when the method returned
+        :type sync_end: float
+        :param end: when the response was sent, defaults to `sync_end`
+        :type end: float
+        :param response_bytes: the size of the serialized response
+        :type response_bytes: int
+        :param error: True if the method failed
+        :type error: bool
+
+        """
+        stats = self.methods.get(method)
+        if stats is None:
+            stats = self.methods[method] = MethodStats()
+        stats.calls += 1
+        if error:
+            stats.errors += 1
+        stats.sync_time.add(sync_end - start)
+        stats.time.add((end or sync_end) - start)
+        stats.response_bytes += response_bytes
+        if response_bytes > stats.max_response_bytes:
+            stats.max_response_bytes = response_bytes
+
+    def record_frame(self, payload_bytes, frame_bytes):
+        """
+        Records the size of a sent message before and after being framed.
+
+        :param payload_bytes: the size of the serialized message
+        :type payload_bytes: int
+        :param frame_bytes: the size of the framed, maybe compressed, message
+        :type frame_bytes: int
+
+        """
+        self.frames += 1
+        self.payload_bytes += payload_bytes
+        self.frame_bytes += frame_bytes
+
+    def get_stats(self):
+        """
+        Returns the stats collected since the start or the last reset.
+
+        :returns: the stats, the histograms count the values in each of the
+            "latency_buckets"
+        :rtype: dict
+
+        """
+        return {
+            "time": time.time() - self.start_time,
+            "latency_buckets": list(LATENCY_BUCKETS),
+            "methods": dict((method, stats.get_stats())
+                            for method, stats in self.methods.iteritems()),
+            "frames": self.frames,
+            "payload_bytes": self.payload_bytes,
+            "frame_bytes": self.frame_bytes,
+            "compression_ratio": self.payload_bytes and
+                float(self.frame_bytes) / self.payload_bytes,
+            "reactor_lag": self.reactor_lag.get_stats()
+        }
+
+    def dump(self):
+        """Writes the stats to the dump file"""
+        try:
+            fd = open(self.dump_path + ".new", "wb")
+            json.dump(self.get_stats(), fd, indent=2, sort_keys=True)
+            fd.flush()
+            os.fsync(fd.fileno())
+            fd.close()
+            shutil.move(self.dump_path + ".new", self.dump_path)
+        except (IOError, OSError), e:
+            log.warning("Unable to dump the perf stats to %s: %s", self.dump_path, e)
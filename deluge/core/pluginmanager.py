@@ -92,13 +92,20 @@ def disable_plugin(self, name):
     def get_status(self, torrent_id, fields):
         """Return the value of status fields for the selected torrent_id."""
         status = {}
-        for field in fields:
+        for field, func in self.get_status_funcs(fields):
             try:
-                status[field] = self.status_fields[field](torrent_id)
+                status[field] = func(torrent_id)
             except KeyError:
                 pass
         return status
 
+    def get_status_funcs(self, fields):
+        """Return a list of (field, function) pairs for the registered fields
+        in fields.  This allows looking up the functions once when getting the
+        status of several torrents."""
+        return [(field, self.status_fields[field]) for field in fields
+                if field in self.status_fields]
+
     def register_status_field(self, field, function):
         """Register a new status field.  This can be used in the same way the
         client requests other status information from core."""
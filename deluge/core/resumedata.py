@@ -0,0 +1,172 @@
+#
+# resumedata.py
+#
+# Copyright (C) 2011 Deluge Team
+#
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+# 	The Free Software Foundation, Inc.,
+# 	51 Franklin Street, Fifth Floor
+# 	Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+#
+
+"""
+The ResumeDataStore keeps the torrents fastresume data in shard files, one for
+each hash prefix of the torrent ids.  Only the shards of the torrents whose
+resume data changed are written, in the reactor's thread pool, and shards are
+only read when one of their torrents is asked for.
+"""
+
+import os
+import shutil
+import logging
+
+from twisted.internet import threads
+from twisted.internet.defer import DeferredList, DeferredLock
+
+from deluge.bencode import bencode, bdecode
+
+log = logging.getLogger(__name__)
+
+# The number of hex characters of the torrent id used for the shard name, this
+# gives 256 shards
+PREFIX_LENGTH = 2
+
+class ResumeDataStore(object):
+    """
+    Stores the bencoded resume data of each torrent in the shard
+    <prefix>.fastresume of its torrent id.
+
+    :param path: the directory the shards are stored in
+    :type path: string
+
+    """
+    def __init__(self, path):
+        self.path = path
+        # The shards read so far {prefix: {torrent_id: resume_data}}
+        self.cache = {}
+        # Serialises the writes of each shard {prefix: DeferredLock}
+        self.locks = {}
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def get_shard_path(self, prefix):
+        return os.path.join(self.path, prefix + ".fastresume")
+
+    def get(self, torrent_id, default=None):
+        """
+        Returns the resume data of a torrent, reading its shard if it hasn't
+        been read yet.
+
+        :param torrent_id: the torrent id
+        :type torrent_id: string
+
+        :returns: the bencoded resume data or `default`
+        :rtype: string
+
+        """
+        prefix = torrent_id[:PREFIX_LENGTH]
+        if prefix not in self.cache:
+            self.cache[prefix] = self.read_shard(prefix)
+        return self.cache[prefix].get(torrent_id, default)
+
+    def clear_cache(self):
+        """Drops the shards read by `get`, once the torrents have been added"""
+        self.cache = {}
+
+    def read_shard(self, prefix):
+        path = self.get_shard_path(prefix)
+        if not os.path.isfile(path):
+            return {}
+        try:
+            return bdecode(open(path, "rb").read())
+        except Exception, e:
+            log.warning("Unable to load fastresume shard %s: %s", path, e)
+            return {}
+
+    def save(self, changes):
+        """
+        Writes the changed resume data, each of the changed shards is written
+        in a thread.
+
+        :param changes: the changed resume data {torrent_id: resume_data}, a
+            None resume_data removes the torrent
+        :type changes: dict
+
+        :returns: a Deferred fired with the changes that could not be written
+        :rtype: twisted.internet.defer.Deferred
+
+        """
+        shards = {}
+        for torrent_id, resume_data in changes.iteritems():
+            shards.setdefault(torrent_id[:PREFIX_LENGTH], {})[torrent_id] = resume_data
+
+        if shards and not self.exists():
+            os.makedirs(self.path)
+
+        deferreds = []
+        for prefix, shard_changes in shards.iteritems():
+            lock = self.locks.setdefault(prefix, DeferredLock())
+            deferreds.append(lock.run(threads.deferToThread, self.write_shard,
+                                      prefix, shard_changes))
+
+        def on_written(results):
+            failed = {}
+            for (success, result), shard_changes in zip(results, shards.values()):
+                if not success:
+                    log.warning("Unable to save fastresume shard: %s",
+                                result.getErrorMessage())
+                    failed.update(shard_changes)
+            return failed
+
+        return DeferredList(deferreds, consumeErrors=True).addCallback(on_written)
+
+    def write_shard(self, prefix, changes):
+        """Applies the changes to a shard file, this is run in a thread"""
+        path = self.get_shard_path(prefix)
+        resume_data = self.read_shard(prefix)
+        for torrent_id, data in changes.iteritems():
+            if data is None:
+                resume_data.pop(torrent_id, None)
+            else:
+                resume_data[torrent_id] = data
+
+        if not resume_data:
+            if os.path.isfile(path):
+                os.remove(path)
+            return
+
+        new_path = path + ".new"
+        shard_file = open(new_path, "wb")
+        try:
+            shard_file.write(bencode(resume_data))
+            shard_file.flush()
+            os.fsync(shard_file.fileno())
+        finally:
+            shard_file.close()
+        shutil.move(new_path, path)
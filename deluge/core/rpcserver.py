@@ -36,6 +36,7 @@
 """RPCServer Module"""
 
 import sys
+import time
 import zlib
 import os
 import stat
@@ -60,7 +61,8 @@
 from deluge.error import (DelugeError, NotAuthorizedError, WrappedException,
                           _ClientSideRecreateError, IncompatibleClient)
 
-from deluge.transfer import DelugeTransferProtocol
+from deluge.transfer import DelugeTransferProtocol, COMPRESSION_THRESHOLD
+from deluge.core.perfstats import PerfStats
 
 RPC_RESPONSE = 1
 RPC_ERROR = 2
@@ -138,6 +140,12 @@ def getContext(self):
 
 class DelugeRPCProtocol(DelugeTransferProtocol):
 
+    def __init__(self):
+        DelugeTransferProtocol.__init__(self)
+        # The framed responses and events waiting to be sent at the end of
+        # this reactor tick
+        self.pending_frames = []
+
     def message_received(self, request):
         """
         This method is called whenever a message is received from a client.  The
@@ -167,14 +175,42 @@ def message_received(self, request):
 
     def sendData(self, data):
         """
-        Sends the data to the client.
+        Sends the data to the client.  The message is sent at the end of this
+        reactor tick, in a single write with the other responses and events.
 
         :param data: the object that is to be sent to the client.  This should
             be one of the RPC message types.
         :type data: object
 
+        :returns: the size of the serialized message
+        :rtype: int
+
+        """
+        payload = rencode.dumps(data)
+        frame = self.frame_message(payload)
+        self.factory.perf_stats.record_frame(len(payload), len(frame))
+        self.queue_frame(frame)
+        return len(payload)
+
+    def queue_frame(self, frame):
+        """
+        Queues a message to be sent at the end of this reactor tick, along with
+        the other messages sent in it.
+
+        :param frame: the message framed by :meth:`frame_message`
+        :type frame: string
+
         """
-        self.transfer_message(data)
+        if not self.pending_frames:
+            reactor.callLater(0, self.send_pending_frames)
+        self.pending_frames.append(frame)
+
+    def send_pending_frames(self):
+        """Sends the queued messages in a single write"""
+        if self.pending_frames:
+            frames = "".join(self.pending_frames)
+            self.pending_frames = []
+            self.transfer_frames(frames)
 
     def connectionMade(self):
         """
@@ -200,7 +236,9 @@ def connectionLost(self, reason):
         if self.transport.sessionno in self.factory.session_protocols:
             del self.factory.session_protocols[self.transport.sessionno]
         if self.transport.sessionno in self.factory.interested_events:
-            del self.factory.interested_events[self.transport.sessionno]
+            for event in self.factory.interested_events.pop(self.transport.sessionno):
+                self.factory.event_sessions[event].discard(self.transport.sessionno)
+        self.pending_frames = []
 
         log.info("Deluge client disconnected: %s", reason.value)
 
@@ -226,11 +264,12 @@ def dispatch(self, request_id, method, args, kwargs):
         def sendError():
             """
             Sends an error response with the contents of the exception that was raised.
+            Returns the size of the sent response.
             """
             exceptionType, exceptionValue, exceptionTraceback = sys.exc_info()
             formated_tb = "".join(traceback.format_tb(exceptionTraceback))
             try:
-                self.sendData((
+                return self.sendData((
                     RPC_ERROR,
                     request_id,
                     exceptionType.__name__,
@@ -247,7 +286,7 @@ def sendError():
                 try:
                     raise WrappedException(str(exceptionValue), exceptionType.__name__, formated_tb)
                 except:
-                    sendError()
+                    return sendError()
 
         if method == "daemon.info":
             # This is a special case and used in the initial connection process
@@ -261,6 +300,10 @@ def sendError():
                 client_version = kwargs.pop('client_version', None)
                 if client_version is None:
                     raise IncompatibleClient(deluge.common.get_version())
+                # Clients that send a compression policy accept raw payloads
+                compression = kwargs.pop('compression', None)
+                compression_threshold = kwargs.pop('compression_threshold',
+                                                   COMPRESSION_THRESHOLD)
                 ret = component.get("AuthManager").authorize(*args, **kwargs)
                 if ret:
                     self.factory.authorized_sessions[self.transport.sessionno] = (ret, args[0])
@@ -272,7 +315,13 @@ def sendError():
             else:
                 self.sendData((RPC_RESPONSE, request_id, (ret)))
                 if not ret:
+                    self.send_pending_frames()
                     self.transport.loseConnection()
+                elif compression:
+                    try:
+                        self.set_compression(compression, compression_threshold)
+                    except ValueError, e:
+                        log.warning("Client asked for an invalid compression: %s", e)
             finally:
                 return
         elif method == "daemon.set_event_interest" and self.valid_session():
@@ -284,6 +333,9 @@ def sendError():
                 if self.transport.sessionno not in self.factory.interested_events:
                     self.factory.interested_events[self.transport.sessionno] = []
                 self.factory.interested_events[self.transport.sessionno].extend(args[0])
+                for event in args[0]:
+                    self.factory.event_sessions.setdefault(event, set()).add(
+                        self.transport.sessionno)
             except Exception, e:
                 sendError()
             else:
@@ -293,6 +345,8 @@ def sendError():
 
         if method in self.factory.methods and self.valid_session():
             log.debug("RPC dispatch %s", method)
+            perf_stats = self.factory.perf_stats
+            start = time.time()
             try:
                 method_auth_requirement = self.factory.methods[method]._rpcserver_auth_level
                 auth_level = self.factory.authorized_sessions[self.transport.sessionno][0]
@@ -306,29 +360,39 @@ def sendError():
                 self.factory.session_id = self.transport.sessionno
                 ret = self.factory.methods[method](*args, **kwargs)
             except Exception, e:
-                sendError()
+                sync_end = time.time()
+                size = sendError()
+                perf_stats.record_call(method, start, sync_end,
+                                       response_bytes=size, error=True)
                 # Don't bother printing out DelugeErrors, because they are just
                 # for the client
                 if not isinstance(e, DelugeError):
                     log.exception("Exception calling RPC request: %s", e)
             else:
+                sync_end = time.time()
                 # Check if the return value is a deferred, since we'll need to
                 # wait for it to fire before sending the RPC_RESPONSE
                 if isinstance(ret, defer.Deferred):
                     def on_success(result):
-                        self.sendData((RPC_RESPONSE, request_id, result))
+                        size = self.sendData((RPC_RESPONSE, request_id, result))
+                        perf_stats.record_call(method, start, sync_end,
+                                               time.time(), size)
                         return result
 
                     def on_fail(failure):
                         try:
                             failure.raiseException()
                         except Exception, e:
-                            sendError()
+                            size = sendError()
+                        perf_stats.record_call(method, start, sync_end,
+                                               time.time(), size, error=True)
                         return failure
 
                     ret.addCallbacks(on_success, on_fail)
                 else:
-                    self.sendData((RPC_RESPONSE, request_id, ret))
+                    size = self.sendData((RPC_RESPONSE, request_id, ret))
+                    perf_stats.record_call(method, start, sync_end,
+                                           response_bytes=size)
 
 class RPCServer(component.Component):
     """
@@ -361,6 +425,10 @@ def __init__(self, port=58846, interface="", allow_remote=False, listen=True):
         self.factory.session_protocols = {}
         # Holds the interested event list for the sessions
         self.factory.interested_events = {}
+        # Holds the sessions interested in each event {event_name: set(session_ids)}
+        self.factory.event_sessions = {}
+        # Holds the performance counters
+        self.factory.perf_stats = PerfStats()
 
         self.listen = listen
         if not listen:
@@ -386,6 +454,12 @@ def __init__(self, port=58846, interface="", allow_remote=False, listen=True):
             log.error(e)
             sys.exit(0)
 
+    def start(self):
+        self.factory.perf_stats.start()
+
+    def stop(self):
+        self.factory.perf_stats.stop()
+
     def register_object(self, obj, name=None):
         """
         Registers an object to export it's rpc methods.  These methods should
@@ -431,6 +505,33 @@ def get_object_method(self, name):
         """
         return self.factory.methods[name]
 
+    def get_perf_stats(self, reset=False):
+        """
+        Returns the performance stats of the rpc server, see
+        :meth:`deluge.core.perfstats.PerfStats.get_stats`.
+
+        :param reset: if True, the counters are cleared afterwards
+        :type reset: bool
+
+        :returns: the stats
+        :rtype: dict
+
+        """
+        stats = self.factory.perf_stats.get_stats()
+        if reset:
+            self.factory.perf_stats.reset()
+        return stats
+
+    def set_perf_stats_dump(self, path):
+        """
+        Sets the file the performance stats are periodically dumped to.
+
+        :param path: the file to dump the stats to, None to not dump them
+        :type path: string
+
+        """
+        self.factory.perf_stats.dump_path = path
+
     def get_method_list(self):
         """
         Returns a list of the exported methods.
@@ -504,18 +605,32 @@ def emit_event(self, event):
         """
         Emits the event to interested clients.
 
+        The event is serialized once, and framed once for each compression
+        policy in use.  The events emitted in a reactor tick are sent to each
+        session in a single write.
+
         :param event: the event to emit
         :type event: :class:`deluge.event.DelugeEvent`
         """
-        log.debug("intevents: %s", self.factory.interested_events)
         # Find sessions interested in this event
-        for session_id, interest in self.factory.interested_events.iteritems():
-            if event.name in interest:
-                log.debug("Emit Event: %s %s", event.name, event.args)
-                # This session is interested so send a RPC_EVENT
-                self.factory.session_protocols[session_id].sendData(
-                    (RPC_EVENT, event.name, event.args)
-                )
+        session_ids = self.factory.event_sessions.get(event.name)
+        if not session_ids:
+            return
+
+        log.debug("Emit Event: %s %s", event.name, event.args)
+        payload = rencode.dumps((RPC_EVENT, event.name, event.args))
+        frames = {}
+        for session_id in session_ids:
+            protocol = self.factory.session_protocols.get(session_id)
+            if not protocol:
+                continue
+            compression = protocol.get_compression()
+            if compression not in frames:
+                frames[compression] = protocol.frame_message(payload)
+                self.factory.perf_stats.record_frame(len(payload),
+                                                     len(frames[compression]))
+            # This session is interested so send a RPC_EVENT
+            protocol.queue_frame(frames[compression])
 
     def emit_event_for_session_id(self, session_id, event):
         """
@@ -41,8 +41,8 @@
 from urllib import unquote
 from urlparse import urlparse
 
+from twisted.internet import reactor
 from twisted.internet.defer import Deferred, DeferredList
-from twisted.internet.task import LoopingCall
 from deluge._libtorrent import lt
 
 import deluge.common
@@ -79,6 +79,28 @@ def clean_filename(filename):
     else:
         return newfilepath
 
+class StatusTick(object):
+    """
+    A counter that advances once per reactor iteration.  Torrents compare it
+    against the tick of their cached libtorrent status so that every caller
+    of get_status() within the same iteration shares one snapshot.
+    """
+    def __init__(self):
+        self.tick = 0
+        self.delayed_call = None
+
+    def get(self):
+        """Returns the current tick, scheduling the next advance if needed"""
+        if self.delayed_call is None:
+            self.delayed_call = reactor.callLater(0, self.advance)
+        return self.tick
+
+    def advance(self):
+        self.tick += 1
+        self.delayed_call = None
+
+status_tick = StatusTick()
+
 class TorrentOptions(dict):
     def __init__(self):
         config = ConfigManager("core.conf").config
@@ -115,12 +137,17 @@ def __init__(self, handle, options, state=None, filename=None, magnet=None, owne
 
         self.rpcserver = component.get("RPCServer")
 
-        # This dict holds previous status dicts returned for this torrent
-        # We use this to return dicts that only contain changes from the previous
-        # {session_id: status_dict, ...}
+        # These are used to return dicts that only contain changes from the
+        # previous get_status call of a session.  Every status key keeps the
+        # value of the change counter from when it last changed, and each
+        # session only keeps the counter value and the keys of its last call.
+        # {key: value, ...}
+        self.prev_status_values = {}
+        # {key: status_version, ...}
+        self.prev_status_versions = {}
+        self.status_version = 0
+        # {session_id: (status_version, keys), ...}
         self.prev_status = {}
-        self.prev_status_cleanup_loop = LoopingCall(self.cleanup_prev_status)
-        self.prev_status_cleanup_loop.start(10)
 
         # Set the libtorrent handle
         self.handle = handle
@@ -145,6 +172,9 @@ def __init__(self, handle, options, state=None, filename=None, magnet=None, owne
 
         # Holds status info so that we don't need to keep getting it from lt
         self.status = self.handle.status()
+        self._has_metadata = self.handle.has_metadata()
+        # The status tick self.status was fetched at, see update_status()
+        self._status_tick = None
 
         try:
             self.torrent_info = self.handle.get_torrent_info()
@@ -162,6 +192,10 @@ def __init__(self, handle, options, state=None, filename=None, magnet=None, owne
         # some weird things on state load.
         self.is_finished = False
 
+        # Set when a value saved in the torrent state changes, so the
+        # TorrentManager only needs to snapshot the torrents which changed
+        self.state_dirty = True
+
         # Load values from state if we have it
         if state:
             # This is for saving the total uploaded between sessions
@@ -181,6 +215,9 @@ def __init__(self, handle, options, state=None, filename=None, magnet=None, owne
         # Various torrent options
         self.handle.resolve_countries(True)
 
+        # The torrents state, this is set by update_state()
+        self.state = None
+
         self.set_options(self.options)
 
         # Status message holds error info about the torrent
@@ -238,6 +275,7 @@ def set_options(self, options):
             if OPTIONS_FUNCS.has_key(key):
                 OPTIONS_FUNCS[key](value)
         self.options.update(options)
+        self.state_dirty = True
 
     def get_options(self):
         return self.options
@@ -268,17 +306,21 @@ def get_name(self):
 
     def set_owner(self, account):
         self.owner = account
+        self.state_dirty = True
 
     def set_max_connections(self, max_connections):
         self.options["max_connections"] = int(max_connections)
+        self.state_dirty = True
         self.handle.set_max_connections(max_connections)
 
     def set_max_upload_slots(self, max_slots):
         self.options["max_upload_slots"] = int(max_slots)
+        self.state_dirty = True
         self.handle.set_max_uploads(max_slots)
 
     def set_max_upload_speed(self, m_up_speed):
         self.options["max_upload_speed"] = m_up_speed
+        self.state_dirty = True
         if m_up_speed < 0:
             v = -1
         else:
@@ -288,6 +330,7 @@ def set_max_upload_speed(self, m_up_speed):
 
     def set_max_download_speed(self, m_down_speed):
         self.options["max_download_speed"] = m_down_speed
+        self.state_dirty = True
         if m_down_speed < 0:
             v = -1
         else:
@@ -296,6 +339,7 @@ def set_max_download_speed(self, m_down_speed):
 
     def set_prioritize_first_last(self, prioritize):
         self.options["prioritize_first_last_pieces"] = prioritize
+        self.state_dirty = True
         if self.handle.has_metadata():
             if self.options["compact_allocation"]:
                 log.debug("Setting first/last priority with compact "
@@ -319,28 +363,35 @@ def set_prioritize_first_last(self, prioritize):
 
     def set_sequential_download(self, set_sequencial):
         self.options["sequential_download"] = set_sequencial
+        self.state_dirty = True
         self.handle.set_sequential_download(set_sequencial)
 
     def set_auto_managed(self, auto_managed):
         self.options["auto_managed"] = auto_managed
+        self.state_dirty = True
         if not (self.handle.is_paused() and not self.handle.is_auto_managed()):
             self.handle.auto_managed(auto_managed)
             self.update_state()
 
     def set_stop_ratio(self, stop_ratio):
         self.options["stop_ratio"] = stop_ratio
+        self.state_dirty = True
 
     def set_stop_at_ratio(self, stop_at_ratio):
         self.options["stop_at_ratio"] = stop_at_ratio
+        self.state_dirty = True
 
     def set_remove_at_ratio(self, remove_at_ratio):
         self.options["remove_at_ratio"] = remove_at_ratio
+        self.state_dirty = True
 
     def set_move_completed(self, move_completed):
         self.options["move_completed"] = move_completed
+        self.state_dirty = True
 
     def set_move_completed_path(self, move_completed_path):
         self.options["move_completed_path"] = move_completed_path
+        self.state_dirty = True
 
     def set_file_priorities(self, file_priorities):
         if len(file_priorities) != len(self.get_files()):
@@ -371,6 +422,8 @@ def set_file_priorities(self, file_priorities):
         if self.options["file_priorities"] != list(file_priorities):
             log.warning("File priorities were not set for this torrent")
 
+        self.state_dirty = True
+
         # Set the first/last priorities if needed
         self.set_prioritize_first_last(self.options["prioritize_first_last_pieces"])
 
@@ -385,6 +438,7 @@ def set_trackers(self, trackers):
                 trackers.append(tracker)
             self.trackers = trackers
             self.tracker_host = None
+            self.state_dirty = True
             return
 
         log.debug("Setting trackers for %s: %s", self.torrent_id, trackers)
@@ -401,6 +455,7 @@ def set_trackers(self, trackers):
         #    log.debug("tier: %s tracker: %s", t["tier"], t["url"])
         # Set the tracker list in the torrent object
         self.trackers = trackers
+        self.state_dirty = True
         if len(trackers) > 0:
             # Force a re-announce if there is at least 1 tracker
             self.force_reannounce()
@@ -411,13 +466,22 @@ def set_trackers(self, trackers):
 
     def set_save_path(self, save_path):
         self.options["download_location"] = save_path
+        self.state_dirty = True
 
     def set_tracker_status(self, status):
         """Sets the tracker status"""
         self.tracker_status = self.get_tracker_host() + ": " + status
 
     def update_state(self):
-        """Updates the state based on what libtorrent's state for the torrent is"""
+        """Updates the state based on what libtorrent's state for the torrent is
+        and emits a TorrentStateChangedEvent if the state changed"""
+        old_state = self.state
+        self._update_state()
+        if old_state is not None and self.state != old_state:
+            self.state_dirty = True
+            component.get("EventManager").emit(TorrentStateChangedEvent(self.torrent_id, self.state))
+
+    def _update_state(self):
         # Set the initial state based on the lt state
         LTSTATE = deluge.common.LT_TORRENT_STATE
         ltstate = int(self.handle.status().state)
@@ -635,6 +699,48 @@ def get_last_seen_complete(self):
         self.calculate_last_seen_complete()
         return self._last_seen_complete
 
+    def get_progress(self):
+        """Returns the progress as a 0-100 value"""
+        return self.status.progress * 100
+
+    def get_distributed_copies(self):
+        """Returns the distributed copies, never a negative value"""
+        distributed_copies = self.status.distributed_copies
+        if distributed_copies < 0:
+            distributed_copies = 0.0
+        return distributed_copies
+
+    def get_seeds_peers_ratio(self):
+        """Returns the seeds:peers ratio, -1.0 signifies infinity"""
+        if self.status.num_incomplete == 0:
+            return -1.0
+        return self.status.num_complete / float(self.status.num_incomplete)
+
+    def get_comment(self):
+        """Returns the comment of the torrent file"""
+        if self._has_metadata:
+            try:
+                return self.torrent_info.comment().decode("utf8", "ignore")
+            except UnicodeDecodeError:
+                return self.torrent_info.comment()
+        return ""
+
+    def update_status(self):
+        """
+        Refreshes the cached libtorrent status and torrent_info.  This is only
+        done once per reactor iteration, any further calls in the same
+        iteration will use the cached values.
+        """
+        tick = status_tick.get()
+        if tick == self._status_tick:
+            return
+
+        self._status_tick = tick
+        self.status = self.handle.status()
+        self._has_metadata = self.handle.has_metadata()
+        if self._has_metadata:
+            self.torrent_info = self.handle.get_torrent_info()
+
     def get_status(self, keys, diff=False):
         """
         Returns the status of the torrent based on the keys provided
@@ -650,162 +756,67 @@ def get_status(self, keys, diff=False):
 
         """
 
-        # Create the full dictionary
-        self.status = self.handle.status()
-        if self.handle.has_metadata():
-            self.torrent_info = self.handle.get_torrent_info()
-
-        # Adjust progress to be 0-100 value
-        progress = self.status.progress * 100
+        self.update_status()
 
-        # Adjust status.distributed_copies to return a non-negative value
-        distributed_copies = self.status.distributed_copies
-        if distributed_copies < 0:
-            distributed_copies = 0.0
-
-        # Calculate the seeds:peers ratio
-        if self.status.num_incomplete == 0:
-            # Use -1.0 to signify infinity
-            seeds_peers_ratio = -1.0
-        else:
-            seeds_peers_ratio = self.status.num_complete / float(self.status.num_incomplete)
-
-        full_status = {
-            "active_time": self.status.active_time,
-            "all_time_download": self.status.all_time_download,
-            "compact": self.options["compact_allocation"],
-            "distributed_copies": distributed_copies,
-            "download_payload_rate": self.status.download_payload_rate,
-            "file_priorities": self.options["file_priorities"],
-            "hash": self.torrent_id,
-            "is_auto_managed": self.options["auto_managed"],
-            "is_finished": self.is_finished,
-            "max_connections": self.options["max_connections"],
-            "max_download_speed": self.options["max_download_speed"],
-            "max_upload_slots": self.options["max_upload_slots"],
-            "max_upload_speed": self.options["max_upload_speed"],
-            "message": self.statusmsg,
-            "move_on_completed_path": self.options["move_completed_path"],
-            "move_on_completed": self.options["move_completed"],
-            "move_completed_path": self.options["move_completed_path"],
-            "move_completed": self.options["move_completed"],
-            "next_announce": self.status.next_announce.seconds,
-            "num_peers": self.status.num_peers - self.status.num_seeds,
-            "num_seeds": self.status.num_seeds,
-            "owner": self.owner,
-            "paused": self.status.paused,
-            "prioritize_first_last": self.options["prioritize_first_last_pieces"],
-            "sequential_download": self.options["sequential_download"],
-            "progress": progress,
-            "shared": self.options["shared"],
-            "remove_at_ratio": self.options["remove_at_ratio"],
-            "save_path": self.options["download_location"],
-            "seeding_time": self.status.seeding_time,
-            "seeds_peers_ratio": seeds_peers_ratio,
-            "seed_rank": self.status.seed_rank,
-            "state": self.state,
-            "stop_at_ratio": self.options["stop_at_ratio"],
-            "stop_ratio": self.options["stop_ratio"],
-            "time_added": self.time_added,
-            "total_done": self.status.total_done,
-            "total_payload_download": self.status.total_payload_download,
-            "total_payload_upload": self.status.total_payload_upload,
-            "total_peers": self.status.num_incomplete,
-            "total_seeds":  self.status.num_complete,
-            "total_uploaded": self.status.all_time_upload,
-            "total_wanted": self.status.total_wanted,
-            "tracker": self.status.current_tracker,
-            "trackers": self.trackers,
-            "tracker_status": self.tracker_status,
-            "upload_payload_rate": self.status.upload_payload_rate
-        }
+        # Create the desired status dictionary and return it
+        if not keys:
+            keys = STATUS_KEYS
 
-        def ti_comment():
-            if self.handle.has_metadata():
-                try:
-                    return self.torrent_info.comment().decode("utf8", "ignore")
-                except UnicodeDecodeError:
-                    return self.torrent_info.comment()
-            return ""
+        status_dict = {}
+        for key in keys:
+            if key in STATUS_FUNCS:
+                status_dict[key] = STATUS_FUNCS[key](self)
 
-        def ti_priv():
-            if self.handle.has_metadata():
-                return self.torrent_info.priv()
-            return False
-        def ti_total_size():
-            if self.handle.has_metadata():
-                return self.torrent_info.total_size()
-            return 0
-        def ti_num_files():
-            if self.handle.has_metadata():
-                return self.torrent_info.num_files()
-            return 0
-        def ti_num_pieces():
-            if self.handle.has_metadata():
-                return self.torrent_info.num_pieces()
-            return 0
-        def ti_piece_length():
-            if self.handle.has_metadata():
-                return self.torrent_info.piece_length()
-            return 0
-        def ti_pieces_info():
-            if self.handle.has_metadata():
-                return self.get_pieces_info()
-            return None
-
-        fns = {
-            "comment": ti_comment,
-            "eta": self.get_eta,
-            "file_progress": self.get_file_progress,
-            "files": self.get_files,
-            "is_seed": self.handle.is_seed,
-            "name": self.get_name,
-            "num_files": ti_num_files,
-            "num_pieces": ti_num_pieces,
-            "pieces": ti_pieces_info,
-            "peers": self.get_peers,
-            "piece_length": ti_piece_length,
-            "private": ti_priv,
-            "queue": self.handle.queue_position,
-            "ratio": self.get_ratio,
-            "total_size": ti_total_size,
-            "tracker_host": self.get_tracker_host,
-            "last_seen_complete": self.get_last_seen_complete
-        }
+        if diff:
+            return self.get_status_diff(self.rpcserver.get_session_id(),
+                                        keys, status_dict)
 
-        # Create the desired status dictionary and return it
-        status_dict = {}
+        return status_dict
 
-        if len(keys) == 0:
-            status_dict = full_status
-            for key in fns:
-                status_dict[key] = fns[key]()
-        else:
-            for key in keys:
-                if key in full_status:
-                    status_dict[key] = full_status[key]
-                elif key in fns:
-                    status_dict[key] = fns[key]()
+    def get_status_diff(self, session_id, keys, status_dict):
+        """
+        Returns the part of status_dict that changed since the last call for
+        the session.
 
-        session_id = self.rpcserver.get_session_id()
-        if diff:
-            if session_id in self.prev_status:
-                # We have a previous status dict, so lets make a diff
-                status_diff = {}
-                for key, value in status_dict.items():
-                    if key in self.prev_status[session_id]:
-                        if value != self.prev_status[session_id][key]:
-                            status_diff[key] = value
-                    else:
-                        status_diff[key] = value
+        :param session_id: the session asking for the status
+        :type session_id: int
+        :param keys: the keys that were asked for, this is kept as is for the
+            session so it should not be modified afterwards
+        :type keys: list of str
+        :param status_dict: the current status values for keys
+        :type status_dict: dict
 
-                self.prev_status[session_id] = status_dict
-                return status_diff
+        :returns: a dictionary of the changed status keys and their values
+        :rtype: dict
 
-            self.prev_status[session_id] = status_dict
+        """
+        # Bump the version of the keys whose value changed since they were
+        # last looked at
+        version = self.status_version + 1
+        for key, value in status_dict.iteritems():
+            if key not in self.prev_status_versions or \
+                    self.prev_status_values[key] != value:
+                self.prev_status_values[key] = value
+                self.prev_status_versions[key] = version
+                self.status_version = version
+
+        prev_status = self.prev_status.get(session_id)
+        self.prev_status[session_id] = (self.status_version, keys)
+        if prev_status is None:
             return status_dict
 
-        return status_dict
+        # We have a previous status for this session, so lets make a diff
+        prev_version, prev_keys = prev_status
+        if prev_keys is keys or prev_keys == keys:
+            new_keys = ()
+        else:
+            new_keys = set(keys).difference(prev_keys)
+
+        status_diff = {}
+        for key, value in status_dict.iteritems():
+            if self.prev_status_versions[key] > prev_version or key in new_keys:
+                status_diff[key] = value
+        return status_diff
 
     def apply_options(self):
         """Applies the per-torrent options that are set."""
@@ -824,10 +835,9 @@ def pause(self):
         if self.handle.is_paused():
             # This torrent was probably paused due to being auto managed by lt
             # Since we turned auto_managed off, we should update the state which should
-            # show it as 'Paused'.  We need to emit a torrent_paused signal because
-            # the torrent_paused alert from libtorrent will not be generated.
+            # show it as 'Paused'.  update_state() emits the state changed event
+            # because the torrent_paused alert from libtorrent will not be generated.
             self.update_state()
-            component.get("EventManager").emit(TorrentStateChangedEvent(self.torrent_id, "Paused"))
         else:
             try:
                 self.handle.pause()
@@ -1059,7 +1069,7 @@ def remove_empty_folders(self, folder):
     def cleanup_prev_status(self):
         """
         This method gets called to check the validity of the keys in the prev_status
-        dict.  If the key is no longer valid, the dict will be deleted.
+        dict.  If the key is no longer valid, the entry will be deleted.
 
         """
         for key in self.prev_status.keys():
@@ -1114,3 +1124,76 @@ def get_pieces_info(self):
         # Return only the piece states, no need for the piece index
         # Keep the order
         return [pieces[idx] for idx in sorted_indexes]
+
+# Maps each status key to the function used to resolve it from a Torrent.  The
+# functions only read the snapshot refreshed by Torrent.update_status(), so only
+# the keys asked for are ever evaluated.
+STATUS_FUNCS = {
+    "active_time": lambda t: t.status.active_time,
+    "all_time_download": lambda t: t.status.all_time_download,
+    "compact": lambda t: t.options["compact_allocation"],
+    "distributed_copies": lambda t: t.get_distributed_copies(),
+    "download_payload_rate": lambda t: t.status.download_payload_rate,
+    "file_priorities": lambda t: t.options["file_priorities"],
+    "hash": lambda t: t.torrent_id,
+    "is_auto_managed": lambda t: t.options["auto_managed"],
+    "is_finished": lambda t: t.is_finished,
+    "max_connections": lambda t: t.options["max_connections"],
+    "max_download_speed": lambda t: t.options["max_download_speed"],
+    "max_upload_slots": lambda t: t.options["max_upload_slots"],
+    "max_upload_speed": lambda t: t.options["max_upload_speed"],
+    "message": lambda t: t.statusmsg,
+    "move_on_completed_path": lambda t: t.options["move_completed_path"],
+    "move_on_completed": lambda t: t.options["move_completed"],
+    "move_completed_path": lambda t: t.options["move_completed_path"],
+    "move_completed": lambda t: t.options["move_completed"],
+    "next_announce": lambda t: t.status.next_announce.seconds,
+    "num_peers": lambda t: t.status.num_peers - t.status.num_seeds,
+    "num_seeds": lambda t: t.status.num_seeds,
+    "owner": lambda t: t.owner,
+    "paused": lambda t: t.status.paused,
+    "prioritize_first_last": lambda t: t.options["prioritize_first_last_pieces"],
+    "sequential_download": lambda t: t.options["sequential_download"],
+    "progress": lambda t: t.get_progress(),
+    "shared": lambda t: t.options["shared"],
+    "remove_at_ratio": lambda t: t.options["remove_at_ratio"],
+    "save_path": lambda t: t.options["download_location"],
+    "seeding_time": lambda t: t.status.seeding_time,
+    "seeds_peers_ratio": lambda t: t.get_seeds_peers_ratio(),
+    "seed_rank": lambda t: t.status.seed_rank,
+    "state": lambda t: t.state,
+    "stop_at_ratio": lambda t: t.options["stop_at_ratio"],
+    "stop_ratio": lambda t: t.options["stop_ratio"],
+    "time_added": lambda t: t.time_added,
+    "total_done": lambda t: t.status.total_done,
+    "total_payload_download": lambda t: t.status.total_payload_download,
+    "total_payload_upload": lambda t: t.status.total_payload_upload,
+    "total_peers": lambda t: t.status.num_incomplete,
+    "total_seeds": lambda t: t.status.num_complete,
+    "total_uploaded": lambda t: t.status.all_time_upload,
+    "total_wanted": lambda t: t.status.total_wanted,
+    "tracker": lambda t: t.status.current_tracker,
+    "trackers": lambda t: t.trackers,
+    "tracker_status": lambda t: t.tracker_status,
+    "upload_payload_rate": lambda t: t.status.upload_payload_rate,
+    "comment": lambda t: t.get_comment(),
+    "eta": lambda t: t.get_eta(),
+    "file_progress": lambda t: t.get_file_progress(),
+    "files": lambda t: t.get_files(),
+    "is_seed": lambda t: t.handle.is_seed(),
+    "name": lambda t: t.get_name(),
+    "num_files": lambda t: t.torrent_info.num_files() if t._has_metadata else 0,
+    "num_pieces": lambda t: t.torrent_info.num_pieces() if t._has_metadata else 0,
+    "pieces": lambda t: t.get_pieces_info() if t._has_metadata else None,
+    "peers": lambda t: t.get_peers(),
+    "piece_length": lambda t: t.torrent_info.piece_length() if t._has_metadata else 0,
+    "private": lambda t: t.torrent_info.priv() if t._has_metadata else False,
+    "queue": lambda t: t.handle.queue_position(),
+    "ratio": lambda t: t.get_ratio(),
+    "total_size": lambda t: t.torrent_info.total_size() if t._has_metadata else 0,
+    "tracker_host": lambda t: t.get_tracker_host(),
+    "last_seen_complete": lambda t: t.get_last_seen_complete()
+}
+
+# The keys returned when no keys are asked for
+STATUS_KEYS = tuple(STATUS_FUNCS)
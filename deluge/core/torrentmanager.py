@@ -38,12 +38,13 @@
 
 import cPickle
 import os
-import shutil
+import hashlib
 import operator
 import logging
 
+from twisted.internet import threads
 from twisted.internet.task import LoopingCall
-from twisted.internet.defer import Deferred, DeferredList
+from twisted.internet.defer import Deferred, DeferredList, succeed
 
 from deluge._libtorrent import lt
 
@@ -54,11 +55,19 @@
 from deluge.core.authmanager import AUTH_LEVEL_ADMIN
 from deluge.core.torrent import Torrent
 from deluge.core.torrent import TorrentOptions
+from deluge.core.journal import Journal, JournalError
+from deluge.core.resumedata import ResumeDataStore
 import deluge.core.oldstateupgrader
 from deluge.common import utf8_encoded
 
 log = logging.getLogger(__name__)
 
+# The number of torrents prefetched and added at a time when loading the state
+LOAD_BATCH_SIZE = 100
+# Every this many state saves all of the torrents are snapshot, to save the
+# values which change all the time like total_uploaded
+STATE_FULL_SAVE_INTERVAL = 9
+
 class TorrentState:
     def __init__(self,
             torrent_id=None,
@@ -154,8 +163,32 @@ def __init__(self):
         # The Deferreds will be completed when resume data has been saved.
         self.waiting_on_resume_data = {}
 
-        # Keeps track of resume data
+        # Keeps track of the resume data that changed since the last save,
+        # a None resume data removes the torrent from the store
         self.resume_data = {}
+        self.resume_data_store = ResumeDataStore(
+            os.path.join(get_config_dir(), "state", "resume"))
+        # The digests of the last resume data of each torrent, to skip writing
+        # resume data that did not change
+        self.resume_data_digests = {}
+
+        # The torrents state is saved in a journal, only the torrents whose
+        # state changed are written on each save.
+        self.state_journal = Journal(
+            os.path.join(get_config_dir(), "state", "torrents.state.journal"))
+        # The last saved state of each torrent {torrent_id: state_dict}
+        self.saved_states = {}
+        # The ids of the torrents whose state failed to be written
+        self.unsaved_states = set()
+        # Set when the queue positions may have changed
+        self.queue_changed = True
+        self.num_state_saves = 0
+        # The state of the torrents that are yet to be added when loading the
+        # state {torrent_id: state_dict}
+        self.pending_states = {}
+        self.loading = False
+        self.num_loaded = 0
+        self.num_to_load = 0
 
         # Register set functions
         self.config.register_set_function("max_connections_per_torrent",
@@ -217,13 +250,22 @@ def start(self):
         self.save_resume_data_timer = LoopingCall(self.save_resume_data)
         self.save_resume_data_timer.start(190, False)
         # Force update for all resume data a bit less frequently
-        self.save_all_resume_data_timer = LoopingCall(self.save_resume_data, self.torrents.keys())
+        self.save_all_resume_data_timer = LoopingCall(
+            lambda: self.save_resume_data(self.torrents.keys()))
         self.save_all_resume_data_timer.start(900, False)
 
         if self.last_seen_complete_loop:
             self.last_seen_complete_loop.start(60)
 
+        # Drop the diff status of sessions that are gone
+        self.prev_status_cleanup_loop = LoopingCall(self.cleanup_torrents_prev_status)
+        self.prev_status_cleanup_loop.start(10)
+
     def stop(self):
+        # Stop adding the torrents that are still being loaded, their state
+        # is kept in pending_states
+        self.loading = False
+
         # Stop timers
         if self.save_state_timer.running:
             self.save_state_timer.stop()
@@ -237,15 +279,15 @@ def stop(self):
         if self.last_seen_complete_loop:
             self.last_seen_complete_loop.stop()
 
+        if self.prev_status_cleanup_loop.running:
+            self.prev_status_cleanup_loop.stop()
+
         # Save state on shutdown
-        self.save_state()
+        d = self.save_state(full=True)
 
         self.session.pause()
-        for key in self.torrents:
-            # Stop the status cleanup LoopingCall here
-            self.torrents[key].prev_status_cleanup_loop.stop()
 
-        return self.save_resume_data(self.torrents.keys())
+        return DeferredList([d, self.save_resume_data(self.torrents.keys())])
 
     def update(self):
         for torrent_id, torrent in self.torrents.items():
@@ -275,11 +317,13 @@ def get_torrent_list(self):
             return torrent_ids
 
         current_user = component.get("RPCServer").get_session_user()
-        for torrent_id in torrent_ids[:]:
-            torrent_status = self[torrent_id].get_status(["owner", "shared"])
-            if torrent_status["owner"] != current_user and torrent_status["shared"] == False:
-                torrent_ids.pop(torrent_ids.index(torrent_id))
-        return torrent_ids
+        return [torrent_id for torrent_id, torrent in self.torrents.iteritems()
+                if torrent.owner == current_user or torrent.options["shared"]]
+
+    def cleanup_torrents_prev_status(self):
+        """Removes the diff status of invalid sessions from all torrents"""
+        for torrent in self.torrents.itervalues():
+            torrent.cleanup_prev_status()
 
     def get_torrent_info_from_file(self, filepath):
         """Returns a torrent_info for the file specified or None"""
@@ -342,9 +386,9 @@ def add(self, torrent_info=None, state=None, options=None, save_state=True,
                 # XXX: Probably should raise an exception here..
                 return
 
-        if torrent_info is None and state:
-            # We have no torrent_info so we need to add the torrent with information
-            # from the state object.
+        if state:
+            # We are adding the torrent with information from the state object,
+            # and the torrent_info if it was already read from the state.
 
             # Populate the options dict from state
             options = TorrentOptions()
@@ -366,7 +410,7 @@ def add(self, torrent_info=None, state=None, options=None, save_state=True,
             options["add_paused"] = state.paused
             options["shared"] = state.shared
 
-            ti = self.get_torrent_info_from_file(
+            ti = torrent_info or self.get_torrent_info_from_file(
                     os.path.join(get_config_dir(),
                                     "state", state.torrent_id + ".torrent"))
             if ti:
@@ -487,6 +531,7 @@ def add(self, torrent_info=None, state=None, options=None, save_state=True,
         torrent = Torrent(handle, options, state, filename, magnet, owner)
         # Add the torrent object to the dictionary
         self.torrents[torrent.torrent_id] = torrent
+        self.queue_changed = True
         if self.config["queue_new_to_top"]:
             handle.queue_position_top()
 
@@ -586,7 +631,8 @@ def remove(self, torrent_id, remove_data=False):
             return False
 
         # Remove fastresume data if it is exists
-        self.resume_data.pop(torrent_id, None)
+        self.resume_data[torrent_id] = None
+        self.resume_data_digests.pop(torrent_id, None)
 
         # Remove the .torrent file in the state
         self.torrents[torrent_id].delete_torrentfile()
@@ -606,9 +652,6 @@ def remove(self, torrent_id, remove_data=False):
             except Exception, e:
                 log.warning("Unable to remove copy torrent file: %s", e)
 
-        # Stop the looping call
-        self.torrents[torrent_id].prev_status_cleanup_loop.stop()
-
         # Remove from set if it wasn't finished
         if not self.torrents[torrent_id].is_finished:
             try:
@@ -621,6 +664,7 @@ def remove(self, torrent_id, remove_data=False):
             del self.torrents[torrent_id]
         except (KeyError, ValueError):
             return False
+        self.queue_changed = True
 
         # Save the session state
         self.save_state()
@@ -631,8 +675,8 @@ def remove(self, torrent_id, remove_data=False):
                  component.get("RPCServer").get_session_user())
         return True
 
-    def load_state(self):
-        """Load the state of the TorrentManager from the torrents.state file"""
+    def load_legacy_state(self):
+        """Load the pickled TorrentManagerState from the torrents.state file"""
         state = TorrentManagerState()
 
         try:
@@ -654,21 +698,34 @@ def load_state(self):
         except Exception, e:
             log.warning("Unable to update state file to a compatible version: %s", e)
 
+        return state
+
+    def load_state(self):
+        """Load the state of the TorrentManager from the state journal, or the
+        legacy torrents.state file if there is no journal yet"""
+        state = None
+        if self.state_journal.exists():
+            try:
+                log.debug("Opening torrent state journal for load.")
+                self.saved_states = self.state_journal.load()
+            except (IOError, JournalError), e:
+                log.warning("Unable to load state journal: %s", e)
+            else:
+                state = TorrentManagerState()
+                for saved_state in self.saved_states.itervalues():
+                    torrent_state = TorrentState()
+                    torrent_state.__dict__.update(saved_state)
+                    state.torrents.append(torrent_state)
+
+        if state is None:
+            state = self.load_legacy_state()
+
         # Reorder the state.torrents list to add torrents in the correct queue
         # order.
         state.torrents.sort(key=operator.attrgetter("queue"), reverse=self.config["queue_new_to_top"])
 
         resume_data = self.load_resume_data_file()
 
-        for torrent_state in state.torrents:
-            try:
-                self.add(state=torrent_state, save_state=False,
-                         resume_data=resume_data.get(torrent_state.torrent_id))
-            except AttributeError, e:
-                log.error("Torrent state file is either corrupt or incompatible! %s", e)
-                break
-
-
         if lt.version_minor < 16:
             log.debug("libtorrent version is lower than 0.16. Start looping "
                       "callback to calculate last_seen_complete info.")
@@ -679,72 +736,222 @@ def calculate_last_seen_complete():
                 calculate_last_seen_complete
             )
 
-        component.get("EventManager").emit(SessionStartedEvent())
+        return self.load_torrents(state.torrents, resume_data)
 
-    def save_state(self):
-        """Save the state of the TorrentManager to the torrents.state file"""
-        state = TorrentManagerState()
-        # Create the state for each Torrent and append to the list
-        for torrent in self.torrents.values():
-            paused = False
-            if torrent.state == "Paused":
-                paused = True
-
-            torrent_state = TorrentState(
-                torrent.torrent_id,
-                torrent.filename,
-                torrent.get_status(["total_uploaded"])["total_uploaded"],
-                torrent.trackers,
-                torrent.options["compact_allocation"],
-                paused,
-                torrent.options["download_location"],
-                torrent.options["max_connections"],
-                torrent.options["max_upload_slots"],
-                torrent.options["max_upload_speed"],
-                torrent.options["max_download_speed"],
-                torrent.options["prioritize_first_last_pieces"],
-                torrent.options["sequential_download"],
-                torrent.options["file_priorities"],
-                torrent.get_queue_position(),
-                torrent.options["auto_managed"],
-                torrent.is_finished,
-                torrent.options["stop_ratio"],
-                torrent.options["stop_at_ratio"],
-                torrent.options["remove_at_ratio"],
-                torrent.options["move_completed"],
-                torrent.options["move_completed_path"],
-                torrent.magnet,
-                torrent.time_added,
-                torrent.get_last_seen_complete(),
-                torrent.owner,
-                torrent.options["shared"]
-            )
-            state.torrents.append(torrent_state)
+    def load_torrents(self, torrent_states, resume_data):
+        """
+        Adds the torrents of the state in batches, in queue order.  The torrent
+        files and resume data of the next batch are read in the thread pool
+        while a batch is being added, and the reactor is free to answer
+        requests between the batches.  A SessionLoadingEvent is emitted after
+        each batch and a SessionStartedEvent once all of the torrents are added.
+
+        :param torrent_states: the states of the torrents in queue order
+        :type torrent_states: list of TorrentState
+        :param resume_data: the resume data of the torrents {torrent_id: resume_data}
+        :type resume_data: dict
+
+        :returns: a Deferred fired once all of the torrents are added
+        :rtype: twisted.internet.defer.Deferred
 
-        # Pickle the TorrentManagerState object
-        try:
-            log.debug("Saving torrent state file.")
-            state_file = open(os.path.join(get_config_dir(),
-                              "state", "torrents.state.new"), "wb")
-            cPickle.dump(state, state_file)
-            state_file.flush()
-            os.fsync(state_file.fileno())
-            state_file.close()
-        except IOError, e:
-            log.warning("Unable to save state file: %s", e)
-            return True
+        """
+        self.pending_states = dict((torrent_state.torrent_id, torrent_state.__dict__)
+                                   for torrent_state in torrent_states)
+        self.loading = True
+        self.num_loaded = 0
+        self.num_to_load = len(torrent_states)
+        batches = [torrent_states[i:i + LOAD_BATCH_SIZE]
+                   for i in xrange(0, len(torrent_states), LOAD_BATCH_SIZE)]
+
+        def prefetch(batch):
+            return DeferredList([threads.deferToThread(
+                self.prefetch_torrent, torrent_state, resume_data)
+                for torrent_state in batch], consumeErrors=True)
+
+        def add_batch(results, index):
+            if not self.loading:
+                log.debug("Stopped loading the torrents, %d are not added.",
+                          len(self.pending_states))
+                return
+            if index + 1 < len(batches):
+                next_batch = prefetch(batches[index + 1])
+
+            # The torrents that fail to load keep their state in pending_states
+            # so it is not dropped from the state journal
+            for torrent_state, (success, result) in zip(batches[index], results):
+                if not success:
+                    log.warning("Unable to load torrent %s: %s",
+                                torrent_state.torrent_id, result.getErrorMessage())
+                    continue
+                torrent_info, torrent_resume_data = result
+                try:
+                    self.add(state=torrent_state, torrent_info=torrent_info,
+                             save_state=False, resume_data=torrent_resume_data)
+                except AttributeError, e:
+                    log.error("Torrent state of %s is either corrupt or incompatible! %s",
+                              torrent_state.torrent_id, e)
+                    continue
+                self.pending_states.pop(torrent_state.torrent_id, None)
 
-        # We have to move the 'torrents.state.new' file to 'torrents.state'
-        try:
-            shutil.move(
-                os.path.join(get_config_dir(), "state", "torrents.state.new"),
-                os.path.join(get_config_dir(), "state", "torrents.state"))
-        except IOError:
-            log.warning("Unable to save state file.")
-            return True
-
-        # We return True so that the timer thread will continue
-        return True
+            self.num_loaded += len(batches[index])
+            component.get("EventManager").emit(
+                SessionLoadingEvent(self.num_loaded, self.num_to_load))
+
+            if index + 1 < len(batches):
+                return next_batch.addCallback(add_batch, index + 1)
+            on_loaded()
+
+        def on_loaded():
+            self.loading = False
+            if resume_data is self.resume_data_store:
+                self.resume_data_store.clear_cache()
+            log.info("Loaded %d torrents from the state.", self.num_loaded)
+            component.get("EventManager").emit(SessionStartedEvent())
+
+        if not batches:
+            on_loaded()
+            return succeed(None)
+        return prefetch(batches[0]).addCallback(add_batch, 0)
+
+    def prefetch_torrent(self, torrent_state, resume_data):
+        """
+        Reads the torrent file and resume data of a torrent being loaded from
+        the state, this is run in a thread.
+
+        :returns: the torrent_info, or None for a magnet, and the resume data
+        :rtype: tuple
+
+        """
+        torrent_info = self.get_torrent_info_from_file(
+            os.path.join(get_config_dir(), "state",
+                         torrent_state.torrent_id + ".torrent"))
+        torrent_resume_data = resume_data.get(torrent_state.torrent_id)
+        # Handle legacy case with storing resume data in individual files
+        # for each torrent
+        if torrent_resume_data is None:
+            torrent_resume_data = self.legacy_get_resume_data_from_file(
+                torrent_state.torrent_id)
+            self.legacy_delete_resume_data(torrent_state.torrent_id)
+        return torrent_info, torrent_resume_data
+
+    def get_load_progress(self):
+        """
+        Returns the progress of loading the torrents from the state.
+
+        :returns: the number of torrents loaded and the number to load
+        :rtype: tuple
+
+        """
+        return self.num_loaded, self.num_to_load
+
+    def create_torrent_state(self, torrent):
+        """
+        Creates the state of a torrent, the status values are taken from the
+        cached libtorrent status.
+
+        :returns: the state to save
+        :rtype: dict
+
+        """
+        paused = False
+        if torrent.state == "Paused":
+            paused = True
+
+        torrent_state = TorrentState(
+            torrent.torrent_id,
+            torrent.filename,
+            torrent.status.all_time_upload,
+            torrent.trackers,
+            torrent.options["compact_allocation"],
+            paused,
+            torrent.options["download_location"],
+            torrent.options["max_connections"],
+            torrent.options["max_upload_slots"],
+            torrent.options["max_upload_speed"],
+            torrent.options["max_download_speed"],
+            torrent.options["prioritize_first_last_pieces"],
+            torrent.options["sequential_download"],
+            torrent.options["file_priorities"],
+            torrent.get_queue_position(),
+            torrent.options["auto_managed"],
+            torrent.is_finished,
+            torrent.options["stop_ratio"],
+            torrent.options["stop_at_ratio"],
+            torrent.options["remove_at_ratio"],
+            torrent.options["move_completed"],
+            torrent.options["move_completed_path"],
+            torrent.magnet,
+            torrent.time_added,
+            torrent.get_last_seen_complete(),
+            torrent.owner,
+            torrent.options["shared"]
+        )
+        return torrent_state.__dict__
+
+    def save_state(self, full=False):
+        """
+        Save the state of the TorrentManager to the state journal.  Only the
+        torrents marked as changed are snapshot and the ones whose state
+        differs from the last save are written, this is done in a thread.
+
+        :param full: snapshot all of the torrents with a fresh status, this is
+            also done every STATE_FULL_SAVE_INTERVAL saves
+        :type full: bool
+
+        :returns: A Deferred whose callback will be invoked when save is complete
+        :rtype: twisted.internet.defer.Deferred
+        """
+        self.num_state_saves += 1
+        if self.num_state_saves % STATE_FULL_SAVE_INTERVAL == 0:
+            full = True
+
+        if self.queue_changed and not full:
+            # The queue positions are only read when they may have changed
+            for torrent_id, torrent in self.torrents.iteritems():
+                saved_state = self.saved_states.get(torrent_id)
+                if saved_state is None or \
+                        saved_state["queue"] != torrent.get_queue_position():
+                    torrent.state_dirty = True
+        self.queue_changed = False
+
+        states = dict(self.saved_states)
+        changes = {}
+        for torrent_id, torrent in self.torrents.iteritems():
+            if not (full or torrent.state_dirty):
+                continue
+            torrent.state_dirty = False
+            if full:
+                torrent.update_status()
+            state = self.create_torrent_state(torrent)
+            if states.get(torrent_id) != state:
+                states[torrent_id] = changes[torrent_id] = state
+
+        # Keep the state of the torrents that are not loaded yet
+        for torrent_id, state in self.pending_states.iteritems():
+            if torrent_id not in self.torrents:
+                states[torrent_id] = state
+
+        # Removed torrents
+        for torrent_id in set(states).difference(self.torrents, self.pending_states):
+            del states[torrent_id]
+            changes[torrent_id] = None
+
+        # Write again the torrents whose last write failed
+        for torrent_id in self.unsaved_states:
+            changes[torrent_id] = states.get(torrent_id)
+        self.unsaved_states = set()
+
+        def on_save_failed(failure):
+            log.warning("Unable to save state file: %s", failure.getErrorMessage())
+            self.unsaved_states.update(changes)
+
+        # The next saves build on these states even if this write is still in
+        # progress, the journal writes them in order
+        self.saved_states = states
+        log.debug("Saving torrent state journal, %d changed torrents.", len(changes))
+        d = self.state_journal.save(changes, states)
+        d.addErrback(on_save_failed)
+        return d
 
     def save_resume_data(self, torrent_ids=None):
         """
@@ -772,17 +979,26 @@ def on_torrent_resume_save(result, torrent_id):
             self.torrents[torrent_id].save_resume_data()
 
         def on_all_resume_data_finished(result):
-            if result:
-                self.save_resume_data_file()
+            if self.resume_data:
+                return self.save_resume_data_file()
 
         return DeferredList(deferreds).addBoth(on_all_resume_data_finished)
 
     def load_resume_data_file(self):
+        """
+        Returns the resume data of the torrents, {torrent_id: resume_data}.
+        The resume data store only reads the shards of the torrents that are
+        asked for.  The legacy torrents.fastresume file is read whole if there
+        is no store yet, and written to the store on the next save.
+        """
+        path = os.path.join(get_config_dir(), "state", "torrents.fastresume")
+        if self.resume_data_store.exists() or not os.path.isfile(path):
+            return self.resume_data_store
+
         resume_data = {}
         try:
             log.debug("Opening torrents fastresume file for load.")
-            fastresume_file = open(os.path.join(get_config_dir(), "state",
-                                                "torrents.fastresume"), "rb")
+            fastresume_file = open(path, "rb")
             resume_data = lt.bdecode(fastresume_file.read())
             fastresume_file.close()
         except (EOFError, IOError, Exception), e:
@@ -793,23 +1009,37 @@ def load_resume_data_file(self):
         if resume_data is None:
             return {}
 
+        for torrent_id, data in resume_data.iteritems():
+            self.resume_data.setdefault(torrent_id, data)
         return resume_data
 
     def save_resume_data_file(self):
         """
-        Saves the resume data file with the contents of self.resume_data.
+        Saves the resume data that changed since the last save to the resume
+        data store, only the changed shards are written.
+
+        :returns: A Deferred whose callback will be invoked when save is complete
+        :rtype: twisted.internet.defer.Deferred
         """
-        path = os.path.join(get_config_dir(), "state", "torrents.fastresume")
+        changes = self.resume_data
+        self.resume_data = {}
 
-        try:
-            log.debug("Saving fastresume file: %s", path)
-            fastresume_file = open(path, "wb")
-            fastresume_file.write(lt.bencode(self.resume_data))
-            fastresume_file.flush()
-            os.fsync(fastresume_file.fileno())
-            fastresume_file.close()
-        except IOError:
-            log.warning("Error trying to save fastresume file")
+        def on_saved(failed):
+            # Keep what could not be written for the next save, unless newer
+            # resume data came in since
+            for torrent_id, data in failed.iteritems():
+                self.resume_data.setdefault(torrent_id, data)
+
+            path = os.path.join(get_config_dir(), "state", "torrents.fastresume")
+            if not failed and os.path.isfile(path):
+                log.debug("Removing the legacy fastresume file: %s", path)
+                try:
+                    os.remove(path)
+                except OSError, e:
+                    log.warning("Unable to remove the legacy fastresume file: %s", e)
+
+        log.debug("Saving fastresume data of %d torrents.", len(changes))
+        return self.resume_data_store.save(changes).addCallback(on_saved)
 
     def get_queue_position(self, torrent_id):
         """Get queue position of torrent"""
@@ -821,6 +1051,7 @@ def queue_top(self, torrent_id):
             return False
 
         self.torrents[torrent_id].handle.queue_position_top()
+        self.queue_changed = True
         return True
 
     def queue_up(self, torrent_id):
@@ -829,6 +1060,7 @@ def queue_up(self, torrent_id):
             return False
 
         self.torrents[torrent_id].handle.queue_position_up()
+        self.queue_changed = True
         return True
 
     def queue_down(self, torrent_id):
@@ -837,6 +1069,7 @@ def queue_down(self, torrent_id):
             return False
 
         self.torrents[torrent_id].handle.queue_position_down()
+        self.queue_changed = True
         return True
 
     def queue_bottom(self, torrent_id):
@@ -845,6 +1078,7 @@ def queue_bottom(self, torrent_id):
             return False
 
         self.torrents[torrent_id].handle.queue_position_bottom()
+        self.queue_changed = True
         return True
 
     def on_set_max_connections_per_torrent(self, key, value):
@@ -895,7 +1129,10 @@ def on_alert_torrent_finished(self, alert):
             component.get("EventManager").emit(TorrentFinishedEvent(torrent_id))
 
         torrent.is_finished = True
+        torrent.state_dirty = True
         torrent.update_state()
+        # Finished torrents leave the queue
+        self.queue_changed = True
 
         # Torrent is no longer part of the queue
         try:
@@ -920,10 +1157,7 @@ def on_alert_torrent_paused(self, alert):
         except:
             return
         # Set the torrent state
-        old_state = torrent.state
         torrent.update_state()
-        if torrent.state != old_state:
-            component.get("EventManager").emit(TorrentStateChangedEvent(torrent_id, torrent.state))
 
         # Write the fastresume file if we are not waiting on a bulk write
         if torrent_id not in self.waiting_on_resume_data:
@@ -1008,11 +1242,7 @@ def on_alert_torrent_resumed(self, alert):
             torrent_id = str(alert.handle.info_hash())
         except:
             return
-        old_state = torrent.state
         torrent.update_state()
-        if torrent.state != old_state:
-            # We need to emit a TorrentStateChangedEvent too
-            component.get("EventManager").emit(TorrentStateChangedEvent(torrent_id, torrent.state))
         component.get("EventManager").emit(TorrentResumedEvent(torrent_id))
 
     def on_alert_state_changed(self, alert):
@@ -1023,25 +1253,28 @@ def on_alert_state_changed(self, alert):
         except:
             return
 
-        old_state = torrent.state
+        # This emits a state changed event if the state has actually changed
         torrent.update_state()
 
         # Torrent may need to download data after checking.
         if torrent.state in ('Checking', 'Checking Resume Data', 'Downloading'):
-            torrent.is_finished = False
+            if torrent.is_finished:
+                torrent.is_finished = False
+                torrent.state_dirty = True
+                self.queue_changed = True
             self.queued_torrents.add(torrent_id)
 
-        # Only emit a state changed event if the state has actually changed
-        if torrent.state != old_state:
-            component.get("EventManager").emit(TorrentStateChangedEvent(torrent_id, torrent.state))
-
     def on_alert_save_resume_data(self, alert):
         log.debug("on_alert_save_resume_data")
         torrent_id = str(alert.handle.info_hash())
 
         if torrent_id in self.torrents:
             # Libtorrent in add_torrent() expects resume_data to be bencoded
-            self.resume_data[torrent_id] = lt.bencode(alert.resume_data)
+            resume_data = lt.bencode(alert.resume_data)
+            digest = hashlib.sha1(resume_data).digest()
+            if self.resume_data_digests.get(torrent_id) != digest:
+                self.resume_data_digests[torrent_id] = digest
+                self.resume_data[torrent_id] = resume_data
 
         if torrent_id in self.waiting_on_resume_data:
             self.waiting_on_resume_data[torrent_id].callback(None)
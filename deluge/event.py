@@ -215,10 +215,24 @@ def __init__(self, new_release):
         """
         self._args = [new_release]
 
+class SessionLoadingEvent(DelugeEvent):
+    """
+    Emitted while the torrents are being loaded from the state when the daemon
+    is started, after each batch of torrents is added.
+    """
+    def __init__(self, num_loaded, num_torrents):
+        """
+        :param num_loaded: the number of torrents loaded so far
+        :type num_loaded: int
+        :param num_torrents: the number of torrents to load
+        :type num_torrents: int
+        """
+        self._args = [num_loaded, num_torrents]
+
 class SessionStartedEvent(DelugeEvent):
     """
     Emitted when a session has started.  This typically only happens once when
-    the daemon is initially started.
+    the daemon is initially started, once all of the torrents are loaded.
     """
     pass
 
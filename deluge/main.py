@@ -184,6 +184,8 @@ def start_daemon():
         help="Rotate logfiles.", action="store_true", default=False)
     parser.add_option("--profile", dest="profile", action="store_true", default=False,
         help="Profiles the daemon")
+    parser.add_option("--perf-stats", dest="perf_stats", metavar="FILE",
+        help="Periodically dump the rpc performance stats to FILE", action="store", type="str")
 
     # Get the options and args from the OptionParser
     (options, args) = parser.parse_args()
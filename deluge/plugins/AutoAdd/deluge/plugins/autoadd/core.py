@@ -40,16 +40,25 @@
 
 from deluge._libtorrent import lt
 import os
+import sys
+import errno
 import logging
+from stat import S_ISDIR
 from deluge.plugins.pluginbase import CorePluginBase
 import deluge.component as component
 import deluge.configmanager
 from deluge.common import AUTH_LEVEL_ADMIN
 from deluge.core.rpcserver import export
-from twisted.internet.task import LoopingCall, deferLater
-from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+from twisted.internet import reactor, threads, defer
 from deluge.event import DelugeEvent
 
+try:
+    from twisted.internet import inotify
+    from twisted.python.filepath import FilePath
+except ImportError:
+    inotify = None
+
 log = logging.getLogger(__name__)
 
 DEFAULT_PREFS = {
@@ -83,6 +92,13 @@
 }
 
 MAX_NUM_ATTEMPTS = 10
+# How often the watch folders are checked, in seconds
+POLL_INTERVAL = 5
+# The watch folders watched with inotify are only checked for the files
+# written before they were watched, or on storage inotify doesn't see
+INOTIFY_POLL_INTERVAL = 60
+# How long a written file has to stay unchanged before it is added
+SETTLE_DELAY = 1
 
 class AutoaddOptionsChangedEvent(DelugeEvent):
     """Emitted when the options for the plugin are changed."""
@@ -106,11 +122,19 @@ def enable(self):
             "PreTorrentRemovedEvent", self.__on_pre_torrent_removed
         )
 
-        # Dict of Filename:Attempts
+        # Dict of Filepath:(Attempts, (mtime, size) of the file)
         self.invalid_torrents = {}
         # Loopingcall timers for each enabled watchdir
         self.update_timers = {}
-        deferLater(reactor, 5, self.enable_looping)
+        # The files being loaded in a thread
+        self.loading_files = set()
+        # The delayed calls handling the files written since the last inotify
+        # event, by filepath
+        self.settling_files = {}
+        # The inotify watched paths of the enabled watchdirs
+        self.watched_paths = {}
+        self.inotify = None
+        self.enable_call = reactor.callLater(5, self.enable_looping)
 
     def enable_looping(self):
         # Enable all looping calls for enabled watchdirs here
@@ -123,8 +147,16 @@ def disable(self):
         component.get("EventManager").deregister_event_handler(
             "PreTorrentRemovedEvent", self.__on_pre_torrent_removed
         )
+        if self.enable_call.active():
+            self.enable_call.cancel()
         for loopingcall in self.update_timers.itervalues():
             loopingcall.stop()
+        for delayed_call in self.settling_files.itervalues():
+            delayed_call.cancel()
+        self.settling_files = {}
+        if self.inotify:
+            self.inotify.loseConnection()
+            self.inotify = None
         self.config.save()
 
     def update(self):
@@ -213,6 +245,19 @@ def split_magnets(self, filename):
                     _mfile.close()
             return magnets
 
+    def get_options(self, watchdir):
+        """Returns the options for the torrents added from a watchdir."""
+        opts = {}
+        if 'stop_at_ratio_toggle' in watchdir:
+            watchdir['stop_ratio_toggle'] = watchdir['stop_at_ratio_toggle']
+        # We default to True when reading _toggle values, so a config
+        # without them is valid, and applies all its settings.
+        for option, value in watchdir.iteritems():
+            if OPTIONS_AVAILABLE.get(option):
+                if watchdir.get(option+'_toggle', True):
+                    opts[option] = value
+        return opts
+
     def update_watchdir(self, watchdir_id):
         """Check the watch folder for new torrents to add."""
         log.trace("Updating watchdir id: %s", watchdir_id)
@@ -230,135 +275,270 @@ def update_watchdir(self, watchdir_id):
             self.disable_watchdir(watchdir_id)
             return
 
-        # Generate options dict for watchdir
-        opts = {}
-        if 'stop_at_ratio_toggle' in watchdir:
-            watchdir['stop_ratio_toggle'] = watchdir['stop_at_ratio_toggle']
-        # We default to True when reading _toggle values, so a config
-        # without them is valid, and applies all its settings.
-        for option, value in watchdir.iteritems():
-            if OPTIONS_AVAILABLE.get(option):
-                if watchdir.get(option+'_toggle', True):
-                    opts[option] = value
-
+        filenames = os.listdir(watchdir["abspath"])
         # Check for .magnet files containing multiple magnet links and
         # create a new .magnet file for each of them.
-        for filename in os.listdir(watchdir["abspath"]):
-            try:
-                filepath = os.path.join(watchdir["abspath"], filename)
-            except UnicodeDecodeError, e:
-                log.error("Unable to auto add torrent due to improper "
-                          "filename encoding: %s", e)
-                continue
-            if os.path.isdir(filepath):
-                # Skip directories
+        split = False
+        for filename in filenames:
+            if os.path.splitext(filename)[1] != ".magnet":
                 continue
-            elif os.path.splitext(filename)[1] == ".magnet" and \
+            filepath = self.get_filepath(watchdir, filename)
+            if filepath and not os.path.isdir(filepath) and \
                     self.split_magnets(filepath):
                 os.remove(filepath)
+                split = True
+        if split:
+            filenames = os.listdir(watchdir["abspath"])
+
+        deferreds = []
+        for filename in filenames:
+            d = self.check_file(watchdir_id, filename)
+            if d:
+                deferreds.append(d)
+        if deferreds:
+            return defer.DeferredList(deferreds, fireOnOneErrback=True,
+                                      consumeErrors=True)
+
+    def get_filepath(self, watchdir, filename):
+        """Returns the path of a file in a watchdir, None if it can't be used."""
+        try:
+            return os.path.join(watchdir["abspath"], filename)
+        except UnicodeDecodeError, e:
+            log.error("Unable to auto add torrent due to improper "
+                      "filename encoding: %s", e)
+            return None
+
+    def check_file(self, watchdir_id, filename):
+        """
+        Loads a torrent or magnet file of a watch folder in a thread, and adds
+        it to the session once loaded.  Files which failed to load are only
+        loaded again once they have changed.
+
+        :returns: a Deferred firing once the file is handled, or None if the
+            file is skipped
+        :rtype: Deferred
+        """
+        ext = os.path.splitext(filename)[1]
+        if ext == ".torrent":
+            magnet = False
+        elif ext == ".magnet":
+            magnet = True
+        else:
+            return None
 
-        for filename in os.listdir(watchdir["abspath"]):
+        watchdir = self.watchdirs[watchdir_id]
+        filepath = self.get_filepath(watchdir, filename)
+        if not filepath or filepath in self.loading_files:
+            return None
+        try:
+            file_stat = os.stat(filepath)
+        except OSError:
+            # The file is already gone
+            return None
+        if S_ISDIR(file_stat.st_mode):
+            # Skip directories
+            return None
+
+        signature = (file_stat.st_mtime, file_stat.st_size)
+        if filepath in self.invalid_torrents:
+            attempts, invalid_signature = self.invalid_torrents[filepath]
+            if signature == invalid_signature:
+                # The file is unchanged, so it would fail again
+                self.on_invalid_file(filepath, signature)
+                return None
+
+        self.loading_files.add(filepath)
+        d = threads.deferToThread(self.load_torrent, filepath, magnet)
+        d.addCallbacks(self.add_torrent, self.on_load_torrent_error,
+                       (watchdir_id, filename, magnet), None,
+                       (filepath, signature), None)
+        def on_done(result):
+            self.loading_files.discard(filepath)
+            return result
+        return d.addBoth(on_done)
+
+    def on_load_torrent_error(self, failure, filepath, signature):
+        # If the torrent is invalid, we keep track of it so that we can try
+        # again once it changes.  This is because some torrents may not be
+        # fully saved when they are loaded.
+        log.debug("Torrent is invalid: %s", failure.getErrorMessage())
+        self.on_invalid_file(filepath, signature)
+
+    def on_invalid_file(self, filepath, signature):
+        """Counts a failed attempt of adding the file"""
+        attempts = 1
+        if filepath in self.invalid_torrents:
+            attempts = self.invalid_torrents[filepath][0] + 1
+        if attempts >= MAX_NUM_ATTEMPTS:
+            log.warning(
+                "Maximum attempts reached while trying to add the "
+                "torrent file with the path %s", filepath
+            )
+            del self.invalid_torrents[filepath]
             try:
-                filepath = os.path.join(watchdir["abspath"], filename)
-            except UnicodeDecodeError, e:
-                log.error("Unable to auto add torrent due to improper "
-                          "filename encoding: %s", e)
-                continue
-            if os.path.isdir(filepath):
-                # Skip directories
-                continue
-            else:
-                ext = os.path.splitext(filename)[1]
-                if ext == ".torrent":
-                    magnet = False
-                elif ext == ".magnet":
-                    magnet = True
-                else:
-                    continue
-                try:
-                    filedump = self.load_torrent(filepath, magnet)
-                except (RuntimeError, Exception), e:
-                    # If the torrent is invalid, we keep track of it so that we
-                    # can try again on the next pass.  This is because some
-                    # torrents may not be fully saved during the pass.
-                    log.debug("Torrent is invalid: %s", e)
-                    if filename in self.invalid_torrents:
-                        self.invalid_torrents[filename] += 1
-                        if self.invalid_torrents[filename] >= MAX_NUM_ATTEMPTS:
-                            log.warning(
-                                "Maximum attempts reached while trying to add the "
-                                "torrent file with the path %s", filepath
-                            )
-                            os.rename(filepath, filepath + ".invalid")
-                            del self.invalid_torrents[filename]
-                    else:
-                        self.invalid_torrents[filename] = 1
-                    continue
-
-                # The torrent looks good, so lets add it to the session.
-                if magnet == False:
-                    torrent_id = component.get("TorrentManager").add(
-                        filedump=filedump, filename=filename, options=opts,
-                        owner=watchdir.get("owner", "localclient")
-                    )
-                elif magnet == True:
-                    torrent_id = component.get("TorrentManager").add(
-                        magnet=filedump, options=opts,
-                        owner=watchdir.get("owner", "localclient")
-                    )
-                # If the torrent added successfully, set the extra options.
-                if torrent_id:
-                    if 'Label' in component.get("CorePluginManager").get_enabled_plugins():
-                        if watchdir.get('label_toggle', True) and watchdir.get('label'):
-                            label = component.get("CorePlugin.Label")
-                            if not watchdir['label'] in label.get_labels():
-                                label.add(watchdir['label'])
-                            label.set_torrent(torrent_id, watchdir['label'])
-                    if watchdir.get('queue_to_top_toggle', True) and 'queue_to_top' in watchdir:
-                        if watchdir['queue_to_top']:
-                            component.get("TorrentManager").queue_top(torrent_id)
-                        else:
-                            component.get("TorrentManager").queue_bottom(torrent_id)
+                os.rename(filepath, filepath + ".invalid")
+            except OSError, e:
+                log.warning("Unable to rename %s: %s", filepath, e)
+        else:
+            self.invalid_torrents[filepath] = (attempts, signature)
+
+    def add_torrent(self, filedump, watchdir_id, filename, magnet):
+        """Adds a loaded torrent or magnet file to the session."""
+        if watchdir_id not in self.watchdirs:
+            # The watchdir was removed while the file was loading
+            return
+        watchdir = self.watchdirs[watchdir_id]
+        filepath = os.path.join(watchdir["abspath"], filename)
+        self.invalid_torrents.pop(filepath, None)
+        opts = self.get_options(watchdir)
+
+        # The torrent looks good, so lets add it to the session.
+        if magnet == False:
+            torrent_id = component.get("TorrentManager").add(
+                filedump=filedump, filename=filename, options=opts,
+                owner=watchdir.get("owner", "localclient")
+            )
+        elif magnet == True:
+            torrent_id = component.get("TorrentManager").add(
+                magnet=filedump, options=opts,
+                owner=watchdir.get("owner", "localclient")
+            )
+        # If the torrent added successfully, set the extra options.
+        if torrent_id:
+            if 'Label' in component.get("CorePluginManager").get_enabled_plugins():
+                if watchdir.get('label_toggle', True) and watchdir.get('label'):
+                    label = component.get("CorePlugin.Label")
+                    if not watchdir['label'] in label.get_labels():
+                        label.add(watchdir['label'])
+                    label.set_torrent(torrent_id, watchdir['label'])
+            if watchdir.get('queue_to_top_toggle', True) and 'queue_to_top' in watchdir:
+                if watchdir['queue_to_top']:
+                    component.get("TorrentManager").queue_top(torrent_id)
                 else:
-                    # torrent handle is invalid and so is the magnet link
-                    if magnet == True:
-                        log.debug("invalid magnet link")
-                        os.rename(filepath, filepath + ".invalid")
-                        continue
-
-                # Rename, copy or delete the torrent once added to deluge.
-                if watchdir.get('append_extension_toggle'):
-                    if not watchdir.get('append_extension'):
-                        watchdir['append_extension'] = ".added"
-                    os.rename(filepath, filepath + watchdir['append_extension'])
-                elif watchdir.get('copy_torrent_toggle'):
-                    copy_torrent_path = watchdir['copy_torrent']
-                    copy_torrent_file = os.path.join(copy_torrent_path, filename)
-                    log.debug("Moving added torrent file \"%s\" to \"%s\"",
-                              os.path.basename(filepath), copy_torrent_path)
+                    component.get("TorrentManager").queue_bottom(torrent_id)
+        else:
+            # torrent handle is invalid and so is the magnet link
+            if magnet == True:
+                log.debug("invalid magnet link")
+                os.rename(filepath, filepath + ".invalid")
+                return
+
+        # Rename, copy or delete the torrent once added to deluge.
+        if watchdir.get('append_extension_toggle'):
+            if not watchdir.get('append_extension'):
+                watchdir['append_extension'] = ".added"
+            os.rename(filepath, filepath + watchdir['append_extension'])
+        elif watchdir.get('copy_torrent_toggle'):
+            copy_torrent_path = watchdir['copy_torrent']
+            copy_torrent_file = os.path.join(copy_torrent_path, filename)
+            log.debug("Moving added torrent file \"%s\" to \"%s\"",
+                      os.path.basename(filepath), copy_torrent_path)
+            try:
+                os.rename(filepath, copy_torrent_file)
+            except OSError, why:
+                if why.errno == errno.EXDEV:
+                    # This can happen for different mount points
+                    from shutil import copyfile
                     try:
-                        os.rename(filepath, copy_torrent_file)
-                    except OSError, why:
-                        from errno import EXDEV
-                        if why.errno == errno.EXDEV:
-                            # This can happen for different mount points
-                            from shutil import copyfile
-                            try:
-                                copyfile(filepath, copy_torrent_file)
-                                os.remove(filepath)
-                            except OSError:
-                                # Last Resort!
-                                try:
-                                    open(copy_torrent_file, 'wb').write(
-                                        open(filepath, 'rb').read()
-                                    )
-                                    os.remove(filepath)
-                                except OSError, why:
-                                    raise why
-                        else:
+                        copyfile(filepath, copy_torrent_file)
+                        os.remove(filepath)
+                    except OSError:
+                        # Last Resort!
+                        try:
+                            open(copy_torrent_file, 'wb').write(
+                                open(filepath, 'rb').read()
+                            )
+                            os.remove(filepath)
+                        except OSError, why:
                             raise why
                 else:
-                    os.remove(filepath)
+                    raise why
+        else:
+            os.remove(filepath)
+
+    def start_inotify(self):
+        """Starts inotify, returns False if it isn't available."""
+        if self.inotify:
+            return True
+        if inotify is None:
+            return False
+        try:
+            self.inotify = inotify.INotify()
+            self.inotify.startReading()
+        except Exception, e:
+            log.debug("inotify isn't available, polling the watch folders: %s", e)
+            self.inotify = None
+            return False
+        return True
+
+    def watch_watchdir(self, watchdir_id):
+        """
+        Watches a watch folder with inotify.
+
+        :returns: True if the folder is watched
+        :rtype: bool
+        """
+        if not self.start_inotify():
+            return False
+        abspath = self.watchdirs[watchdir_id]["abspath"]
+        if isinstance(abspath, unicode):
+            abspath = abspath.encode(sys.getfilesystemencoding())
+        path = FilePath(abspath)
+        try:
+            self.inotify.watch(
+                path, mask=inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO,
+                callbacks=[lambda watch, filepath, mask:
+                           self.on_watchdir_event(watchdir_id, filepath)]
+            )
+        except Exception, e:
+            log.warning("Unable to watch %s with inotify: %s", abspath, e)
+            return False
+        self.watched_paths[watchdir_id] = path
+        return True
+
+    def unwatch_watchdir(self, watchdir_id):
+        path = self.watched_paths.pop(watchdir_id, None)
+        if path and self.inotify:
+            self.inotify.ignore(path)
+        abspath = self.watchdirs[watchdir_id]["abspath"]
+        for filepath, delayed_call in self.settling_files.items():
+            if os.path.dirname(filepath) == abspath:
+                delayed_call.cancel()
+                del self.settling_files[filepath]
+
+    def on_watchdir_event(self, watchdir_id, path):
+        """
+        Called when a file was written or moved into a watch folder.  The file
+        is handled once it has been left alone for SETTLE_DELAY seconds.
+        """
+        filename = path.basename()
+        if isinstance(filename, str):
+            try:
+                filename = filename.decode(sys.getfilesystemencoding())
+            except UnicodeDecodeError, e:
+                log.error("Unable to auto add torrent due to improper "
+                          "filename encoding: %s", e)
+                return
+        if os.path.splitext(filename)[1] not in (".torrent", ".magnet"):
+            return
+        filepath = os.path.join(self.watchdirs[watchdir_id]["abspath"], filename)
+        if filepath in self.settling_files:
+            self.settling_files[filepath].reset(SETTLE_DELAY)
+        else:
+            self.settling_files[filepath] = reactor.callLater(
+                SETTLE_DELAY, self.on_file_settled, watchdir_id, filename)
+
+    def on_file_settled(self, watchdir_id, filename):
+        filepath = os.path.join(self.watchdirs[watchdir_id]["abspath"], filename)
+        del self.settling_files[filepath]
+        if os.path.splitext(filename)[1] == ".magnet" and \
+                os.path.isfile(filepath) and self.split_magnets(filepath):
+            # The split magnet files get their own events
+            os.remove(filepath)
+            return
+        d = self.check_file(watchdir_id, filename)
+        if d:
+            d.addErrback(self.on_update_watchdir_error, watchdir_id)
 
     def on_update_watchdir_error(self, failure, watchdir_id):
         """Disables any watch folders with un-handled exceptions."""
@@ -369,17 +549,20 @@ def on_update_watchdir_error(self, failure, watchdir_id):
     @export
     def enable_watchdir(self, watchdir_id):
         w_id = str(watchdir_id)
+        # Update the config first, the looping call checks it
+        if not self.watchdirs[w_id]['enabled']:
+            self.watchdirs[w_id]['enabled'] = True
+            self.config.save()
+            component.get("EventManager").emit(AutoaddOptionsChangedEvent())
         # Enable the looping call
         if w_id not in self.update_timers or not self.update_timers[w_id].running:
+            interval = POLL_INTERVAL
+            if self.watch_watchdir(w_id):
+                interval = INOTIFY_POLL_INTERVAL
             self.update_timers[w_id] = LoopingCall(self.update_watchdir, w_id)
-            self.update_timers[w_id].start(5).addErrback(
+            self.update_timers[w_id].start(interval).addErrback(
                 self.on_update_watchdir_error, w_id
             )
-        # Update the config
-        if not self.watchdirs[w_id]['enabled']:
-            self.watchdirs[w_id]['enabled'] = True
-            self.config.save()
-            component.get("EventManager").emit(AutoaddOptionsChangedEvent())
 
     @export
     def disable_watchdir(self, watchdir_id):
@@ -389,6 +572,7 @@ def disable_watchdir(self, watchdir_id):
             if self.update_timers[w_id].running:
                 self.update_timers[w_id].stop()
             del self.update_timers[w_id]
+        self.unwatch_watchdir(w_id)
         # Update the config
         if self.watchdirs[w_id]['enabled']:
             self.watchdirs[w_id]['enabled'] = False
@@ -55,6 +55,7 @@
 from common import IP, BadIP
 from detect import detect_compression, detect_format, create_reader, UnknownFormatError
 from readers import ReaderParseError
+from rangecache import file_hash, merge_ranges, load_cache, save_cache, long_to_ip
 
 # TODO: check return values for deferred callbacks
 # TODO: review class attributes for redundancy
@@ -392,12 +393,6 @@ def import_list(self, blocklist):
         :rtype: Deferred
         """
         log.trace("on import_list")
-        def on_read_ip_range(start, end):
-            """Add ip range to blocklist"""
-#            log.trace("Adding ip range %s - %s to ipfilter as blocked", start, end)
-            self.blocklist.add_rule(start.address, end.address, BLOCK_RANGE)
-            self.num_blocked += 1
-
         def on_finish_read(result):
             """Add any whitelisted IP's and add the blocklist to session"""
             # White listing happens last because the last rules added have
@@ -437,11 +432,44 @@ def on_reader_failure(failure):
         log.debug("Reader type: %s compression: %s", self.config["list_type"], self.config["list_compression"])
         log.debug("Clearing current ip filtering")
 #        self.blocklist.add_rule("0.0.0.0", "255.255.255.255", ALLOW_RANGE)
-        d = threads.deferToThread(self.reader(blocklist).read, on_read_ip_range)
+        d = threads.deferToThread(self.read_ranges, blocklist)
         d.addCallback(on_finish_read).addErrback(on_reader_failure)
 
         return d
 
+    def read_ranges(self, blocklist):
+        """
+        Adds the blocked ranges of the blocklist to the ip filter.  The ranges
+        are read from the ranges cache when it was made from the same file,
+        otherwise the blocklist is parsed and the cache is updated.
+
+        :param blocklist: path of blocklist
+        :type blocklist: string
+        :returns: path of blocklist
+        :rtype: string
+        """
+        cache = deluge.configmanager.get_config_dir("blocklist.ranges")
+        source_hash = file_hash(blocklist)
+        ranges = load_cache(cache, source_hash)
+        if ranges is None:
+            log.debug("Parsing blocklist %s", blocklist)
+            reader = self.reader(blocklist)
+            parsed = reader.read_ranges()
+            if reader.num_errors:
+                log.warning("%d lines of the blocklist couldn't be parsed",
+                            reader.num_errors)
+            ranges = merge_ranges(parsed)
+            log.debug("Merged %d ranges into %d", len(parsed), len(ranges) / 2)
+            save_cache(cache, source_hash, ranges)
+        else:
+            log.debug("Loaded %d ranges from the ranges cache", len(ranges) / 2)
+
+        for index in xrange(0, len(ranges), 2):
+            self.blocklist.add_rule(long_to_ip(ranges[index]),
+                                    long_to_ip(ranges[index + 1]), BLOCK_RANGE)
+        self.num_blocked = len(ranges) / 2
+        return blocklist
+
     def on_import_complete(self, blocklist):
         """
         Runs any import clean up functions
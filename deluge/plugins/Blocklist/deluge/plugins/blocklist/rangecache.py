@@ -0,0 +1,197 @@
+#
+# rangecache.py
+#
+# Copyright (C) 2011 Deluge Team
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+# 	The Free Software Foundation, Inc.,
+# 	51 Franklin Street, Fifth Floor
+# 	Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+#
+
+"""
+The ranges cache holds the blocked ranges of an imported blocklist as sorted,
+merged integer intervals, so the list doesn't need to be parsed again when it
+is imported the next time.  The cache is only used for the same blocklist file
+it was made from, which is checked with the sha1 hash of the file.
+"""
+
+import os
+import sys
+import shutil
+import socket
+import struct
+import hashlib
+import logging
+from array import array
+
+log = logging.getLogger(__name__)
+
+MAGIC = "DBLR"
+VERSION = 1
+# The magic, version, sha1 of the blocklist file and the number of ranges
+HEADER = struct.Struct("<4sB20sI")
+
+# Unsigned integers big enough to hold an ip address
+if array("I").itemsize >= 4:
+    TYPECODE = "I"
+else:
+    TYPECODE = "L"
+
+def file_hash(filename):
+    """
+    Returns the sha1 digest of a file.
+
+    :param filename: the file to hash
+    :type filename: string
+
+    :returns: the digest
+    :rtype: string
+
+    """
+    sha1 = hashlib.sha1()
+    f = open(filename, "rb")
+    try:
+        data = f.read(1024 * 1024)
+        while data:
+            sha1.update(data)
+            data = f.read(1024 * 1024)
+    finally:
+        f.close()
+    return sha1.digest()
+
+def merge_ranges(ranges):
+    """
+    Sorts the ranges and merges the overlapping and adjacent ones.
+
+    :param ranges: the (start, end) ip ranges as integers
+    :type ranges: iterable
+
+    :returns: the starts and ends of the merged ranges, one after the other
+    :rtype: array
+
+    """
+    # Sorting single integers is a lot faster than sorting tuples
+    keys = [start << 32 | end for start, end in ranges if start <= end]
+    keys.sort()
+    merged = array(TYPECODE)
+    if not keys:
+        return merged
+
+    mask = 0xFFFFFFFF
+    current_start = keys[0] >> 32
+    current_end = keys[0] & mask
+    for key in keys:
+        start = key >> 32
+        if start > current_end + 1:
+            merged.append(current_start)
+            merged.append(current_end)
+            current_start = start
+            current_end = key & mask
+        elif key & mask > current_end:
+            current_end = key & mask
+    merged.append(current_start)
+    merged.append(current_end)
+    return merged
+
+def load_cache(filename, source_hash):
+    """
+    Loads the ranges cache in a single read.
+
+    :param filename: the ranges cache file
+    :type filename: string
+    :param source_hash: the sha1 digest of the blocklist file being imported
+    :type source_hash: string
+
+    :returns: the merged ranges, or None if there is no valid cache for the
+        blocklist
+    :rtype: array
+
+    """
+    try:
+        f = open(filename, "rb")
+        try:
+            data = f.read()
+        finally:
+            f.close()
+    except IOError:
+        return None
+
+    if len(data) < HEADER.size:
+        return None
+    magic, version, digest, num_ranges = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or digest != source_hash:
+        return None
+
+    ranges = array(TYPECODE)
+    if len(data) - HEADER.size != num_ranges * 2 * ranges.itemsize:
+        log.warning("The blocklist ranges cache is corrupt")
+        return None
+    ranges.fromstring(data[HEADER.size:])
+    if sys.byteorder != "little":
+        ranges.byteswap()
+    return ranges
+
+def save_cache(filename, source_hash, ranges):
+    """
+    Saves the ranges cache.
+
+    :param filename: the ranges cache file
+    :type filename: string
+    :param source_hash: the sha1 digest of the blocklist file the ranges are from
+    :type source_hash: string
+    :param ranges: the merged ranges returned by :func:`merge_ranges`
+    :type ranges: array
+
+    """
+    if sys.byteorder != "little":
+        ranges = array(TYPECODE, ranges)
+        ranges.byteswap()
+    try:
+        f = open(filename + ".new", "wb")
+        try:
+            f.write(HEADER.pack(MAGIC, VERSION, source_hash, len(ranges) / 2))
+            f.write(ranges.tostring())
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        shutil.move(filename + ".new", filename)
+    except (IOError, OSError), e:
+        log.warning("Unable to save the blocklist ranges cache: %s", e)
+
+def long_to_ip(ip):
+    """
+    Returns the dotted quad of an ip address.
+
+    :param ip: the ip address as an integer
+    :type ip: int
+
+    :rtype: string
+
+    """
+    return socket.inet_ntoa(struct.pack("!I", ip))
@@ -34,11 +34,54 @@
 #
 
 import logging
-from common import raisesErrorsAs, IP, BadIP
+from common import raisesErrorsAs
 import re
+import socket
+import struct
+from itertools import chain
 
 log = logging.getLogger(__name__)
 
+# The size of the decompressed blocks read_ranges parses at once
+CHUNK_SIZE = 1024 * 1024
+
+IP_PATTERN = r"(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})"
+# Zero padded ip address parts, like in 001.002.003.004
+PADDED_RE = re.compile(r"(?<!\d)0\d")
+PADDING_RE = re.compile(r"\b0+\B")
+
+def range_regex(pattern):
+    """
+    Compiles the regex matching each line that isn't blank or a comment.
+    The first two groups are the start and end of the range from `pattern`,
+    the third group is only set for lines that aren't ranges.
+    """
+    return re.compile(r"^[ \t]*(?:%s|([^#\s].*))$" % pattern, re.M)
+
+def addresses_to_longs(addresses):
+    """
+    Converts dotted quads to integers.
+
+    :param addresses: the ip addresses, without zero padding
+    :type addresses: sequence
+
+    :returns: the addresses as integers, None for the invalid ones
+    :rtype: list
+
+    """
+    try:
+        return list(struct.unpack("!%dI" % len(addresses),
+                                  "".join(map(socket.inet_aton, addresses))))
+    except socket.error:
+        # Find out which ones are invalid
+        longs = []
+        for address in addresses:
+            try:
+                longs.append(struct.unpack("!I", socket.inet_aton(address))[0])
+            except socket.error:
+                longs.append(None)
+        return longs
+
 class ReaderParseError(Exception):
     pass
 
@@ -56,16 +99,6 @@ def parse(self, line):
         """Extracts ip range from given line"""
         raise NotImplementedError
 
-    def read(self, callback):
-        """Calls callback on each ip range in the file"""
-        for start, end in self.readranges():
-            try:
-                callback(IP.parse(start), IP.parse(end))
-            except BadIP, e:
-                log.error("Failed to parse IP: %s", e)
-#                log.exception(e)
-        return self.file
-
     def is_ignored(self, line):
         """Ignore commented lines and blank lines"""
         line = line.strip()
@@ -90,21 +123,81 @@ def is_valid(self):
         return valid
 
     @raisesErrorsAs(ReaderParseError)
-    def readranges(self):
-        """Yields each ip range from the file"""
+    def read_ranges(self):
+        """
+        Parses the ip ranges of the file.  The file is read in blocks and the
+        ranges of each block are extracted with the RANGE_RE regex and
+        converted to integers at once.  The number of ranges and of the lines
+        that couldn't be parsed are kept in num_ranges and num_errors.
+
+        :returns: the (start, end) ranges as integers
+        :rtype: list
+
+        :raises ReaderParseError: if the file can't be read, or if it doesn't
+            have a single range but has lines that couldn't be parsed
+
+        """
+        self.num_ranges = 0
+        self.num_errors = 0
+        ranges = []
         blocklist = self.open()
-        for line in blocklist:
-            if not self.is_ignored(line):
-                yield self.parse(line)
-        blocklist.close()
+        try:
+            # The last, maybe partial, line of the previous block
+            rest = ""
+            while True:
+                data = blocklist.read(CHUNK_SIZE)
+                if not data:
+                    break
+                end = data.rfind("\n") + 1
+                if end:
+                    ranges.extend(self.parse_block(rest + data[:end]))
+                    rest = data[end:]
+                else:
+                    rest += data
+            if rest:
+                ranges.extend(self.parse_block(rest))
+        finally:
+            blocklist.close()
+
+        self.num_ranges = len(ranges)
+        if self.num_errors and not ranges:
+            raise ReaderParseError("No ranges found in %s" % self.file)
+        return ranges
+
+    def parse_block(self, block):
+        """Returns the ranges of a block of complete lines"""
+        matches = self.RANGE_RE.findall(block)
+        # The groups of all the matches, three for each line
+        groups = list(chain.from_iterable(matches))
+        invalid = groups[2::3]
+        num_invalid = len(invalid) - invalid.count("")
+        if num_invalid:
+            self.num_errors += num_invalid
+            groups = list(chain.from_iterable(
+                match for match in matches if not match[2]))
+        if PADDED_RE.search(block):
+            groups = PADDING_RE.sub("", "\n".join(groups)).split("\n")
+
+        starts = addresses_to_longs(groups[0::3])
+        ends = addresses_to_longs(groups[1::3])
+        ranges = zip(starts, ends)
+        if None in starts or None in ends:
+            valid = [r for r in ranges if None not in r]
+            self.num_errors += len(ranges) - len(valid)
+            ranges = valid
+        return ranges
 
 class EmuleReader(BaseReader):
     """Blocklist reader for emule style blocklists"""
+    RANGE_RE = range_regex(IP_PATTERN + r"[ \t]*-[ \t]*" + IP_PATTERN + r".*")
+
     def parse(self, line):
         return line.strip().split(" , ")[0].split(" - ")
 
 class SafePeerReader(BaseReader):
     """Blocklist reader for SafePeer style blocklists"""
+    RANGE_RE = range_regex(r".*:" + IP_PATTERN + "-" + IP_PATTERN + r"[ \t\r]*")
+
     def parse(self, line):
         return line.strip().split(":")[-1].split("-")
 
@@ -39,9 +39,11 @@
 
 import logging
 import feedparser # for parsing rss feeds
-import threading  # for threaded updates
 import re         # for regular expressions
+from collections import deque
 from twisted.internet.task import LoopingCall
+from twisted.internet import threads
+from twisted.internet.defer import DeferredSemaphore
 
 from deluge.plugins.pluginbase import CorePluginBase
 import deluge.component as component
@@ -57,6 +59,11 @@
     "history": []
 }
 
+# The most feeds fetched at the same time
+MAX_FETCHES = 4
+# The number of added links remembered, so they aren't added again
+HISTORY_SIZE = 1000
+
 # Helper classes
 
 class Feed:
@@ -162,13 +169,46 @@ def set_config(self, conf):
         self.stop_at_ratio = conf['stop_at_ratio']
 
 
+class History(object):
+    """
+    The links added last, oldest first, with a set to look them up.
+    """
+    def __init__(self, links, size=HISTORY_SIZE):
+        self.size = size
+        self.links = deque(links[-size:])
+        self.link_set = set(self.links)
+
+    def __contains__(self, link):
+        return link in self.link_set
+
+    def __len__(self):
+        return len(self.links)
+
+    def add(self, link):
+        if link in self.link_set:
+            return
+        self.links.append(link)
+        self.link_set.add(link)
+        if len(self.links) > self.size:
+            self.link_set.discard(self.links.popleft())
+
+    def get_links(self):
+        return list(self.links)
+
+
 class Core(CorePluginBase):
     def enable(self):
         self.config = deluge.configmanager.ConfigManager("feeder.conf", DEFAULT_PREFS)
         self.feeds = {}
         self.timers = {}
-        self.history = self.config['history']
+        self.history = History(self.config['history'])
         self.time = 0
+        # The etag and modified date of each fetched feed
+        self.feed_states = {}
+        # The feeds being fetched
+        self.fetching = set()
+        self.fetch_semaphore = DeferredSemaphore(MAX_FETCHES)
+        self.compile_filters()
 
         # Setting default timer to configured update time
         for feed in self.config['feeds']:
@@ -177,7 +217,10 @@ def enable(self):
 
 
     def disable(self):
-        self.config['history'] = self.history
+        for timer in self.timers.itervalues():
+            if timer.running:
+                timer.stop()
+        self.config['history'] = self.history.get_links()
         self.config.save()
 
 
@@ -194,6 +237,7 @@ def set_config(self, config):
         for key in config.keys():
             self.config[key] = config[key]
         self.config.save()
+        self.compile_filters()
 
 ####################Configuration Getters##################
 
@@ -253,7 +297,7 @@ def test_filter(self, regex):
         filters["to_test"].set_config(conf)
         hits = {}
         for feed in self.feeds:
-            hits.update(self.run_filters(feed, filters, test=True))
+            hits.update(self.run_filters(feed, self.compile_filters(filters), test=True))
         return hits
 
     @export
@@ -300,6 +344,7 @@ def remove_feed(self, feedname):
         """Remove a feed"""
         if self.feeds.has_key(feedname): # Check if we have the feed saved and remove it
             del self.feeds[feedname]
+        self.feed_states.pop(feedname, None)
         if self.timers.has_key(feedname): # Check if we have a timer for this feed and remove it
             self.timers[feedname].stop()
             del self.timers[feedname]
@@ -313,6 +358,7 @@ def add_filter(self, name):
         if not self.config['filters'].has_key(name): # we don't want to add a filter that already exists
             self.config['filters'][name] = Filter()
             self.config.save()
+            self.compile_filters()
 
     @export
     def set_filter_config(self, filtername, conf):
@@ -323,6 +369,7 @@ def set_filter_config(self, filtername, conf):
 
         self.config['filters'][filtername].set_config(oldconf)
         self.config.save()
+        self.compile_filters()
         for feed in self.config['feeds']: # we would like to check if the filter now matches something new
             self.run_filters(feed)
 
@@ -332,27 +379,44 @@ def remove_filter(self, name):
         if self.config['filters'].has_key(name): # Can't remove a filter that doesn't exists
             del self.config['filters'][name]
             self.config.save()
+            self.compile_filters()
 
 #=================Internal functions================
 
     def update_feed(self, feedname):
-        """Start a thread to update a single feed"""
-        threading.Thread(
-            target=self.update_feed_thread,
-            args=(self.on_feed_updated, feedname)).start()
+        """Fetch a single feed in a thread, at most MAX_FETCHES at once"""
+        if feedname in self.fetching:
+            log.debug("Feed '%s' is still being fetched", feedname)
+            return True
+        self.fetching.add(feedname)
+
+        feed = self.config['feeds'][feedname]
+        etag, modified = self.feed_states.get(feedname, (None, None))
+        d = self.fetch_semaphore.run(threads.deferToThread, feedparser.parse,
+                                     feed.url, etag=etag, modified=modified)
+        d.addCallbacks(self.on_feed_fetched, self.on_feed_fetch_error,
+                       (feedname,), None, (feedname,))
+        def on_done(result):
+            self.fetching.discard(feedname)
+            return result
+        d.addBoth(on_done)
 
         # Need to return true to not destoy timer...
         return True
 
-    def update_feed_thread(self, callback, feedname):
-        """updates a feed"""
-        feed = self.config['feeds'][feedname]
-        try:
-            self.feeds[feedname] = feedparser.parse(feed.url)
-        except Exception, e:
-            log.warning("Error parsing feed %s: %s", feedname, e)
-        else:
-            callback(feedname)
+    def on_feed_fetched(self, result, feedname):
+        if feedname not in self.config['feeds']:
+            # The feed was removed while being fetched
+            return
+        if result.get('status') == 304:
+            log.debug("Feed '%s' is not modified", feedname)
+            return
+        self.feed_states[feedname] = (result.get('etag'), result.get('modified'))
+        self.feeds[feedname] = result
+        self.on_feed_updated(feedname)
+
+    def on_feed_fetch_error(self, failure, feedname):
+        log.warning("Error parsing feed %s: %s", feedname, failure.getErrorMessage())
 
     def on_feed_updated(self, feedname):
         """Run stuff when a feed has been updated"""
@@ -360,71 +424,90 @@ def on_feed_updated(self, feedname):
         # Not all feeds contain a ttl value, but if it does
         # we would like to obey it
         try:
-            if not self.feeds[feedname].ttl == self.config['feeds'][feedname].updatetime:
-                log.debug("feed '%s' request a ttl of %s, updating timer", feedname, self.feeds[feedname].ttl)
-                self.config['feeds'][feedname].updatetime = self.feeds[feedname].ttl
-                self.timers[feedname].stop()
-                self.timers[feedname].start(self.config['feeds'][feedname].updatetime * 60)
-        except Exception, e:
+            ttl = int(self.feeds[feedname].feed.ttl)
+        except (AttributeError, ValueError):
             log.debug("feed '%s' has no ttl set, will use default timer", feedname)
+        else:
+            if ttl and ttl != self.config['feeds'][feedname].updatetime:
+                log.debug("feed '%s' request a ttl of %s, updating timer", feedname, ttl)
+                self.config['feeds'][feedname].updatetime = ttl
+                self.timers[feedname].stop()
+                self.timers[feedname].start(ttl * 60, now=False)
 
         # Run filters on the feed
         self.run_filters(feedname)
 
-    def run_filters(self, feedname, filters={}, test=False):
-        """Test all available filters on the given feed"""
-        if not filters:
+    def compile_filters(self, filters=None):
+        """
+        Compiles the regexes of the active filters.  The filters of the config
+        are compiled into self.compiled_filters whenever they change.
+
+        :returns: a list of (filter name, filter, compiled regex)
+        :rtype: list
+        """
+        compile_config = filters is None
+        if compile_config:
             filters = self.config['filters']
-        log.debug("will test filters %s", filters)
+        compiled = []
+        for name, filter in filters.iteritems():
+            # We need to be able to run feeds saved before implementation of actiave/deactivate filter (pre 0.3) TODO
+            if not getattr(filter, "active", True):
+                continue
+            if filter.regex == "": # we don't want a empty regex...
+                log.warning("Filter '%s' has not been configured, ignoring!", name)
+                continue
+            try:
+                regex = re.compile(filter.regex, re.IGNORECASE)
+            except re.error, e:
+                log.warning("Filter '%s' has an invalid regex, ignoring: %s", name, e)
+                continue
+            compiled.append((name, filter, regex))
+        if compile_config:
+            self.compiled_filters = compiled
+        return compiled
+
+    def run_filters(self, feedname, filters=None, test=False):
+        """Test all available filters on the given feed"""
+        if filters is None:
+            filters = self.compiled_filters
+        log.debug("will test filters %s", [name for name, filter, regex in filters])
         hits = {}
+        added = False
         # Test every entry...
         for entry in self.feeds[feedname]['entries']:
             # ...and every filter
-            for filter in filters:
-                # We need to be able to run feeds saved before implementation of actiave/deactivate filter (pre 0.3) TODO
-                try:
-                    if not filters[filter].active:
-                        continue
-                except:
-                    log.debug("old filter, will assume filter is activated")
-
-                if filters[filter].regex == "": # we don't want a empty regex...
-                    log.warning("Filter '%s' has not been configured, ignoring!", filter)
-                    continue
-
+            for name, filter, regex in filters:
                 # if the filter isn't supposed to be run on this feed we don't want to run it...
 #                if filter.all_feeds or self.config['filters'][filter].feeds.has_element(feedname) : # ...apparently has_element doesn't work on arrays... TODO
-                if self.test_filter(entry, filters[filter].regex):
+                if self.match_entry(entry, regex):
                     if test:
                         hits[entry.title] = entry.link
                     else:
-                        opts = filters[filter].get_config()
+                        # history patch from Darrell Enns, slightly modified :)
+                        # check history to prevent multiple adds of the same torrent
+                        log.debug("testing %s", entry.link)
+                        if entry.link in self.history:
+                            log.debug("'%s' is in history, will not download", entry.link)
+                            continue
+                        opts = filter.get_config()
                         #remove filter options that should not be passed on to the torrent.
                         del opts['regex']
                         del opts['feeds']
                         del opts['all_feeds']
 
-                        # history patch from Darrell Enns, slightly modified :)
-                        # check history to prevent multiple adds of the same torrent
-                        log.debug("testing %s", entry.link)
-                        if not entry.link in self.history:
-                            self.add_torrent(entry.link, opts, self.feeds[feedname].cookies)
-                            self.history.append(entry.link)
-
-                            #limit history to 50 entries
-                            if len(self.history)>50:
-                                self.history=self.history[-50:]
-                                log.debug("wrapping history")
-                        else:
-                            log.debug("'%s' is in history, will not download", entry.link)
+                        self.add_torrent(entry.link, opts, self.config['feeds'][feedname].cookies)
+                        self.history.add(entry.link)
+                        added = True
+        if added:
+            self.config['history'] = self.history.get_links()
+            self.config.save()
         return hits
 
 
-    def test_filter(self, entry, filter):
-        """Tests a filter to a given rss entry"""
-        f = re.compile(filter, re.IGNORECASE)
-        if f.search(entry.title) or f.search(entry.link):
-            log.debug("RSS item '%s' matches filter '%s'", entry.title, filter)
+    def match_entry(self, entry, regex):
+        """Tests a compiled filter regex on a given rss entry"""
+        if regex.search(entry.title) or regex.search(entry.link):
+            log.debug("RSS item '%s' matches filter '%s'", entry.title, regex.pattern)
             return True
         else:
             return False
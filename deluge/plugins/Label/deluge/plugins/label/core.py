@@ -44,8 +44,11 @@
 import deluge.component as component
 from urlparse import urlparse
 
+from deluge.plugins.label.matcher import AutoMatcher
+
 import traceback
 import re
+import copy
 
 log = logging.getLogger(__name__)
 
@@ -102,15 +105,17 @@ def enable(self):
 
         #__init__
         core = component.get("Core")
-        self.config = ConfigManager("label.conf", defaults=CONFIG_DEFAULTS)
+        self.config = ConfigManager("label.conf", defaults=copy.deepcopy(CONFIG_DEFAULTS))
         self.core_cfg = ConfigManager("core.conf")
 
         #reduce typing, assigning some values to self...
+        self.torrentmanager = core.torrentmanager
         self.torrents = core.torrentmanager.torrents
         self.labels = self.config["labels"]
         self.torrent_labels = self.config["torrent_labels"]
 
         self.clean_initial_config()
+        self.build_auto_matcher()
 
         component.get("EventManager").register_event_handler("TorrentAddedEvent", self.post_torrent_add)
         component.get("EventManager").register_event_handler("TorrentRemovedEvent", self.post_torrent_remove)
@@ -139,13 +144,9 @@ def post_torrent_add(self, torrent_id, from_state):
         if from_state:
             return
         log.debug("post_torrent_add")
-        torrent = self.torrents[torrent_id]
-
-        for label_id, options in self.labels.iteritems():
-            if options["auto_add"]:
-                if self._has_auto_match(torrent, options):
-                    self.set_torrent(torrent_id, label_id)
-                    return
+        label_id = self._get_auto_label(self.torrents[torrent_id])
+        if label_id:
+            self.set_torrent(torrent_id, label_id)
 
     def post_torrent_remove(self, torrent_id):
         log.debug("post_torrent_remove")
@@ -155,8 +156,12 @@ def post_torrent_remove(self, torrent_id):
     ## Utils ##
     def clean_config(self):
         """remove invalid data from config-file"""
+        # The torrents still being loaded from the state are not in
+        # self.torrents yet
+        pending_states = self.torrentmanager.pending_states
         for torrent_id, label_id in list(self.torrent_labels.iteritems()):
-            if (not label_id in self.labels) or (not torrent_id in self.torrents):
+            if (not label_id in self.labels) or (not torrent_id in self.torrents
+                                                 and not torrent_id in pending_states):
                 log.debug("label: rm %s:%s" % (torrent_id,label_id))
                 del self.torrent_labels[torrent_id]
 
@@ -197,14 +202,23 @@ def add(self, label_id):
 
         self.labels[label_id] = dict(OPTIONS_DEFAULTS)
         self.config.save()
+        self.build_auto_matcher()
 
     @export
     def remove(self, label_id):
         """remove a label"""
         CheckInput(label_id in self.labels, _("Unknown Label"))
+        torrent_ids = [torrent_id for torrent_id, label in self.torrent_labels.iteritems()
+                       if label == label_id and torrent_id in self.torrents]
         del self.labels[label_id]
         self.clean_config()
         self.config.save()
+        self.build_auto_matcher()
+
+        #update the filter tree index
+        filter_manager = component.get("FilterManager")
+        for torrent_id in torrent_ids:
+            filter_manager.update_torrent(torrent_id, [LABEL])
 
     def _set_torrent_options(self, torrent_id, label_id):
         options = self.labels[label_id]
@@ -259,13 +273,30 @@ def _unset_torrent_options(self, torrent_id, label_id):
                 }
             )
 
-    def _has_auto_match(self, torrent ,label_options):
-        """match for auto_add fields"""
-        for tracker_match in label_options["auto_add_trackers"]:
-            for tracker in torrent.trackers:
-                if tracker_match in tracker["url"]:
-                    return True
-        return False
+    def build_auto_matcher(self):
+        """
+        Builds the matcher of the auto_add_trackers of the labels, needs to be
+        called whenever the label options change.
+        """
+        patterns = []
+        for label_id, options in self.labels.iteritems():
+            if options["auto_add"]:
+                patterns.extend((tracker_match, label_id)
+                                for tracker_match in options["auto_add_trackers"])
+        self.auto_matcher = AutoMatcher(patterns)
+
+    def _get_auto_labels(self, torrent):
+        """the labels with an auto_add_trackers match in the torrent trackers"""
+        if not self.auto_matcher:
+            return set()
+        return self.auto_matcher.match(tracker["url"] for tracker in torrent.trackers)
+
+    def _get_auto_label(self, torrent):
+        """the first label matching the torrent trackers, or None"""
+        label_ids = self._get_auto_labels(torrent)
+        if label_ids:
+            return min(label_ids)
+        return None
 
     @export
     def set_options(self, label_id, options_dict):
@@ -287,6 +318,7 @@ def set_options(self, label_id, options_dict):
                 raise Exception("label: Invalid options_dict key:%s" % key)
 
         self.labels[label_id].update(options_dict)
+        self.build_auto_matcher()
 
         #apply
         for torrent_id,label in self.torrent_labels.iteritems():
@@ -294,14 +326,41 @@ def set_options(self, label_id, options_dict):
                 self._set_torrent_options(torrent_id , label_id)
 
         #auto add
-        options = self.labels[label_id]
-        if options["auto_add"]:
+        if self.labels[label_id]["auto_add"]:
             for torrent_id, torrent in self.torrents.iteritems():
-                if self._has_auto_match(torrent, options):
-                    self.set_torrent(torrent_id , label_id)
+                if label_id in self._get_auto_labels(torrent):
+                    self._set_torrent(torrent_id, label_id)
 
         self.config.save()
 
+    @export
+    def reevaluate_labels(self, torrent_ids=None):
+        """
+        Applies the auto_add labels to the torrents again, as they would be
+        when the torrents are added.  Torrents without a match keep their
+        label.
+
+        :param torrent_ids: the torrents to label, all of them if None
+        :type torrent_ids: list
+        :returns: the torrents whose label changed, {torrent_id: label_id}
+        :rtype: dict
+        """
+        if torrent_ids is None:
+            torrent_ids = self.torrents.keys()
+        changed = {}
+        if not self.auto_matcher:
+            return changed
+        for torrent_id in torrent_ids:
+            if torrent_id not in self.torrents:
+                continue
+            label_id = self._get_auto_label(self.torrents[torrent_id])
+            if label_id and label_id != self.torrent_labels.get(torrent_id):
+                self._set_torrent(torrent_id, label_id)
+                changed[torrent_id] = label_id
+        if changed:
+            self.config.save()
+        return changed
+
     @export
     def get_options(self, label_id):
         """returns the label options"""
@@ -319,15 +378,19 @@ def set_torrent(self, torrent_id , label_id):
         CheckInput((not label_id) or (label_id in self.labels)  , _("Unknown Label"))
         CheckInput(torrent_id in self.torrents  , _("Unknown Torrent"))
 
+        self._set_torrent(torrent_id, label_id)
+        self.config.save()
+
+    def _set_torrent(self, torrent_id, label_id):
+        """set_torrent without the checks or saving the config"""
         if torrent_id in self.torrent_labels:
             self._unset_torrent_options(torrent_id, self.torrent_labels[torrent_id])
             del self.torrent_labels[torrent_id]
-            self.clean_config()
         if label_id:
             self.torrent_labels[torrent_id] = label_id
             self._set_torrent_options(torrent_id, label_id)
 
-        self.config.save()
+        component.get("FilterManager").update_torrent(torrent_id, [LABEL])
 
     @export
     def get_config(self):
@@ -0,0 +1,106 @@
+#
+# matcher.py
+#
+# Copyright (C) 2011 Deluge Team
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+# 	The Free Software Foundation, Inc.,
+# 	51 Franklin Street, Fifth Floor
+# 	Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+
+from collections import deque
+
+class AutoMatcher(object):
+    """
+    Finds which of a set of patterns occur in some text, with an Aho-Corasick
+    automaton so the text is only walked once however many patterns there are.
+
+    :param patterns: (pattern, value) pairs, the values of the patterns found
+        are returned by `match`
+    :type patterns: iterable
+    """
+    def __init__(self, patterns):
+        # Each state has its transitions, failure state and the values of the
+        # patterns ending there.
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()]
+
+        for pattern, value in patterns:
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                state = next_state
+            self.output[state].add(value)
+
+        # Breadth first, so the failure state of each state is known before
+        # its children need it.
+        queue = deque(self.goto[0].itervalues())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].iteritems():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(char, 0)
+                self.fail[next_state] = fail
+                self.output[next_state] |= self.output[fail]
+
+    def __nonzero__(self):
+        return len(self.goto) > 1 or bool(self.output[0])
+
+    def match(self, texts):
+        """
+        Returns the values of the patterns found in any of the texts.
+
+        :param texts: the texts to search
+        :type texts: iterable
+        :rtype: set
+        """
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        found = set()
+        for text in texts:
+            # An empty pattern is in every text
+            found |= output[0]
+            state = 0
+            for char in text:
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                if output[state]:
+                    found |= output[state]
+        return found
@@ -33,7 +33,10 @@
 #    but you are not obligated to do so. If you do not wish to do so, delete
 #    this exception statement from your version. If you delete this exception
 
+import os
 import time
+import shutil
+import struct
 import logging
 from twisted.internet.task import LoopingCall
 
@@ -43,6 +46,8 @@
 from deluge import configmanager
 from deluge.core.rpcserver import export
 
+from ringbuffer import RingBuffer
+
 DEFAULT_PREFS = {
     "test": "NiNiNi",
     "update_interval": 1, #2 seconds.
@@ -57,6 +62,17 @@
     "stats": {}
 }
 
+# The stats history file holds the magic, version and number of series.  Each
+# series has its interval, name and values, newest first, as doubles.
+HISTORY_MAGIC = "DSTH"
+HISTORY_VERSION = 1
+HISTORY_HEADER = struct.Struct("<4sBI")
+SERIES_HEADER = struct.Struct("<IBI")
+# The name of the series holding the time of each update
+TIME_SERIES = "_time"
+# The stats that don't come from the session status
+CORE_STATS = ("num_connections", "max_download", "max_upload", "max_num_connections")
+
 log = logging.getLogger(__name__)
 
 def get_key(config, key):
@@ -65,12 +81,6 @@ def get_key(config, key):
     except KeyError:
         return None
 
-def mean(items):
-    try:
-        return sum(items)/ len(items)
-    except Exception:
-        return 0
-
 class Core(CorePluginBase):
     totals = {} #class var to catch only updating this once per session in enable.
 
@@ -78,26 +88,28 @@ def enable(self):
         log.debug("Stats plugin enabled")
         self.core = component.get("Core")
         self.stats ={}
+        self.times = {}
         self.count = {}
         self.intervals = [1, 5, 30, 300]
 
+        self.config = configmanager.ConfigManager("stats.conf", DEFAULT_PREFS)
+        self.saved_stats = configmanager.ConfigManager("stats.totals", DEFAULT_TOTALS)
+        if self.totals == {}:
+            self.totals.update(self.saved_stats.config)
+
+        self.length = max(1, self.config["length"])
+
         self.last_update = {}
         t = time.time()
         for i in self.intervals:
             self.stats[i] = {}
+            self.times[i] = RingBuffer(self.length)
             self.last_update[i] = t
             self.count[i] = 0
 
-
-        self.config = configmanager.ConfigManager("stats.conf", DEFAULT_PREFS)
-        self.saved_stats = configmanager.ConfigManager("stats.totals", DEFAULT_TOTALS)
-        if self.totals == {}:
-            self.totals.update(self.saved_stats.config)
-
-        self.length = self.config["length"]
-
-        #self.stats = get_key(self.saved_stats, "stats") or {}
         self.stats_keys = []
+        # The stats the session status doesn't have
+        self.unknown_stats = set()
         self.add_stats(
             'upload_rate',
             'download_rate',
@@ -107,6 +119,11 @@ def enable(self):
             'dht_torrents',
             'num_peers',
         )
+        self.load_history()
+        if self.saved_stats["stats"]:
+            # The stats history is kept in its own file now
+            self.migrate_stats(self.saved_stats["stats"])
+            self.saved_stats["stats"] = {}
 
         self.update_stats()
 
@@ -130,55 +147,35 @@ def add_stats(self, *stats):
                 self.stats_keys.append(stat)
             for i in self.intervals:
                 if stat not in self.stats[i]:
-                    self.stats[i][stat] = []
+                    self.stats[i][stat] = RingBuffer(self.length)
 
     def update_stats(self):
         try:
             #Get all possible stats!
-            stats = {}
-            for key in self.stats_keys:
-                #try all keys we have, very inefficient but saves having to
-                #work out where a key comes from...
-                try:
-                    stats.update(self.core.get_session_status([key]))
-                except AttributeError:
-                    pass
+            stats = self.get_session_stats()
             stats["num_connections"]  = self.core.get_num_connections()
             stats.update(self.core.get_config_values(["max_download",
                                                       "max_upload",
                                                       "max_num_connections"]))
-           # status = self.core.session.status()
-           # for stat in dir(status):
-           #     if not stat.startswith('_') and stat not in stats:
-           #         stats[stat] = getattr(status, stat, None)
 
             update_time = time.time()
             self.last_update[1] = update_time
+            self.times[1].append(update_time)
 
             #extract the ones we are interested in
             #adding them to the 1s array
-            for stat, stat_list in self.stats[1].iteritems():
-                if stat in stats:
-                    stat_list.insert(0, int(stats[stat]))
-                else:
-                    stat_list.insert(0, 0)
-                if len(stat_list) > self.length:
-                    stat_list.pop()
+            for stat, stat_buffer in self.stats[1].iteritems():
+                stat_buffer.append(int(stats.get(stat, 0)))
 
             def update_interval(interval, base, multiplier):
                 self.count[interval] = self.count[interval] + 1
                 if self.count[interval] >= interval:
                     self.last_update[interval] = update_time
+                    self.times[interval].append(update_time)
                     self.count[interval] =  0
                     current_stats = self.stats[interval]
-                    for stat, stat_list in self.stats[base].iteritems():
-                        try:
-                            avg = mean(stat_list[0:multiplier])
-                        except ValueError:
-                            avg = 0
-                        current_stats[stat].insert(0, avg)
-                        if len(current_stats[stat]) > self.length:
-                            current_stats[stat].pop()
+                    for stat, stat_buffer in self.stats[base].iteritems():
+                        current_stats[stat].append(stat_buffer.mean(multiplier))
 
             update_interval(5, 1, 5)
             update_interval(30, 5, 6)
@@ -188,26 +185,144 @@ def update_interval(interval, base, multiplier):
             log.error("Stats update error %s" % e)
         return True
 
+    def get_session_stats(self):
+        """Returns the stats that come from the session status"""
+        keys = [key for key in self.stats_keys
+                if key not in CORE_STATS and key not in self.unknown_stats]
+        try:
+            return self.core.get_session_status(keys)
+        except AttributeError:
+            # Find out which keys the session status doesn't have
+            stats = {}
+            for key in keys:
+                try:
+                    stats.update(self.core.get_session_status([key]))
+                except AttributeError:
+                    log.warning("The session status has no stat %s", key)
+                    self.unknown_stats.add(key)
+            return stats
+
     def save_stats(self):
         try:
-            self.saved_stats["stats"] = self.stats
             self.saved_stats.config.update(self.get_totals())
             self.saved_stats.save()
+            self.save_history()
         except Exception, e:
-            log.error("Stats save error", e)
+            log.error("Stats save error %s", e)
         return True
 
+    def save_history(self):
+        """Saves the stats of each interval to the stats history file"""
+        series = []
+        for interval in self.intervals:
+            series.append((interval, TIME_SERIES, self.times[interval].latest()))
+            for stat, stat_buffer in self.stats[interval].iteritems():
+                series.append((interval, stat, stat_buffer.latest()))
+
+        data = [HISTORY_HEADER.pack(HISTORY_MAGIC, HISTORY_VERSION, len(series))]
+        for interval, name, values in series:
+            data.append(SERIES_HEADER.pack(interval, len(name), len(values)))
+            data.append(name)
+            data.append(struct.pack("<%dd" % len(values), *values))
+
+        filename = configmanager.get_config_dir("stats.history")
+        f = open(filename + ".new", "wb")
+        try:
+            f.write("".join(data))
+        finally:
+            f.close()
+        shutil.move(filename + ".new", filename)
+
+    def load_history(self):
+        """Restores the stats saved by :meth:`save_history`"""
+        filename = configmanager.get_config_dir("stats.history")
+        if not os.path.isfile(filename):
+            return
+        try:
+            data = open(filename, "rb").read()
+            magic, version, num_series = HISTORY_HEADER.unpack_from(data)
+            if magic != HISTORY_MAGIC or version != HISTORY_VERSION:
+                log.warning("Unknown stats history format, not loading it")
+                return
+            offset = HISTORY_HEADER.size
+            for index in xrange(num_series):
+                interval, name_length, count = SERIES_HEADER.unpack_from(data, offset)
+                offset += SERIES_HEADER.size
+                name = data[offset:offset + name_length]
+                offset += name_length
+                values = list(struct.unpack_from("<%dd" % count, data, offset))
+                offset += count * 8
+                if interval not in self.stats:
+                    continue
+                values.reverse()
+                if name == TIME_SERIES:
+                    self.times[interval].extend(values)
+                    if values:
+                        self.last_update[interval] = values[-1]
+                elif name in self.stats[interval]:
+                    self.stats[interval][name].extend(values)
+        except (IOError, struct.error), e:
+            log.warning("Unable to load the stats history: %s", e)
+
+    def migrate_stats(self, saved_stats):
+        """
+        Restores the stats saved in stats.totals by older versions, the lists
+        of values of each interval, newest first, without their times.
+        """
+        log.info("Moving the stats history out of stats.totals")
+        for interval, stats in saved_stats.iteritems():
+            try:
+                interval = int(interval)
+            except ValueError:
+                continue
+            if interval not in self.stats:
+                continue
+            count = 0
+            for name, values in stats.iteritems():
+                if name in self.stats[interval]:
+                    values = values[:self.length]
+                    self.stats[interval][name].extend(values[::-1])
+                    count = max(count, len(values))
+            # Only the time of the last update is known
+            last_update = self.last_update[interval]
+            self.times[interval].extend([last_update - interval * index
+                                         for index in xrange(count - 1, -1, -1)])
+        self.save_history()
 
     # export:
     @export
-    def get_stats(self, keys, interval):
+    def get_stats(self, keys, interval, since=None):
+        """
+        Returns the values of the stats for an interval, newest first.
+
+        :param keys: the stats to get
+        :type keys: list
+        :param interval: one of the intervals from :meth:`get_intervals`
+        :type interval: int
+        :param since: if set, only the values updated after this time are
+            returned
+        :type since: float
+
+        :returns: the values of each stat and the "_last_update", "_length"
+            and "_update_interval" of the interval
+        :rtype: dict
+
+        """
         if interval not in self.intervals:
             return None
 
+        count = None
+        if since is not None:
+            count = 0
+            for update_time in self.times[interval].latest():
+                if update_time <= since:
+                    break
+                count += 1
+
         stats_dict = {}
         for key in keys:
             if key in self.stats[interval]:
-                stats_dict[key] = self.stats[interval][key]
+                stats_dict[key] = self.stats[interval][key].latest(count)
 
         stats_dict["_last_update"] = self.last_update[interval]
         stats_dict["_length"] = self.config["length"]
@@ -224,20 +339,28 @@ def get_totals(self):
 
     @export
     def get_session_totals(self):
-        status = self.core.session.status()
-        return {
-            "total_upload": status.total_upload,
-            "total_download": status.total_download,
-            "total_payload_upload": status.total_payload_upload,
-            "total_payload_download": status.total_payload_download
-        }
+        return self.core.get_session_status(["total_upload", "total_download",
+                                             "total_payload_upload",
+                                             "total_payload_download"])
 
     @export
     def set_config(self, config):
         "sets the config dictionary"
+        if "length" in config:
+            config["length"] = max(1, int(config["length"]))
         for key in config.keys():
             self.config[key] = config[key]
         self.config.save()
+        if self.config["length"] != self.length:
+            self.set_length(self.config["length"])
+
+    def set_length(self, length):
+        """Changes the number of values kept for each stat and interval"""
+        self.length = length
+        for interval in self.intervals:
+            self.times[interval].resize(length)
+            for stat_buffer in self.stats[interval].itervalues():
+                stat_buffer.resize(length)
 
     @export
     def get_config(self):
@@ -0,0 +1,110 @@
+#
+# ringbuffer.py
+#
+# Copyright (C) 2011 Deluge Team
+#
+# Deluge is free software.
+#
+# You may redistribute it and/or modify it under the terms of the
+# GNU General Public License, as published by the Free Software
+# Foundation; either version 3 of the License, or (at your option)
+# any later version.
+#
+# deluge is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with deluge.    If not, write to:
+# 	The Free Software Foundation, Inc.,
+# 	51 Franklin Street, Fifth Floor
+# 	Boston, MA  02110-1301, USA.
+#
+#    In addition, as a special exception, the copyright holders give
+#    permission to link the code of portions of this program with the OpenSSL
+#    library.
+#    You must obey the GNU General Public License in all respects for all of
+#    the code used other than OpenSSL. If you modify file(s) with this
+#    exception, you may extend this exception to your version of the file(s),
+#    but you are not obligated to do so. If you do not wish to do so, delete
+#    this exception statement from your version. If you delete this exception
+#    statement from all source files in the program, then also delete it here.
+#
+
+
+from array import array
+
+class RingBuffer(object):
+    """
+    Holds the latest `length` values of a stat in a fixed size array, a new
+    value overwrites the oldest one.  The values are doubles by default,
+    the counters can be larger than a C long.
+
+    :param length: the number of values kept, at least 1
+    :type length: int
+    :param typecode: the array typecode of the values
+    :type typecode: string
+
+    :raises ValueError: if the length is less than 1
+
+    """
+    def __init__(self, length, typecode="d"):
+        if length < 1:
+            raise ValueError("The length of a RingBuffer must be at least 1")
+        self.length = length
+        self.values = array(typecode, [0]) * length
+        # Where the next value goes
+        self.index = 0
+        self.size = 0
+
+    def append(self, value):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.length
+        if self.size < self.length:
+            self.size += 1
+
+    def latest(self, count=None):
+        """
+        Returns the latest values, newest first.
+
+        :param count: the number of values, all of them if None
+        :type count: int
+
+        :rtype: list
+
+        """
+        if count is None or count > self.size:
+            count = self.size
+        if count <= 0:
+            return []
+        values = self.values[max(0, self.index - count):self.index].tolist()
+        if count > self.index:
+            # The rest are at the end of the array
+            values[:0] = self.values[self.length - count + self.index:].tolist()
+        values.reverse()
+        return values
+
+    def mean(self, count):
+        """Returns the mean of the latest `count` values"""
+        values = self.latest(count)
+        if not values:
+            return 0
+        return sum(values) // len(values)
+
+    def extend(self, values):
+        """Appends the values, oldest first"""
+        for value in values[-self.length:]:
+            self.append(value)
+
+    def resize(self, length):
+        """Changes the number of values kept, keeping the latest ones"""
+        if length < 1:
+            raise ValueError("The length of a RingBuffer must be at least 1")
+        values = self.latest(length)
+        values.reverse()
+        self.length = length
+        self.values = array(self.values.typecode, [0]) * length
+        self.index = 0
+        self.size = 0
+        self.extend(values)
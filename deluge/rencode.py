@@ -63,6 +63,7 @@
 #
 
 import struct
+from codecs import utf_8_decode
 from threading import Lock
 
 # Default number of bits for serialized floats, either 32 or 64 (also a parameter for dumps()).
@@ -109,6 +110,46 @@
 
 # Whether strings should be decoded when loading
 _decode_utf8 = False
+# The strings decoded by the current loads(), status dicts repeat the same
+# keys and many of the same values
+_utf8_cache = {}
+
+# Precompiled struct formats for the fixed size types
+_struct_int1 = struct.Struct('!b')
+_struct_int2 = struct.Struct('!h')
+_struct_int4 = struct.Struct('!l')
+_struct_int8 = struct.Struct('!q')
+_struct_float32 = struct.Struct('!f')
+_struct_float64 = struct.Struct('!d')
+
+# The typecodes of the types with their value or length embedded
+_chr_int_pos_fixed = [chr(INT_POS_FIXED_START + i) for i in range(INT_POS_FIXED_COUNT)]
+_chr_int_neg_fixed = [chr(INT_NEG_FIXED_START + i) for i in range(INT_NEG_FIXED_COUNT)]
+_chr_str_fixed = [chr(STR_FIXED_START + i) for i in range(STR_FIXED_COUNT)]
+_chr_list_fixed = [chr(LIST_FIXED_START + i) for i in range(LIST_FIXED_COUNT)]
+_chr_dict_fixed = [chr(DICT_FIXED_START + i) for i in range(DICT_FIXED_COUNT)]
+
+# The length of the strings with their length embedded, by typecode
+_str_fixed_len = dict((c, i) for i, c in enumerate(_chr_str_fixed))
+# The values that are a typecode by itself
+_fixed_values = {CHR_TRUE: True, CHR_FALSE: False, CHR_NONE: None}
+_fixed_values.update((c, i) for i, c in enumerate(_chr_int_pos_fixed))
+_fixed_values.update((c, -1-i) for i, c in enumerate(_chr_int_neg_fixed))
+# The struct of the fixed size types, by typecode
+_structs = {
+    CHR_INT1: _struct_int1,
+    CHR_INT2: _struct_int2,
+    CHR_INT4: _struct_int4,
+    CHR_INT8: _struct_int8,
+    CHR_FLOAT32: _struct_float32,
+    CHR_FLOAT64: _struct_float64
+}
+
+def decode_utf8_string(s):
+    if s in _utf8_cache:
+        return _utf8_cache[s]
+    u = _utf8_cache[s] = utf_8_decode(s, 'strict', True)[0]
+    return u
 
 def decode_int(x, f):
     f += 1
@@ -126,31 +167,19 @@ def decode_int(x, f):
         raise ValueError
     return (n, newf+1)
 
-def decode_intb(x, f):
-    f += 1
-    return (struct.unpack('!b', x[f:f+1])[0], f+1)
-
-def decode_inth(x, f):
-    f += 1
-    return (struct.unpack('!h', x[f:f+2])[0], f+2)
-
-def decode_intl(x, f):
-    f += 1
-    return (struct.unpack('!l', x[f:f+4])[0], f+4)
-
-def decode_intq(x, f):
-    f += 1
-    return (struct.unpack('!q', x[f:f+8])[0], f+8)
-
-def decode_float32(x, f):
-    f += 1
-    n = struct.unpack('!f', x[f:f+4])[0]
-    return (n, f+4)
+def make_struct_decoder(s):
+    unpack_from = s.unpack_from
+    size = s.size
+    def f(x, f):
+        return (unpack_from(x, f+1)[0], f+1+size)
+    return f
 
-def decode_float64(x, f):
-    f += 1
-    n = struct.unpack('!d', x[f:f+8])[0]
-    return (n, f+8)
+decode_intb = make_struct_decoder(_struct_int1)
+decode_inth = make_struct_decoder(_struct_int2)
+decode_intl = make_struct_decoder(_struct_int4)
+decode_intq = make_struct_decoder(_struct_int8)
+decode_float32 = make_struct_decoder(_struct_float32)
+decode_float64 = make_struct_decoder(_struct_float64)
 
 def decode_string(x, f):
     colon = x.index(':', f)
@@ -163,22 +192,63 @@ def decode_string(x, f):
     colon += 1
     s = x[colon:colon+n]
     if _decode_utf8:
-        s = s.decode('utf8')
+        s = decode_utf8_string(s)
     return (s, colon+n)
 
 def decode_list(x, f):
     r, f = [], f+1
+    append = r.append
     while x[f] != CHR_TERM:
         v, f = decode_func[x[f]](x, f)
-        r.append(v)
+        append(v)
     return (tuple(r), f + 1)
 
+def decode_dict_items(x, f, r, n=-1):
+    """
+    Decodes the items of a dict into `r`, either `n` items or up to the
+    terminator if `n` is -1.  The usual keys and values, short strings, small
+    ints and floats, are decoded in place rather than through decode_func.
+    """
+    str_fixed_len = _str_fixed_len
+    utf8_cache = _utf8_cache
+    fixed_values = _fixed_values
+    structs = _structs
+    while n:
+        c = x[f]
+        if c in str_fixed_len:
+            f += 1
+            k = x[f:f + str_fixed_len[c]]
+            f += str_fixed_len[c]
+            if _decode_utf8:
+                k = utf8_cache[k] if k in utf8_cache else decode_utf8_string(k)
+        elif c == CHR_TERM and n < 0:
+            return f + 1
+        else:
+            k, f = decode_func[c](x, f)
+
+        c = x[f]
+        if c in str_fixed_len:
+            f += 1
+            v = x[f:f + str_fixed_len[c]]
+            f += str_fixed_len[c]
+            if _decode_utf8:
+                v = utf8_cache[v] if v in utf8_cache else decode_utf8_string(v)
+        elif c in fixed_values:
+            v = fixed_values[c]
+            f += 1
+        elif c in structs:
+            v = structs[c].unpack_from(x, f + 1)[0]
+            f += 1 + structs[c].size
+        else:
+            v, f = decode_func[c](x, f)
+        r[k] = v
+        n -= 1
+    return f
+
 def decode_dict(x, f):
-    r, f = {}, f+1
-    while x[f] != CHR_TERM:
-        k, f = decode_func[x[f]](x, f)
-        r[k], f = decode_func[x[f]](x, f)
-    return (r, f + 1)
+    r = {}
+    f = decode_dict_items(x, f+1, r)
+    return (r, f)
 
 def decode_true(x, f):
   return (True, f+1)
@@ -218,7 +288,7 @@ def make_decoder(slen):
         def f(x, f):
             s = x[f+1:f+1+slen]
             if _decode_utf8:
-                s = s.decode("utf8")
+                s = decode_utf8_string(s)
             return (s, f+1+slen)
         return f
     for i in range(STR_FIXED_COUNT):
@@ -230,9 +300,10 @@ def make_fixed_length_list_decoders():
     def make_decoder(slen):
         def f(x, f):
             r, f = [], f+1
+            append = r.append
             for i in range(slen):
                 v, f = decode_func[x[f]](x, f)
-                r.append(v)
+                append(v)
             return (tuple(r), f)
         return f
     for i in range(LIST_FIXED_COUNT):
@@ -255,10 +326,8 @@ def f(x, f):
 def make_fixed_length_dict_decoders():
     def make_decoder(slen):
         def f(x, f):
-            r, f = {}, f+1
-            for j in range(slen):
-                k, f = decode_func[x[f]](x, f)
-                r[k], f = decode_func[x[f]](x, f)
+            r = {}
+            f = decode_dict_items(x, f+1, r, slen)
             return (r, f)
         return f
     for i in range(DICT_FIXED_COUNT):
@@ -266,21 +335,15 @@ def f(x, f):
 
 make_fixed_length_dict_decoders()
 
-def encode_dict(x,r):
-    r.append(CHR_DICT)
-    for k, v in x.items():
-        encode_func[type(k)](k, r)
-        encode_func[type(v)](v, r)
-    r.append(CHR_TERM)
-
-
 def loads(x, decode_utf8=False):
     global _decode_utf8
     _decode_utf8 = decode_utf8
     try:
         r, l = decode_func[x[0]](x, 0)
-    except (IndexError, KeyError):
+    except (IndexError, KeyError, struct.error):
         raise ValueError
+    finally:
+        _utf8_cache.clear()
     if l != len(x):
         raise ValueError
     return r
@@ -289,17 +352,17 @@ def loads(x, decode_utf8=False):
 
 def encode_int(x, r):
     if 0 <= x < INT_POS_FIXED_COUNT:
-        r.append(chr(INT_POS_FIXED_START+x))
+        r.append(_chr_int_pos_fixed[x])
     elif -INT_NEG_FIXED_COUNT <= x < 0:
-        r.append(chr(INT_NEG_FIXED_START-1-x))
+        r.append(_chr_int_neg_fixed[-1-x])
     elif -128 <= x < 128:
-        r.extend((CHR_INT1, struct.pack('!b', x)))
+        r.append(CHR_INT1 + _struct_int1.pack(x))
     elif -32768 <= x < 32768:
-        r.extend((CHR_INT2, struct.pack('!h', x)))
+        r.append(CHR_INT2 + _struct_int2.pack(x))
     elif -2147483648 <= x < 2147483648:
-        r.extend((CHR_INT4, struct.pack('!l', x)))
+        r.append(CHR_INT4 + _struct_int4.pack(x))
     elif -9223372036854775808 <= x < 9223372036854775808:
-        r.extend((CHR_INT8, struct.pack('!q', x)))
+        r.append(CHR_INT8 + _struct_int8.pack(x))
     else:
         s = str(x)
         if len(s) >= MAX_INT_LENGTH:
@@ -307,20 +370,20 @@ def encode_int(x, r):
         r.extend((CHR_INT, s, CHR_TERM))
 
 def encode_float32(x, r):
-    r.extend((CHR_FLOAT32, struct.pack('!f', x)))
+    r.append(CHR_FLOAT32 + _struct_float32.pack(x))
 
 def encode_float64(x, r):
-    r.extend((CHR_FLOAT64, struct.pack('!d', x)))
+    r.append(CHR_FLOAT64 + _struct_float64.pack(x))
 
 def encode_bool(x, r):
-    r.extend({False: CHR_FALSE, True: CHR_TRUE}[bool(x)])
+    r.append(x and CHR_TRUE or CHR_FALSE)
 
 def encode_none(x, r):
-    r.extend(CHR_NONE)
+    r.append(CHR_NONE)
 
 def encode_string(x, r):
     if len(x) < STR_FIXED_COUNT:
-        r.extend((chr(STR_FIXED_START + len(x)), x))
+        r.append(_chr_str_fixed[len(x)] + x)
     else:
         r.extend((str(len(x)), ':', x))
 
@@ -329,7 +392,7 @@ def encode_unicode(x, r):
 
 def encode_list(x, r):
     if len(x) < LIST_FIXED_COUNT:
-        r.append(chr(LIST_FIXED_START + len(x)))
+        r.append(_chr_list_fixed[len(x)])
         for i in x:
             encode_func[type(i)](i, r)
     else:
@@ -338,17 +401,36 @@ def encode_list(x, r):
             encode_func[type(i)](i, r)
         r.append(CHR_TERM)
 
+def encode_dict_items(x, r):
+    """
+    Encodes the items of a dict into `r`.  The usual keys and values, short
+    strings and small ints, are encoded in place rather than through
+    encode_func.
+    """
+    append = r.append
+    chr_str_fixed = _chr_str_fixed
+    chr_int_pos_fixed = _chr_int_pos_fixed
+    for k, v in x.iteritems():
+        if type(k) is StringType and len(k) < STR_FIXED_COUNT:
+            append(chr_str_fixed[len(k)] + k)
+        else:
+            encode_func[type(k)](k, r)
+
+        t = type(v)
+        if t is StringType and len(v) < STR_FIXED_COUNT:
+            append(chr_str_fixed[len(v)] + v)
+        elif t is IntType and 0 <= v < INT_POS_FIXED_COUNT:
+            append(chr_int_pos_fixed[v])
+        else:
+            encode_func[t](v, r)
+
 def encode_dict(x,r):
     if len(x) < DICT_FIXED_COUNT:
-        r.append(chr(DICT_FIXED_START + len(x)))
-        for k, v in x.items():
-            encode_func[type(k)](k, r)
-            encode_func[type(v)](v, r)
+        r.append(_chr_dict_fixed[len(x)])
+        encode_dict_items(x, r)
     else:
         r.append(CHR_DICT)
-        for k, v in x.items():
-            encode_func[type(k)](k, r)
-            encode_func[type(v)](v, r)
+        encode_dict_items(x, r)
         r.append(CHR_TERM)
 
 encode_func = {}
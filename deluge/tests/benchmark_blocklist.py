@@ -0,0 +1,64 @@
+"""
+Times parsing a synthetic 500k line emule blocklist with
+EmuleReader.read_ranges(), compared with parsing it one line at a time the
+way the readers used to.  This is not part of the test suite, run it with:
+
+    python deluge/tests/benchmark_blocklist.py [num_lines]
+
+"""
+import os
+import sys
+import time
+import tempfile
+
+import common
+
+common.add_plugin_path("Blocklist")
+from deluge.plugins.blocklist.common import IP
+from deluge.plugins.blocklist.readers import EmuleReader
+
+NUM_LINES = 500000
+
+def write_list(num_lines):
+    fd, filename = tempfile.mkstemp(suffix=".p2p")
+    blocklist = os.fdopen(fd, "w")
+    for index in xrange(num_lines):
+        start = "%d.%d.%d.0" % (index >> 16 & 255, index >> 8 & 255, index & 255)
+        end = start[:-1] + "255"
+        blocklist.write("%s - %s , 000 , Synthetic range %d\n" % (start, end, index))
+    blocklist.close()
+    return filename
+
+def read_each_line(filename):
+    # The way the readers used to parse the blocklists
+    ranges = []
+    for line in open(filename):
+        line = line.strip()
+        if line.startswith("#") or not line:
+            continue
+        start, end = line.split(" , ")[0].split(" - ")
+        ranges.append((IP.parse(start).long, IP.parse(end).long))
+    return ranges
+
+def benchmark(num_lines):
+    filename = write_list(num_lines)
+    try:
+        start = time.time()
+        parsed = read_each_line(filename)
+        per_line = time.time() - start
+
+        start = time.time()
+        ranges = EmuleReader(filename).read_ranges()
+        blocks = time.time() - start
+    finally:
+        os.remove(filename)
+
+    assert ranges == parsed
+    print "Parsing %d lines: per line %.3fs, in blocks %.3fs" % (
+        num_lines, per_line, blocks)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        benchmark(int(sys.argv[1]))
+    else:
+        benchmark(NUM_LINES)
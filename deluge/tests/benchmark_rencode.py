@@ -0,0 +1,45 @@
+"""
+Times rencode dumps and loads on a get_torrents_status reply of 5000
+torrents.  deluge.rencode is compared with the rencode package if it is
+installed and with any other rencode.py given on the command line, for
+instance an older version of deluge.rencode:
+
+    git show <revision>:deluge/rencode.py > /tmp/old_rencode.py
+    python deluge/tests/benchmark_rencode.py /tmp/old_rencode.py
+
+This is not part of the test suite.
+
+"""
+import imp
+import sys
+import time
+
+import deluge.rencode as rencode
+
+from test_rencode import create_torrents_status
+
+NUM_TORRENTS = 5000
+
+def benchmark(paths):
+    status = create_torrents_status(NUM_TORRENTS)
+    codecs = [("deluge.rencode", rencode)]
+    try:
+        import rencode as c_rencode
+    except ImportError:
+        pass
+    else:
+        codecs.append(("rencode", c_rencode))
+    for index, path in enumerate(paths):
+        codecs.append((path, imp.load_source("rencode_%d" % index, path)))
+
+    for name, codec in codecs:
+        start = time.time()
+        data = codec.dumps(status)
+        dumps_time = time.time() - start
+        start = time.time()
+        codec.loads(data, decode_utf8=True)
+        print "%s on %d torrents: dumps %.3fs, loads %.3fs" % (
+            name, NUM_TORRENTS, dumps_time, time.time() - start)
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1:])
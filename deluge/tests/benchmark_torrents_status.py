@@ -0,0 +1,66 @@
+"""
+Compares getting the status of 10k torrents one torrent at a time with the
+batched Core.create_torrents_status().  This is not part of the test suite,
+run it with:
+
+    python deluge/tests/benchmark_torrents_status.py [num_torrents]
+
+"""
+import sys
+import time
+
+import common
+from common import FakeComponent, FakeHandle, Struct
+
+from deluge.configmanager import ConfigManager
+from deluge.core.preferencesmanager import DEFAULT_PREFS
+from deluge.core.torrent import Torrent, status_tick
+
+from test_torrents_status import KEYS, StatusCore
+
+NUM_TORRENTS = 10000
+
+def new_tick():
+    if status_tick.delayed_call:
+        status_tick.delayed_call.cancel()
+    status_tick.advance()
+
+def benchmark(num_torrents):
+    common.set_tmp_config_dir()
+    ConfigManager("core.conf", DEFAULT_PREFS)
+    FakeComponent("RPCServer", get_session_id=lambda: 1,
+                  is_session_valid=lambda session_id: True)
+    FakeComponent("Core", session=Struct(is_paused=lambda: False))
+    FakeComponent("EventManager", emit=lambda event: None)
+
+    torrents = {}
+    for index in xrange(num_torrents):
+        torrent = Torrent(FakeHandle(index), {})
+        torrents[torrent.torrent_id] = torrent
+    core = StatusCore(torrents)
+
+    def get_each_torrent_status(keys):
+        # The way get_torrents_status used to get the status
+        status = {}
+        for torrent_id in torrents:
+            status[torrent_id] = core.get_torrent_status(torrent_id, keys)
+        return status
+
+    timings = []
+    for name, func in (
+            ("per torrent", get_each_torrent_status),
+            ("batched", lambda keys: core.create_torrents_status(torrents.keys(), keys))):
+        new_tick()
+        start = time.time()
+        func(KEYS)
+        timings.append((name, time.time() - start))
+    new_tick()
+
+    print "get_torrents_status for %d torrents: %s" % (num_torrents,
+        ", ".join("%s %.3fs" % timing for timing in timings))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        benchmark(int(sys.argv[1]))
+    else:
+        benchmark(NUM_TORRENTS)
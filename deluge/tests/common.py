@@ -5,6 +5,7 @@
 from subprocess import Popen, PIPE
 
 import deluge.common
+import deluge.component as component
 import deluge.configmanager
 import deluge.log
 
@@ -18,6 +19,15 @@ def set_tmp_config_dir():
 def rpath(*args):
     return os.path.join(os.path.dirname(__file__), *args)
 
+def add_plugin_path(name):
+    """Makes a plugin importable from the source tree"""
+    import pkg_resources
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "plugins", name)
+    if path not in sys.path:
+        sys.path.append(path)
+        pkg_resources.working_set.add_entry(path)
+        pkg_resources.fixup_namespace_packages(path)
+
 import gettext
 import locale
 import pkg_resources
@@ -59,3 +69,93 @@ def start_core():
                 "deluge.main.start_daemon()\""
             )
     return core
+
+class Struct(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class FakeTorrentInfo(object):
+    def comment(self):
+        return "comment"
+
+    def file_at(self, index):
+        return Struct(path="file/path")
+
+    def files(self):
+        return [Struct(path="file/path", size=1024, offset=0)]
+
+    def map_block(self, piece, offset, size):
+        return []
+
+    def name(self):
+        return "file"
+
+    def num_files(self):
+        return 1
+
+    def num_pieces(self):
+        return 4
+
+    def piece_length(self):
+        return 256
+
+    def piece_size(self, piece):
+        return 256
+
+    def priv(self):
+        return False
+
+    def total_size(self):
+        return 1024
+
+class FakeHandle(object):
+    """A libtorrent torrent_handle that doesn't need a session"""
+    def __init__(self, index):
+        self.index = index
+        self.status_calls = 0
+
+    def __getattr__(self, name):
+        # Anything we don't care about is a no-op
+        return lambda *args: None
+
+    def info_hash(self):
+        return "%040x" % self.index
+
+    def status(self):
+        self.status_calls += 1
+        return Struct(
+            active_time=self.index, all_time_download=1024, all_time_upload=512,
+            current_tracker="http://tracker.example.com/announce",
+            distributed_copies=1.5, download_payload_rate=100, error="",
+            last_seen_complete=0,
+            next_announce=Struct(seconds=60), num_complete=5, num_incomplete=2,
+            num_peers=4, num_seeds=1, paused=False, progress=0.5, seed_rank=0,
+            seeding_time=0, state=3, total_done=512, total_payload_download=512,
+            total_payload_upload=256, total_wanted=1024, total_wanted_done=512,
+            upload_payload_rate=50)
+
+    def has_metadata(self):
+        return True
+
+    def get_torrent_info(self):
+        return FakeTorrentInfo()
+
+    def is_paused(self):
+        return False
+
+    def is_auto_managed(self):
+        return True
+
+    def queue_position(self):
+        return self.index
+
+    def trackers(self):
+        return []
+
+    def file_priorities(self):
+        return [1]
+
+class FakeComponent(component.Component):
+    def __init__(self, name, **kwargs):
+        component.Component.__init__(self, name)
+        self.__dict__.update(kwargs)
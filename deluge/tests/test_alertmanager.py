@@ -1,6 +1,7 @@
 from twisted.trial import unittest
 
 import common
+from common import Struct
 
 from deluge.core.alertmanager import AlertManager
 from deluge.core.core import Core
@@ -36,3 +37,30 @@ def handler(alert):
         self.am.register_handler("dummy_alert", handler)
         self.am.deregister_handler(handler)
         self.assertEquals(self.am.handlers["dummy_alert"], [])
+
+    def test_handle_alerts(self):
+        class dummy_alert(object):
+            def message(self):
+                return "dummy"
+        class other_alert(dummy_alert):
+            pass
+
+        alerts = [dummy_alert(), other_alert(), dummy_alert()]
+        self.am.session = Struct(pop_alert=lambda: alerts and alerts.pop(0) or None)
+        single = []
+        batches = []
+        self.am.register_handler("dummy_alert", single.append)
+        self.am.register_handler("other_alert", single.append)
+        self.am.register_handler("dummy_alert", batches.append, batch=True)
+
+        self.am.handle_alerts(wait=True)
+        self.assertEquals([type(alert).__name__ for alert in single],
+                          ["dummy_alert", "other_alert", "dummy_alert"])
+        self.assertEquals(len(batches), 1)
+        self.assertEquals([type(alert).__name__ for alert in batches[0]],
+                          ["dummy_alert", "dummy_alert"])
+        self.assertEquals(self.am.get_stats(),
+                          {"queue_size": 3, "max_queue_size": 3, "num_alerts": 3})
+
+        self.am.deregister_handler(batches.append)
+        self.assertEquals(self.am.batch_handlers["dummy_alert"], [])
@@ -0,0 +1,90 @@
+import os
+
+from twisted.trial import unittest
+from twisted.internet import reactor
+from twisted.internet.task import deferLater
+
+import common
+from common import FakeComponent
+
+import deluge.component as component
+
+common.add_plugin_path("AutoAdd")
+from deluge.plugins.autoadd import core
+
+class AutoAddTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = common.set_tmp_config_dir()
+        self.watch_dir = os.path.join(self.config_dir, "watch")
+        os.mkdir(self.watch_dir)
+        self.added = []
+        FakeComponent("RPCServer", deregister_object=lambda obj: None)
+        FakeComponent("EventManager", register_event_handler=lambda *args: None,
+                      deregister_event_handler=lambda *args: None,
+                      emit=lambda event: None)
+        FakeComponent("TorrentManager", add=self.add)
+        FakeComponent("CorePluginManager", get_enabled_plugins=lambda: [])
+
+        self.plugin = core.Core.__new__(core.Core)
+        self.plugin.enable()
+        self.loads = []
+        self.plugin.load_torrent = self.load_torrent
+        self.watchdir_id = str(self.plugin.add({"path": self.watch_dir}))
+
+    def tearDown(self):
+        self.plugin.disable()
+        del self.plugin
+        component._ComponentRegistry.components = {}
+
+    def add(self, filedump=None, filename=None, options=None, owner=None):
+        self.added.append((filename, filedump))
+        return filename
+
+    def load_torrent(self, filename, magnet):
+        self.loads.append(os.path.basename(filename))
+        filedump = open(filename, "rb").read()
+        if filedump == "invalid":
+            raise RuntimeError("Invalid torrent")
+        return filedump
+
+    def write(self, filename, data):
+        f = open(os.path.join(self.watch_dir, filename), "wb")
+        f.write(data)
+        f.close()
+
+    def test_update_watchdir(self):
+        self.write("valid.torrent", "valid")
+        self.write("invalid.torrent", "invalid")
+        self.write("other.txt", "other")
+        self.plugin.watchdirs[self.watchdir_id]["enabled"] = True
+
+        def check(result):
+            self.assertEquals(self.added, [("valid.torrent", "valid")])
+            self.assertEquals(sorted(os.listdir(self.watch_dir)),
+                              ["invalid.torrent", "other.txt"])
+            invalid = os.path.join(self.watch_dir, "invalid.torrent")
+            self.assertEquals(self.plugin.invalid_torrents[invalid][0], 1)
+
+            # The unchanged invalid file isn't loaded again
+            del self.loads[:]
+            self.assertEquals(self.plugin.update_watchdir(self.watchdir_id), None)
+            self.assertEquals(self.loads, [])
+            self.assertEquals(self.plugin.invalid_torrents[invalid][0], 2)
+
+        return self.plugin.update_watchdir(self.watchdir_id).addCallback(check)
+
+    def test_inotify(self):
+        if not self.plugin.start_inotify():
+            raise unittest.SkipTest("inotify isn't available")
+        self.patch(core, "SETTLE_DELAY", 0.05)
+        self.plugin.enable_watchdir(self.watchdir_id)
+        self.assertEquals(self.plugin.update_timers[self.watchdir_id].interval,
+                          core.INOTIFY_POLL_INTERVAL)
+        self.write("new.torrent", "new")
+
+        def check(result):
+            self.assertEquals(self.added, [("new.torrent", "new")])
+            self.assertEquals(os.listdir(self.watch_dir), [])
+            self.assertEquals(self.plugin.settling_files, {})
+
+        return deferLater(reactor, 0.5, lambda: None).addCallback(check)
@@ -0,0 +1,151 @@
+import os
+import gzip
+
+from twisted.trial import unittest
+
+import common
+from common import FakeComponent, Struct
+
+import deluge.component as component
+
+common.add_plugin_path("Blocklist")
+from deluge.plugins.blocklist import rangecache, readers
+from deluge.plugins.blocklist.common import IP
+from deluge.plugins.blocklist.core import Core, BLOCK_RANGE
+from deluge.plugins.blocklist.readers import EmuleReader, SafePeerReader, ReaderParseError
+from deluge.plugins.blocklist.decompressers import GZipped
+
+def ip(address):
+    return IP.parse(address).long
+
+EMULE_LIST = """# A comment
+001.002.003.004 - 001.002.003.010 , 000 , Padded
+10.0.0.0 - 10.0.0.255 , 0 , Example: with a colon
+
+  10.1.0.0 - 10.1.0.9 , 0 , Indented\r
+not a range
+10.2.0.0 - 10.2.0.300 , 0 , Out of range
+"""
+
+SAFEPEER_LIST = """# A comment
+Padded:001.002.003.004-001.002.003.010
+Example: with a colon:10.0.0.0-10.0.0.255
+
+Indented:10.1.0.0-10.1.0.9\r
+not a range
+Out of range:10.2.0.0-10.2.0.300
+"""
+
+EXPECTED_RANGES = [(ip("1.2.3.4"), ip("1.2.3.10")),
+                   (ip("10.0.0.0"), ip("10.0.0.255")),
+                   (ip("10.1.0.0"), ip("10.1.0.9"))]
+
+class RangeCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = common.set_tmp_config_dir()
+        self.cache = os.path.join(self.config_dir, "blocklist.ranges")
+
+    def test_merge_ranges(self):
+        ranges = [(ip("10.0.0.0"), ip("10.0.0.255")),
+                  (ip("1.2.3.4"), ip("1.2.3.4")),
+                  # Overlapping
+                  (ip("10.0.0.128"), ip("10.0.1.10")),
+                  # Adjacent
+                  (ip("10.0.1.11"), ip("10.0.1.20")),
+                  # Inside another range
+                  (ip("10.0.0.1"), ip("10.0.0.2")),
+                  (ip("1.2.3.4"), ip("1.2.3.4")),
+                  (ip("1.2.3.6"), ip("255.255.255.255"))]
+        self.assertEquals(list(rangecache.merge_ranges(ranges)),
+                          [ip("1.2.3.4"), ip("1.2.3.4"),
+                           ip("1.2.3.6"), ip("255.255.255.255")])
+        self.assertEquals(list(rangecache.merge_ranges(ranges[:5])),
+                          [ip("1.2.3.4"), ip("1.2.3.4"),
+                           ip("10.0.0.0"), ip("10.0.1.20")])
+        self.assertEquals(list(rangecache.merge_ranges([])), [])
+
+    def test_cache(self):
+        source = os.path.join(self.config_dir, "blocklist.cache")
+        open(source, "wb").write("1.2.3.4 - 1.2.3.5 , 0 , Example\n")
+        source_hash = rangecache.file_hash(source)
+        ranges = rangecache.merge_ranges([(ip("1.2.3.4"), ip("1.2.3.5"))])
+
+        self.assertEquals(rangecache.load_cache(self.cache, source_hash), None)
+        rangecache.save_cache(self.cache, source_hash, ranges)
+        self.assertEquals(rangecache.load_cache(self.cache, source_hash), ranges)
+
+        # A cache made from another blocklist isn't used
+        open(source, "ab").write("1.2.3.7 - 1.2.3.8 , 0 , Example\n")
+        self.assertEquals(rangecache.load_cache(self.cache, rangecache.file_hash(source)), None)
+
+        # Neither is a truncated one
+        data = open(self.cache, "rb").read()
+        open(self.cache, "wb").write(data[:-1])
+        self.assertEquals(rangecache.load_cache(self.cache, source_hash), None)
+
+    def test_long_to_ip(self):
+        for address in ("0.0.0.0", "1.2.3.4", "255.255.255.255"):
+            self.assertEquals(rangecache.long_to_ip(ip(address)), address)
+
+    def test_read_ranges(self):
+        source = os.path.join(self.config_dir, "blocklist.download")
+        open(source, "wb").write("1.2.3.4 - 1.2.3.5 , 0 , Example\n"
+                                 "1.2.3.6 - 1.2.3.9 , 0 , Example\n"
+                                 "5.6.7.8 - 5.6.7.8 , 0 , Example\n")
+        FakeComponent("RPCServer", deregister_object=lambda obj: None)
+        self.addCleanup(setattr, component._ComponentRegistry, "components", {})
+        rules = []
+        core = Core.__new__(Core)
+        core.reader = EmuleReader
+        core.blocklist = Struct(add_rule=lambda *rule: rules.append(rule))
+        core.read_ranges(source)
+        expected = [("1.2.3.4", "1.2.3.9", BLOCK_RANGE),
+                    ("5.6.7.8", "5.6.7.8", BLOCK_RANGE)]
+        self.assertEquals(rules, expected)
+        self.assertEquals(core.num_blocked, 2)
+
+        # The second import doesn't parse the blocklist
+        core.reader = None
+        del rules[:]
+        core.read_ranges(source)
+        self.assertEquals(rules, expected)
+
+class ReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = common.set_tmp_config_dir()
+
+    def tearDown(self):
+        readers.CHUNK_SIZE = 1024 * 1024
+
+    def write_list(self, data, compress=False):
+        filename = os.path.join(self.config_dir, "blocklist.download")
+        if compress:
+            f = gzip.open(filename, "wb")
+        else:
+            f = open(filename, "wb")
+        f.write(data)
+        f.close()
+        return filename
+
+    def test_read_ranges(self):
+        for reader, data in ((EmuleReader, EMULE_LIST), (SafePeerReader, SAFEPEER_LIST)):
+            reader = reader(self.write_list(data))
+            self.assertEquals(reader.read_ranges(), EXPECTED_RANGES)
+            self.assertEquals(reader.num_ranges, 3)
+            self.assertEquals(reader.num_errors, 2)
+
+    def test_read_ranges_blocks(self):
+        # Lines split between blocks, and blocks without a line end
+        for chunk_size in (1, 7, 40):
+            readers.CHUNK_SIZE = chunk_size
+            reader = EmuleReader(self.write_list(EMULE_LIST.rstrip()))
+            self.assertEquals(reader.read_ranges(), EXPECTED_RANGES)
+            self.assertEquals(reader.num_errors, 2)
+
+    def test_read_ranges_compressed(self):
+        reader = GZipped(EmuleReader)(self.write_list(EMULE_LIST, compress=True))
+        self.assertEquals(reader.read_ranges(), EXPECTED_RANGES)
+
+    def test_read_ranges_wrong_format(self):
+        reader = SafePeerReader(self.write_list(EMULE_LIST))
+        self.assertRaises(ReaderParseError, reader.read_ranges)
@@ -7,6 +7,7 @@
 from deluge import error
 from deluge.core.authmanager import AUTH_LEVEL_ADMIN
 from deluge.ui.client import client, Client, DaemonSSLProxy
+from deluge.transfer import DelugeTransferProtocol
 
 
 class NoVersionSendingDaemonSSLProxy(DaemonSSLProxy):
@@ -150,3 +151,32 @@ def on_failure(failure):
 
         d.addErrback(on_failure)
         return d
+
+class OldDaemonSSLProxy(DaemonSSLProxy):
+    """A DaemonSSLProxy talking to a daemon without compression policies"""
+    def __init__(self):
+        DaemonSSLProxy.__init__(self)
+        self.host = "example.com"
+        self.protocol = DelugeTransferProtocol()
+        self.logins = []
+
+    def call(self, method, *args, **kwargs):
+        self.logins.append(kwargs)
+        if "compression" in kwargs:
+            return defer.fail(error.WrappedException(
+                "login() got an unexpected keyword argument 'compression'",
+                "TypeError", ""))
+        return defer.succeed(AUTH_LEVEL_ADMIN)
+
+class LoginCompressionTestCase(unittest.TestCase):
+    def test_login_older_daemon(self):
+        proxy = OldDaemonSSLProxy()
+
+        def on_login(result):
+            self.assertEqual(result, AUTH_LEVEL_ADMIN)
+            self.assertEqual(len(proxy.logins), 2)
+            self.assertFalse("compression" in proxy.logins[1])
+            # The older daemon compresses everything
+            self.assertEqual(proxy.protocol.get_compression(), (6, 0))
+
+        return proxy.authenticate("user", "password").addCallback(on_login)
@@ -0,0 +1,120 @@
+import sys
+import types
+
+from twisted.internet import defer
+from twisted.trial import unittest
+
+import common
+from common import FakeComponent, Struct
+
+import deluge.component as component
+
+common.add_plugin_path("Feeder")
+import deluge.plugins.feeder
+
+def import_core(test):
+    """
+    Imports the Feeder core.  feedparser is only needed to fetch the feeds,
+    when it is missing a stub is imported instead and the stub and the core
+    are removed from sys.modules once the test is done.
+    """
+    try:
+        import feedparser
+    except ImportError:
+        feedparser = types.ModuleType("feedparser")
+        feedparser.parse = lambda url, **kwargs: None
+        sys.modules["feedparser"] = feedparser
+
+        def remove_stub():
+            del sys.modules["feedparser"]
+            sys.modules.pop("deluge.plugins.feeder.core", None)
+            if hasattr(deluge.plugins.feeder, "core"):
+                del deluge.plugins.feeder.core
+        test.addCleanup(remove_stub)
+
+    from deluge.plugins.feeder import core
+    return core
+
+class FeedResult(dict):
+    """A parsed feed, which feedparser makes available as keys and attributes"""
+    def __init__(self, **kwargs):
+        dict.__init__(self, entries=[], **kwargs)
+        self.feed = Struct()
+
+class HistoryTestCase(unittest.TestCase):
+    def test_history(self):
+        History = import_core(self).History
+        history = History(["a", "b", "c", "d"], size=3)
+        self.assertEquals(history.get_links(), ["b", "c", "d"])
+        self.assertFalse("a" in history)
+
+        history.add("e")
+        history.add("c")
+        self.assertEquals(history.get_links(), ["c", "d", "e"])
+        self.assertEquals(len(history), 3)
+        self.assertFalse("b" in history)
+        self.assertTrue("e" in history)
+
+class FeederTestCase(unittest.TestCase):
+    def setUp(self):
+        core = import_core(self)
+        common.set_tmp_config_dir()
+        FakeComponent("RPCServer", deregister_object=lambda obj: None)
+        self.plugin = core.Core.__new__(core.Core)
+        self.plugin.enable()
+        self.plugin.config["feeds"]["feed"] = Struct(
+            url="http://example.com/rss", updatetime=15, cookies={})
+
+        self.fetches = []
+        def deferToThread(func, url, **kwargs):
+            self.fetches.append((url, kwargs))
+            self.fetch = defer.Deferred()
+            return self.fetch
+        self.patch(core, "threads", Struct(deferToThread=deferToThread))
+
+    def tearDown(self):
+        # The feeds can't be saved in the json config
+        self.plugin.config["feeds"].clear()
+        self.plugin.disable()
+        del self.plugin
+        component._ComponentRegistry.components = {}
+
+    def test_compile_filters(self):
+        filters = {
+            "valid": Struct(regex="ubuntu.*iso", active=True),
+            "inactive": Struct(regex="debian", active=False),
+            "empty": Struct(regex="", active=True),
+            "invalid": Struct(regex="[unclosed", active=True),
+        }
+        compiled = self.plugin.compile_filters(filters)
+        self.assertEquals([(name, f) for name, f, regex in compiled],
+                          [("valid", filters["valid"])])
+        self.assertTrue(compiled[0][2].search("Ubuntu-12.04.ISO"))
+
+    def test_update_feed_once_at_a_time(self):
+        self.plugin.update_feed("feed")
+        self.plugin.update_feed("feed")
+        self.assertEquals(len(self.fetches), 1)
+
+        self.fetch.callback(FeedResult(status=200, etag="abc", modified=None))
+        self.assertEquals(self.plugin.feed_states["feed"], ("abc", None))
+        self.assertTrue("feed" in self.plugin.feeds)
+
+        # The next fetch sends the etag of the last one
+        self.plugin.update_feed("feed")
+        self.assertEquals(self.fetches[1], ("http://example.com/rss",
+                                            {"etag": "abc", "modified": None}))
+
+    def test_update_feed_error(self):
+        self.plugin.update_feed("feed")
+        self.fetch.errback(IOError("Connection refused"))
+        self.assertFalse("feed" in self.plugin.fetching)
+        self.plugin.update_feed("feed")
+        self.assertEquals(len(self.fetches), 2)
+
+    def test_feed_not_modified(self):
+        result = FeedResult(status=200, etag="abc", modified=None)
+        self.plugin.on_feed_fetched(result, "feed")
+        self.plugin.on_feed_fetched(FeedResult(status=304), "feed")
+        self.assertTrue(self.plugin.feeds["feed"] is result)
+        self.assertEquals(self.plugin.feed_states["feed"], ("abc", None))
@@ -0,0 +1,119 @@
+from twisted.trial import unittest
+
+import common
+from common import FakeComponent, FakeHandle, Struct
+
+import deluge.component as component
+from deluge.configmanager import ConfigManager
+from deluge.event import TorrentAddedEvent, TorrentRemovedEvent, TorrentStateChangedEvent
+
+from deluge.core.core import Core
+from deluge.core.eventmanager import EventManager
+from deluge.core.filtermanager import FilterManager
+from deluge.core.pluginmanager import PluginManager
+from deluge.core.preferencesmanager import DEFAULT_PREFS
+from deluge.core.torrent import Torrent, status_tick
+
+class FakeTorrentManager(object):
+    def __init__(self):
+        self.torrents = {}
+
+    def __getitem__(self, torrent_id):
+        return self.torrents[torrent_id]
+
+    def get_torrent_list(self):
+        return self.torrents.keys()
+
+class FilterCore(Core):
+    """A Core with only the parts the FilterManager needs"""
+    def __init__(self):
+        self.torrentmanager = FakeTorrentManager()
+        self.pluginmanager = PluginManager.__new__(PluginManager)
+        self.pluginmanager.status_fields = {}
+
+class FilterManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        common.set_tmp_config_dir()
+        ConfigManager("core.conf", DEFAULT_PREFS)
+        FakeComponent("RPCServer", get_session_id=lambda: 1,
+                      emit_event=lambda event: None)
+        FakeComponent("Core", session=Struct(is_paused=lambda: False))
+        FakeComponent("AlertManager", register_handler=lambda *args, **kwargs: None)
+        self.eventmanager = EventManager()
+
+        self.core = FilterCore()
+        self.fm = FilterManager(self.core)
+        self.torrents = self.core.torrentmanager.torrents
+        self.add_torrent(0, "alice")
+        self.add_torrent(1, "alice")
+        self.add_torrent(2, "bob")
+
+    def tearDown(self):
+        if status_tick.delayed_call:
+            status_tick.delayed_call.cancel()
+        status_tick.advance()
+        component._ComponentRegistry.components = {}
+
+    def add_torrent(self, index, owner):
+        torrent = Torrent(FakeHandle(index), {}, owner=owner)
+        self.torrents[torrent.torrent_id] = torrent
+        self.eventmanager.emit(TorrentAddedEvent(torrent.torrent_id, False))
+        return torrent.torrent_id
+
+    def get_tree(self, field):
+        return dict(self.fm.get_filter_tree()[field])
+
+    def test_filter_tree(self):
+        self.assertEquals(self.get_tree("owner"), {"": 0, "alice": 2, "bob": 1})
+        self.assertEquals(self.get_tree("tracker_host"),
+                          {"All": 3, "Error": 0, "example.com": 3})
+        state_tree = self.get_tree("state")
+        self.assertEquals(state_tree["All"], 3)
+        self.assertEquals(state_tree["Downloading"], 3)
+        self.assertEquals(state_tree["Active"], 3)
+
+    def test_state_changed(self):
+        torrent_id = self.torrents.keys()[0]
+        self.torrents[torrent_id].set_state("Paused")
+        self.eventmanager.emit(TorrentStateChangedEvent(torrent_id, "Paused"))
+
+        state_tree = self.get_tree("state")
+        self.assertEquals(state_tree["Downloading"], 2)
+        self.assertEquals(state_tree["Paused"], 1)
+        self.assertEquals(state_tree["Active"], 2)
+        self.assertEquals(self.fm.filter_torrent_ids({"state": "Paused"}), [torrent_id])
+        self.assertEquals(self.fm.filter_torrent_ids({"state": ["Paused", "Active"]}), [])
+
+    def test_torrent_removed(self):
+        torrent_id = self.torrents.keys()[0]
+        owner = self.torrents.pop(torrent_id).owner
+        self.eventmanager.emit(TorrentRemovedEvent(torrent_id))
+
+        self.assertEquals(self.get_tree("state")["Downloading"], 2)
+        self.assertFalse(torrent_id in self.fm.tree_values["owner"])
+        self.assertEquals(self.fm.filter_torrent_ids({"owner": owner}),
+            [t for t in self.torrents if self.torrents[t].owner == owner])
+
+    def test_filter_torrent_ids(self):
+        bob_ids = self.fm.filter_torrent_ids({"owner": "bob"})
+        self.assertEquals(len(bob_ids), 1)
+        self.assertEquals(self.torrents[bob_ids[0]].owner, "bob")
+        self.assertEquals(len(self.fm.filter_torrent_ids({"tracker_host": "example.com"})), 3)
+        self.assertEquals(self.fm.filter_torrent_ids({"tracker_host": "Error"}), [])
+        # Fields that aren't indexed are still filtered on the status
+        self.assertEquals(len(self.fm.filter_torrent_ids({"queue": [0, 2]})), 2)
+
+    def test_register_tree_field(self):
+        labels = {}
+        self.core.pluginmanager.status_fields["label"] = lambda torrent_id: labels.get(torrent_id, "")
+        self.fm.register_tree_field("label", lambda: {"All": len(self.torrents)})
+        self.assertEquals(self.get_tree("label"), {"All": 3, "": 3})
+
+        torrent_id = self.torrents.keys()[0]
+        labels[torrent_id] = "linux"
+        self.fm.update_torrent(torrent_id, ["label"])
+        self.assertEquals(self.get_tree("label"), {"All": 3, "": 2, "linux": 1})
+        self.assertEquals(self.fm.filter_torrent_ids({"label": "linux"}), [torrent_id])
+
+        self.fm.deregister_tree_field("label")
+        self.assertFalse("label" in self.fm.get_filter_tree())
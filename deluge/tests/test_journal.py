@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from twisted.trial import unittest
+
+import common
+
+from deluge.core.journal import Journal, JournalError
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(common.set_tmp_config_dir(), "test.journal")
+
+    def test_save_load(self):
+        journal = Journal(self.path)
+        self.assertFalse(journal.exists())
+        values = {"a": {"int": 1, "float": 0.25, "unicode": u"В"}, "b": {"list": [1, 2]}}
+
+        def check(result):
+            self.assertEquals(Journal(self.path).load(), values)
+
+        return journal.save(values, values).addCallback(check)
+
+    def test_append_changes(self):
+        journal = Journal(self.path)
+        values = {"a": {"x": 1}, "b": {"x": 2}, "c": {"x": 3}}
+
+        def save_changes(result):
+            size = os.path.getsize(self.path)
+            new_values = {"a": {"x": 1}, "b": {"x": 4}}
+            d = journal.save({"b": {"x": 4}, "c": None}, new_values)
+            d.addCallback(check, new_values, size)
+            return d
+
+        def check(result, new_values, size):
+            # Only the changes were appended
+            self.assertTrue(os.path.getsize(self.path) > size)
+            self.assertEquals(journal.num_records, 5)
+            loaded = Journal(self.path)
+            self.assertEquals(loaded.load(), new_values)
+            self.assertEquals(loaded.num_records, 5)
+
+        return journal.save(values, values).addCallback(save_changes)
+
+    def test_compact(self):
+        journal = Journal(self.path, compact_ratio=1)
+        journal.num_records = 200
+        journal.size = 1
+        values = {"a": {"x": 1}}
+
+        def check(result):
+            self.assertEquals(journal.num_records, 1)
+            self.assertEquals(Journal(self.path).load(), values)
+
+        return journal.save(values, values).addCallback(check)
+
+    def test_interrupted_write(self):
+        journal = Journal(self.path)
+        values = {"a": {"x": 1}}
+
+        def interrupt(result):
+            open(self.path, "ab").write("\0\0\1\0garbage")
+            loaded = Journal(self.path)
+            self.assertEquals(loaded.load(), values)
+            return loaded.save({"b": {"x": 2}}, {"a": {"x": 1}, "b": {"x": 2}})
+
+        def check(result):
+            self.assertEquals(Journal(self.path).load(), {"a": {"x": 1}, "b": {"x": 2}})
+
+        return journal.save(values, values).addCallback(interrupt).addCallback(check)
+
+    def test_not_a_journal(self):
+        open(self.path, "wb").write("(lp0\n.")
+        self.assertRaises(JournalError, Journal(self.path).load)
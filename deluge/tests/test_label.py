@@ -0,0 +1,122 @@
+from twisted.trial import unittest
+
+import common
+from common import FakeComponent, Struct
+
+import deluge.component as component
+
+common.add_plugin_path("Label")
+from deluge.plugins.label.core import Core
+from deluge.plugins.label.matcher import AutoMatcher
+
+class AutoMatcherTestCase(unittest.TestCase):
+    def test_match(self):
+        matcher = AutoMatcher([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+        self.assertEquals(matcher.match(["ushers"]), set([1, 2, 4]))
+        self.assertEquals(matcher.match(["ahishe"]), set([1, 2, 3]))
+        self.assertEquals(matcher.match(["hi", "s"]), set())
+        self.assertEquals(matcher.match([]), set())
+
+    def test_overlapping(self):
+        matcher = AutoMatcher([("tracker.example.com", "example"),
+                               ("example", "other"), ("ample.co", "ample")])
+        self.assertEquals(matcher.match(["http://tracker.example.com/announce"]),
+                          set(["example", "other", "ample"]))
+        self.assertEquals(matcher.match(["http://tracker.example.org/announce"]),
+                          set(["other"]))
+
+    def test_empty(self):
+        self.assertFalse(AutoMatcher([]))
+        # Like a substring check, an empty pattern is always found
+        matcher = AutoMatcher([("", "all")])
+        self.assertTrue(matcher)
+        self.assertEquals(matcher.match(["anything"]), set(["all"]))
+        self.assertEquals(matcher.match([]), set())
+
+class LabelTestCase(unittest.TestCase):
+    def setUp(self):
+        common.set_tmp_config_dir()
+        self.torrents = {}
+        self.pending_states = {}
+        self.updated = []
+        FakeComponent("RPCServer", deregister_object=lambda obj: None)
+        FakeComponent("Core", torrentmanager=Struct(
+            torrents=self.torrents, pending_states=self.pending_states))
+        FakeComponent("CorePluginManager",
+                      register_status_field=lambda *args: None,
+                      deregister_status_field=lambda *args: None)
+        FakeComponent("EventManager",
+                      register_event_handler=lambda *args: None,
+                      deregister_event_handler=lambda *args: None)
+        FakeComponent("FilterManager",
+                      register_tree_field=lambda *args: None,
+                      deregister_tree_field=lambda *args: None,
+                      update_torrent=lambda torrent_id, fields: self.updated.append(torrent_id))
+        self.plugin = Core.__new__(Core)
+        self.plugin.enable()
+
+    def tearDown(self):
+        self.plugin.disable()
+        component._ComponentRegistry.components = {}
+
+    def add_torrent(self, torrent_id, *urls):
+        self.torrents[torrent_id] = Struct(trackers=[{"url": url} for url in urls])
+        self.plugin.post_torrent_add(torrent_id, False)
+
+    def add_label(self, label_id, *trackers):
+        self.plugin.add(label_id)
+        self.plugin.set_options(label_id, {"auto_add": True,
+                                           "auto_add_trackers": list(trackers)})
+
+    def test_auto_add(self):
+        self.add_label("linux", "tracker.debian.org", "ubuntu")
+        self.add_label("other", "example.com")
+        self.add_torrent("a", "http://torrent.ubuntu.com/announce")
+        self.add_torrent("b", "http://example.com/announce", "udp://tracker.debian.org")
+        self.add_torrent("c", "http://example.net/announce")
+        self.assertEquals(self.plugin.torrent_labels, {"a": "linux", "b": "linux"})
+
+        # Labels only match once auto_add is on
+        self.plugin.add("new")
+        self.plugin.set_options("new", {"auto_add_trackers": ["example.net"]})
+        self.add_torrent("d", "http://example.net/announce")
+        self.assertFalse("d" in self.plugin.torrent_labels)
+
+    def test_set_options_labels_torrents(self):
+        self.add_torrent("a", "http://example.com/announce")
+        self.add_torrent("b", "http://example.org/announce")
+        self.add_label("example", "example.com")
+        self.assertEquals(self.plugin.torrent_labels, {"a": "example"})
+
+    def test_reevaluate_labels(self):
+        self.add_label("example", "example.com")
+        self.add_torrent("a", "http://example.com/announce")
+        self.add_torrent("b", "http://example.org/announce")
+        self.plugin.set_torrent("a", "")
+        self.plugin.set_torrent("b", "example")
+        self.plugin.add("org")
+        self.plugin.set_options("org", {"auto_add_trackers": ["example.org"]})
+        self.plugin.labels["org"]["auto_add"] = True
+        self.plugin.build_auto_matcher()
+        self.assertEquals(self.plugin.reevaluate_labels(["a", "unknown"]), {"a": "example"})
+        self.assertEquals(self.plugin.reevaluate_labels(), {"b": "org"})
+        self.assertEquals(self.plugin.reevaluate_labels(), {})
+        self.assertEquals(self.plugin.torrent_labels, {"a": "example", "b": "org"})
+
+    def test_remove_label(self):
+        self.add_label("example", "example.com")
+        self.plugin.remove("example")
+        self.add_torrent("a", "http://example.com/announce")
+        self.assertEquals(self.plugin.torrent_labels, {})
+
+    def test_remove_label_while_loading(self):
+        self.add_label("example", "example.com")
+        self.add_label("other", "example.org")
+        self.add_torrent("a", "http://example.com/announce")
+        self.add_torrent("b", "http://example.org/announce")
+        # Restarted, b is not loaded yet
+        del self.torrents["b"]
+        self.pending_states["b"] = {}
+        self.plugin.remove("example")
+        self.assertEquals(self.plugin.torrent_labels, {"b": "other"})
+
@@ -0,0 +1,65 @@
+import random
+
+from twisted.trial import unittest
+
+import deluge.rencode as rencode
+
+def create_torrents_status(num_torrents):
+    """A get_torrents_status reply as the web and gtk UIs ask for it"""
+    rand = random.Random(0)
+    status = {}
+    for index in xrange(num_torrents):
+        torrent_id = "%040x" % rand.getrandbits(160)
+        status[torrent_id] = {
+            "name": "Linux.Distribution.%d.iso" % index,
+            "state": rand.choice(["Downloading", "Seeding", "Paused", "Queued"]),
+            "progress": rand.random() * 100,
+            "num_seeds": rand.randint(0, 50),
+            "total_seeds": rand.randint(0, 5000),
+            "num_peers": rand.randint(0, 50),
+            "total_peers": rand.randint(0, 50000),
+            "download_payload_rate": rand.random() * 1000000,
+            "upload_payload_rate": rand.random() * 100000,
+            "eta": rand.randint(-1, 10000000),
+            "ratio": rand.random(),
+            "distributed_copies": rand.random() * 10,
+            "is_auto_managed": True,
+            "time_added": 1300000000 + rand.random() * 100000000,
+            "tracker_host": "example.com",
+            "save_path": u"/home/user/T\xe9l\xe9chargements",
+            "total_done": rand.randint(0, 2 ** 34),
+            "total_uploaded": rand.randint(0, 2 ** 34),
+            "max_download_speed": -1,
+            "max_upload_speed": -1.0,
+            "seeds_peers_ratio": rand.random(),
+            "queue": index,
+            "label": "",
+            "message": "OK",
+            "owner": "localclient",
+        }
+    return status
+
+class RencodeTestCase(unittest.TestCase):
+    def test_rencode(self):
+        rencode.test()
+
+    def test_known_encoding(self):
+        # The encoding must not change, it's the wire format
+        data = (1, "ab", u"\xe9", (-1, -40, 200, 70000, 2 ** 40, 2 ** 70), 1.5,
+                None, True, "x" * 70)
+        encoded = ("c80182616282c3a9c6463ed83f00c840000111704100000100000000003d"
+                   "313138303539313632303731373431313330333432347f423fc000004543"
+                   "37303a" + "78" * 70).decode("hex")
+        self.assertEquals(rencode.dumps(list(data)), encoded)
+        self.assertEquals(rencode.loads(encoded, decode_utf8=True), data)
+
+    def test_torrents_status(self):
+        status = create_torrents_status(10)
+        loaded = rencode.loads(rencode.dumps(status, 64), decode_utf8=True)
+        self.assertEquals(loaded, status)
+        self.assertTrue(isinstance(loaded.values()[0]["name"], unicode))
+
+    def test_truncated(self):
+        data = rencode.dumps(create_torrents_status(1))
+        self.assertRaises(ValueError, rencode.loads, data[:-1])
+        self.assertRaises(ValueError, rencode.loads, data[:-5])
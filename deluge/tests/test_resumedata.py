@@ -0,0 +1,57 @@
+import os
+
+from twisted.trial import unittest
+
+import common
+
+from deluge.core.resumedata import ResumeDataStore
+
+class ResumeDataStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(common.set_tmp_config_dir(), "resume")
+        self.store = ResumeDataStore(self.path)
+
+    def test_save_get(self):
+        changes = {"aa01": "d1:ai1ee", "aa02": "d1:ai2ee", "bb01": "d1:ai3ee"}
+
+        def check(failed):
+            self.assertEquals(failed, {})
+            self.assertEquals(sorted(os.listdir(self.path)),
+                              ["aa.fastresume", "bb.fastresume"])
+            store = ResumeDataStore(self.path)
+            self.assertEquals(store.get("aa02"), "d1:ai2ee")
+            # Only the shard of the torrent asked for is read
+            self.assertEquals(store.cache.keys(), ["aa"])
+            self.assertEquals(store.get("cc01"), None)
+            store.clear_cache()
+            self.assertEquals(store.cache, {})
+
+        return self.store.save(changes).addCallback(check)
+
+    def test_only_changed_shards_written(self):
+        changes = {"aa01": "d1:ai1ee", "bb01": "d1:ai3ee"}
+
+        def save_changes(result):
+            os.remove(os.path.join(self.path, "bb.fastresume"))
+            return self.store.save({"aa02": "d1:ai2ee"})
+
+        def check(result):
+            self.assertEquals(os.listdir(self.path), ["aa.fastresume"])
+            store = ResumeDataStore(self.path)
+            self.assertEquals(store.get("aa01"), "d1:ai1ee")
+            self.assertEquals(store.get("aa02"), "d1:ai2ee")
+
+        return self.store.save(changes).addCallback(save_changes).addCallback(check)
+
+    def test_remove(self):
+        def remove(result):
+            return self.store.save({"aa01": None, "bb01": None})
+
+        def check(result):
+            self.assertEquals(os.listdir(self.path), ["aa.fastresume"])
+            store = ResumeDataStore(self.path)
+            self.assertEquals(store.get("aa01"), None)
+            self.assertEquals(store.get("aa02"), "d1:ai2ee")
+
+        d = self.store.save({"aa01": "d1:ai1ee", "aa02": "d1:ai2ee", "bb01": "d1:ai3ee"})
+        return d.addCallback(remove).addCallback(check)
@@ -0,0 +1,212 @@
+import os
+
+from twisted.trial import unittest
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.task import deferLater
+from twisted.internet.error import ConnectionDone
+from twisted.python.failure import Failure
+
+import common
+from common import Struct
+
+import deluge.component as component
+import deluge.rencode as rencode
+from deluge.common import json
+from deluge.error import DelugeError
+from deluge.event import TorrentStateChangedEvent, TorrentRemovedEvent
+from deluge.core.rpcserver import RPCServer, RPC_EVENT, RPC_RESPONSE, export
+from deluge.core.perfstats import LATENCY_BUCKETS
+from deluge.core.authmanager import AUTH_LEVEL_ADMIN
+from deluge.ui.client import DelugeRPCProtocol, DelugeRPCRequest
+
+class FakeTransport(object):
+    def __init__(self, sessionno):
+        self.sessionno = sessionno
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+class Receiver(object):
+    """Decodes the messages written to a transport"""
+    def __init__(self, transport):
+        from deluge.transfer import DelugeTransferProtocol
+        self.protocol = DelugeTransferProtocol()
+        self.messages = []
+        self.protocol.message_received = self.messages.append
+        for data in transport.writes:
+            self.protocol.dataReceived(data)
+
+class RPCServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.rpcserver = RPCServer(listen=False)
+        self.factory = self.rpcserver.factory
+        self.protocols = [self.connect(sessionno) for sessionno in range(3)]
+
+    def tearDown(self):
+        component._ComponentRegistry.components = {}
+
+    def connect(self, sessionno):
+        protocol = self.factory.protocol()
+        protocol.factory = self.factory
+        protocol.transport = FakeTransport(sessionno)
+        self.factory.authorized_sessions[sessionno] = (AUTH_LEVEL_ADMIN, "localclient")
+        self.factory.session_protocols[sessionno] = protocol
+        protocol.dispatch(1, "daemon.set_event_interest", [["TorrentStateChangedEvent"]], {})
+        protocol.pending_frames = []
+        return protocol
+
+    def next_tick(self):
+        return deferLater(reactor, 0, lambda: None)
+
+    def test_emit_event_batched(self):
+        for index in range(100):
+            self.rpcserver.emit_event(TorrentStateChangedEvent(str(index), "Paused"))
+        self.rpcserver.emit_event(TorrentRemovedEvent("0"))
+
+        def check(result):
+            for protocol in self.protocols:
+                # All of the events in a single write
+                self.assertEquals(len(protocol.transport.writes), 1)
+                messages = Receiver(protocol.transport).messages
+                self.assertEquals(messages[0], (RPC_EVENT, "TorrentStateChangedEvent", ("0", "Paused")))
+                self.assertEquals(len(messages), 100)
+            # The same bytes were sent to each session
+            self.assertEquals(len(set(p.transport.writes[0] for p in self.protocols)), 1)
+
+        return self.next_tick().addCallback(check)
+
+    def test_emit_event_index(self):
+        self.protocols[0].dispatch(2, "daemon.set_event_interest", [["TorrentRemovedEvent"]], {})
+        self.protocols[0].pending_frames = []
+        self.protocols[1].connectionLost(Failure(ConnectionDone()))
+        self.assertEquals(self.factory.event_sessions["TorrentStateChangedEvent"], set([0, 2]))
+
+        self.rpcserver.emit_event(TorrentRemovedEvent("0"))
+
+        def check(result):
+            messages = Receiver(self.protocols[0].transport).messages
+            self.assertEquals(messages, [(RPC_EVENT, "TorrentRemovedEvent", ("0",))])
+            self.assertEquals(self.protocols[2].transport.writes, [])
+
+        return self.next_tick().addCallback(check)
+
+    def test_events_sent_before_response(self):
+        protocol = self.protocols[0]
+        self.rpcserver.emit_event(TorrentStateChangedEvent("0", "Paused"))
+        protocol.sendData((RPC_RESPONSE, 5, True))
+
+        def check(result):
+            self.assertEquals(len(protocol.transport.writes), 1)
+            messages = Receiver(protocol.transport).messages
+            self.assertEquals([message[0] for message in messages], [RPC_EVENT, RPC_RESPONSE])
+            self.assertEquals(protocol.pending_frames, [])
+
+        return self.next_tick().addCallback(check)
+
+    def test_responses_batched(self):
+        protocol = self.protocols[0]
+        protocol.message_received(tuple((request_id, "daemon.info", [], {})
+                                        for request_id in range(10)))
+
+        def check(result):
+            # The dispatch takes a tick and sending the responses another
+            self.assertEquals(len(protocol.transport.writes), 1)
+            messages = Receiver(protocol.transport).messages
+            self.assertEquals([message[:2] for message in messages],
+                              [(RPC_RESPONSE, request_id) for request_id in range(10)])
+
+        return self.next_tick().addCallback(lambda result: self.next_tick()
+                                            ).addCallback(check)
+
+    def test_perf_stats(self):
+        class Calls(object):
+            @export()
+            def echo(self, value):
+                return value
+
+            @export()
+            def later(self):
+                return deferLater(reactor, 0.01, lambda: "done")
+
+            @export()
+            def fail(self):
+                raise DelugeError("fail")
+
+        self.rpcserver.register_object(Calls(), "calls")
+        self.factory.perf_stats.reset()
+        protocol = self.protocols[0]
+        protocol.dispatch(1, "calls.echo", ["x" * 1000], {})
+        protocol.dispatch(2, "calls.echo", ["x"], {})
+        protocol.dispatch(3, "calls.fail", [], {})
+        protocol.dispatch(4, "calls.later", [], {})
+
+        def check(result):
+            stats = self.rpcserver.get_perf_stats(reset=True)
+            echo = stats["methods"]["calls.echo"]
+            self.assertEquals(echo["calls"], 2)
+            self.assertEquals(echo["errors"], 0)
+            self.assertTrue(echo["max_response_bytes"] > 1000)
+            self.assertEquals(sum(echo["sync_time"]["histogram"]), 2)
+            self.assertEquals(stats["methods"]["calls.fail"]["errors"], 1)
+            later = stats["methods"]["calls.later"]
+            # The time waiting on the Deferred only counts in the total time
+            self.assertTrue(later["time"]["max"] >= 0.01)
+            self.assertTrue(later["sync_time"]["max"] < 0.01)
+            self.assertEquals(stats["frames"], 4)
+            self.assertTrue(stats["compression_ratio"] < 1)
+            self.assertEquals(self.rpcserver.get_perf_stats()["methods"], {})
+
+        return deferLater(reactor, 0.05, lambda: None).addCallback(check)
+
+    def test_perf_stats_dump(self):
+        path = os.path.join(common.set_tmp_config_dir(), "perf_stats.json")
+        self.rpcserver.set_perf_stats_dump(path)
+        self.rpcserver.start()
+        perf_stats = self.factory.perf_stats
+        self.assertTrue(perf_stats.lag_timer.running)
+        perf_stats.sample_lag()
+        self.rpcserver.stop()
+        self.assertFalse(perf_stats.lag_timer.running)
+        stats = json.load(open(path))
+        self.assertEquals(stats["reactor_lag"]["count"], 1)
+        self.assertEquals(stats["latency_buckets"], list(LATENCY_BUCKETS))
+
+class ClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.protocol = DelugeRPCProtocol()
+        self.protocol.transport = FakeTransport(0)
+        self.protocol.transport.getPeer = lambda: Struct(host="localhost", port=58846)
+        daemon = Struct(connect_deferred=Deferred())
+        self.protocol.factory = Struct(daemon=daemon)
+        self.protocol.connectionMade()
+
+        self.requests = []
+        for request_id in range(3):
+            request = DelugeRPCRequest()
+            request.request_id = request_id
+            request.method = "core.get_session_state"
+            request.args = ()
+            request.kwargs = {}
+            self.requests.append(request)
+
+    def test_requests_coalesced(self):
+        for request in self.requests:
+            self.protocol.send_request(request)
+        self.assertEquals(self.protocol.transport.writes, [])
+
+        def check(result):
+            self.assertEquals(Receiver(self.protocol.transport).messages,
+                              [tuple(request.format_message() for request in self.requests)])
+
+        return deferLater(reactor, 0, lambda: None).addCallback(check)
+
+    def test_send_pending_requests(self):
+        self.protocol.send_request(self.requests[0])
+        self.protocol.send_pending_requests()
+        self.assertEquals(Receiver(self.protocol.transport).messages,
+                          [(self.requests[0].format_message(),)])
+        # The delayed call has nothing left to send
+        return deferLater(reactor, 0, lambda: None).addCallback(
+            lambda result: self.assertEquals(len(self.protocol.transport.writes), 1))
@@ -0,0 +1,136 @@
+from twisted.trial import unittest
+
+import common
+from common import FakeComponent, Struct
+
+import deluge.component as component
+from deluge import configmanager
+
+common.add_plugin_path("Stats")
+from deluge.plugins.stats.core import Core
+from deluge.plugins.stats.ringbuffer import RingBuffer
+
+class RingBufferTestCase(unittest.TestCase):
+    def test_latest(self):
+        ring = RingBuffer(5)
+        self.assertEquals(ring.latest(), [])
+        ring.append(1)
+        self.assertEquals(ring.latest(), [1])
+        for value in range(2, 8):
+            ring.append(value)
+        self.assertEquals(ring.latest(), [7, 6, 5, 4, 3])
+        self.assertEquals(ring.latest(2), [7, 6])
+        self.assertEquals(ring.latest(4), [7, 6, 5, 4])
+        self.assertEquals(ring.latest(0), [])
+        self.assertEquals(ring.mean(2), 6)
+
+    def test_extend(self):
+        ring = RingBuffer(3, "d")
+        ring.extend([1.5, 2.5, 3.5, 4.5])
+        self.assertEquals(ring.latest(), [4.5, 3.5, 2.5])
+
+    def test_resize(self):
+        ring = RingBuffer(4)
+        ring.extend(range(1, 7))
+        ring.resize(2)
+        self.assertEquals(ring.latest(), [6, 5])
+        ring.resize(4)
+        self.assertEquals(ring.latest(), [6, 5])
+        ring.extend([7, 8, 9])
+        self.assertEquals(ring.latest(), [9, 8, 7, 6])
+        self.assertRaises(ValueError, ring.resize, 0)
+        self.assertRaises(ValueError, RingBuffer, 0)
+
+class StatsTestCase(unittest.TestCase):
+    def setUp(self):
+        common.set_tmp_config_dir()
+        FakeComponent("RPCServer", deregister_object=lambda obj: None)
+        self.status = Struct(upload_rate=0, download_rate=0, dht_nodes=0,
+                             dht_cache_nodes=0, dht_torrents=0, num_peers=0,
+                             total_upload=0, total_download=0,
+                             total_payload_upload=0, total_payload_download=0)
+        FakeComponent("Core", get_session_status=lambda keys: dict(
+                          (key, getattr(self.status, key)) for key in keys),
+                      get_num_connections=lambda: 7,
+                      get_config_values=lambda keys: dict.fromkeys(keys, 0))
+        self.plugins = []
+
+    def tearDown(self):
+        for plugin in self.plugins:
+            plugin.disable()
+        del self.plugins
+        component._ComponentRegistry.components = {}
+
+    def enable(self):
+        plugin = Core.__new__(Core)
+        plugin.enable()
+        self.plugins.append(plugin)
+        return plugin
+
+    def test_update_stats(self):
+        # Enabling updates the stats twice
+        plugin = self.enable()
+        for rate in range(1, 11):
+            self.status.upload_rate = rate
+            plugin.update_stats()
+        stats = plugin.get_stats(["upload_rate", "num_connections"], 1)
+        self.assertEquals(stats["upload_rate"], range(10, 0, -1) + [0, 0])
+        self.assertEquals(stats["num_connections"], [7] * 12)
+        self.assertEquals(plugin.get_stats(["upload_rate"], 5)["upload_rate"], [6, 1])
+
+        # Only the values updated after a time
+        since = plugin.times[1].latest()[3]
+        self.assertEquals(plugin.get_stats(["upload_rate"], 1, since)["upload_rate"],
+                          [10, 9, 8])
+
+    def test_history(self):
+        plugin = self.enable()
+        for rate in range(1, 6):
+            self.status.upload_rate = rate
+            plugin.update_stats()
+        plugin.save_history()
+
+        self.status.upload_rate = 6
+        restored = self.enable()
+        self.assertEquals(restored.get_stats(["upload_rate"], 1)["upload_rate"],
+                          [6, 6, 5, 4, 3, 2, 1, 0, 0])
+        self.assertEquals(restored.get_stats(["upload_rate"], 5)["upload_rate"], [1])
+        self.assertEquals(restored.times[1].latest()[2:], plugin.times[1].latest())
+
+    def test_set_length(self):
+        plugin = self.enable()
+        for rate in range(1, 6):
+            self.status.upload_rate = rate
+            plugin.update_stats()
+        plugin.set_config({"length": 3})
+        self.assertEquals(plugin.get_stats(["upload_rate"], 1)["upload_rate"], [5, 4, 3])
+        self.assertEquals(len(plugin.times[1].latest()), 3)
+        self.assertEquals(plugin.get_stats(["upload_rate"], 1)["_length"], 3)
+        plugin.set_config({"length": 0})
+        self.assertEquals(plugin.get_config()["length"], 1)
+        self.assertEquals(plugin.get_stats(["upload_rate"], 1)["upload_rate"], [5])
+
+    def test_unknown_stat(self):
+        plugin = self.enable()
+        plugin.add_stats("unknown")
+        # Counters don't fit in a 32 bit long
+        self.status.upload_rate = 2 ** 40
+        plugin.update_stats()
+        stats = plugin.get_stats(["upload_rate", "unknown"], 1)
+        self.assertEquals(stats["upload_rate"][0], 2 ** 40)
+        self.assertEquals(stats["unknown"][0], 0)
+        self.assertEquals(plugin.unknown_stats, set(["unknown"]))
+
+    def test_migrate_stats(self):
+        saved_stats = configmanager.ConfigManager("stats.totals")
+        saved_stats.config["stats"] = {"1": {"upload_rate": [3, 2, 1]},
+                                       "5": {"upload_rate": [2]}}
+        plugin = self.enable()
+        self.assertEquals(saved_stats["stats"], {})
+        # Enabling updates the stats twice
+        self.assertEquals(plugin.get_stats(["upload_rate"], 1)["upload_rate"], [0, 0, 3, 2, 1])
+        self.assertEquals(plugin.get_stats(["upload_rate"], 5)["upload_rate"], [2])
+        times = plugin.times[1].latest()
+        self.assertEquals(len(times), 5)
+        self.assertEquals(times[2] - times[3], 1)
+
@@ -0,0 +1,183 @@
+import os
+
+from twisted.internet import defer
+from twisted.trial import unittest
+
+import common
+from common import FakeComponent, Struct
+
+import deluge.component as component
+from deluge.configmanager import ConfigManager
+from deluge.core import torrentmanager
+from deluge.core.torrentmanager import TorrentManager, TorrentState
+from deluge.core.preferencesmanager import DEFAULT_PREFS
+
+class LoadTorrentManager(TorrentManager):
+    """A TorrentManager that records the torrents added from the state"""
+    def __init__(self):
+        self.torrents = {}
+        self.added = []
+        self.pending_states = {}
+        self.saved_states = {}
+        self.unsaved_states = set()
+        self.queue_changed = True
+        self.num_state_saves = 0
+        self.loading = False
+        self.resume_data_store = None
+
+    def add(self, state=None, torrent_info=None, save_state=True, resume_data=None, **kwargs):
+        self.added.append((state.torrent_id, torrent_info, resume_data))
+        self.torrents[state.torrent_id] = state
+        return state.torrent_id
+
+    def prefetch_torrent(self, torrent_state, resume_data):
+        return "info " + torrent_state.torrent_id, resume_data.get(torrent_state.torrent_id)
+
+class TorrentManagerLoadTestCase(unittest.TestCase):
+    def setUp(self):
+        common.set_tmp_config_dir()
+        ConfigManager("core.conf", DEFAULT_PREFS)
+        self.events = []
+        FakeComponent("EventManager", emit=self.events.append)
+        self.tm = LoadTorrentManager()
+        self.states = [TorrentState("%040d" % i, queue=i) for i in xrange(250)]
+        self.resume_data = dict((s.torrent_id, "resume " + s.torrent_id) for s in self.states)
+
+    def tearDown(self):
+        component._ComponentRegistry.components = {}
+
+    def test_load_torrents(self):
+        def check(result):
+            self.assertEquals(self.tm.added, [(s.torrent_id, "info " + s.torrent_id,
+                "resume " + s.torrent_id) for s in self.states])
+            self.assertEquals([e.name for e in self.events],
+                ["SessionLoadingEvent"] * 3 + ["SessionStartedEvent"])
+            self.assertEquals([e.args for e in self.events[:3]],
+                [[100, 250], [200, 250], [250, 250]])
+            self.assertEquals(self.tm.get_load_progress(), (250, 250))
+            self.assertEquals(self.tm.pending_states, {})
+            self.assertFalse(self.tm.loading)
+
+        return self.tm.load_torrents(self.states, self.resume_data).addCallback(check)
+
+    def test_stop_loading(self):
+        def on_loading(event):
+            self.events.append(event)
+            # Stop after the first batch
+            self.tm.loading = False
+
+        component.get("EventManager").emit = on_loading
+
+        def check(result):
+            self.assertEquals(len(self.tm.added), torrentmanager.LOAD_BATCH_SIZE)
+            self.assertEquals(len(self.tm.pending_states), 150)
+            self.assertEquals(self.tm.get_load_progress(), (100, 250))
+
+        return self.tm.load_torrents(self.states, self.resume_data).addCallback(check)
+
+    def test_load_torrents_with_bad_states(self):
+        bad_ids = (self.states[0].torrent_id, self.states[150].torrent_id)
+        add = self.tm.add
+        prefetch_torrent = self.tm.prefetch_torrent
+
+        def add_corrupt(state=None, **kwargs):
+            if state.torrent_id == bad_ids[0]:
+                raise AttributeError("corrupt")
+            return add(state=state, **kwargs)
+
+        def prefetch_failing(torrent_state, resume_data):
+            if torrent_state.torrent_id == bad_ids[1]:
+                raise IOError("missing torrent file")
+            return prefetch_torrent(torrent_state, resume_data)
+
+        self.tm.add = add_corrupt
+        self.tm.prefetch_torrent = prefetch_failing
+
+        def check(result):
+            self.assertEquals(len(self.tm.added), 248)
+            self.assertEquals(self.events[-1].name, "SessionStartedEvent")
+            self.assertFalse(self.tm.loading)
+            # The states of the torrents that failed to load are kept
+            self.assertEquals(sorted(self.tm.pending_states), sorted(bad_ids))
+
+        return self.tm.load_torrents(self.states, self.resume_data).addCallback(check)
+
+class FakeJournal(object):
+    def __init__(self):
+        self.saves = []
+        self.fail = False
+
+    def save(self, changes, values):
+        self.saves.append(changes)
+        if self.fail:
+            return defer.fail(IOError("disk full"))
+        return defer.succeed(None)
+
+class TorrentManagerSaveTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tm = LoadTorrentManager()
+        self.tm.state_journal = FakeJournal()
+        self.tm.saved_states = {"removed": TorrentState("removed").__dict__}
+
+    def test_failed_save_is_retried(self):
+        self.tm.state_journal.fail = True
+
+        def save_again(result):
+            self.tm.state_journal.fail = False
+            return self.tm.save_state()
+
+        def check(result):
+            # The removal that failed to be written is written again
+            self.assertEquals(self.tm.state_journal.saves, [{"removed": None}] * 2)
+            self.assertEquals(self.tm.saved_states, {})
+            return self.tm.save_state()
+
+        def check_saved(result):
+            self.assertEquals(self.tm.state_journal.saves[-1], {})
+
+        d = self.tm.save_state()
+        d.addCallback(save_again)
+        d.addCallback(check)
+        d.addCallback(check_saved)
+        return d
+
+    def test_only_changed_torrents_are_snapshot(self):
+        snapshots = []
+        def create_torrent_state(torrent):
+            snapshots.append(torrent.torrent_id)
+            return {"queue": torrent.get_queue_position(), "owner": torrent.owner}
+        self.tm.create_torrent_state = create_torrent_state
+
+        updated = []
+        for queue, torrent_id in enumerate(["a", "b", "c"]):
+            torrent = Struct(torrent_id=torrent_id, owner="", queue=queue,
+                             state_dirty=True,
+                             update_status=lambda id=torrent_id: updated.append(id))
+            torrent.get_queue_position = lambda torrent=torrent: torrent.queue
+            self.tm.torrents[torrent_id] = torrent
+        torrents = self.tm.torrents
+
+        def save_state(changed, full=False):
+            del snapshots[:]
+            for torrent_id in changed:
+                torrents[torrent_id].state_dirty = True
+            self.tm.save_state(full)
+            return sorted(snapshots), self.tm.state_journal.saves[-1]
+
+        self.assertEquals(save_state([])[0], ["a", "b", "c"])
+        self.assertFalse("removed" in self.tm.saved_states)
+
+        torrents["b"].owner = "user"
+        self.assertEquals(save_state(["b"]), (["b"], {"b": {"queue": 1, "owner": "user"}}))
+        self.assertEquals(save_state([]), ([], {}))
+
+        # Only the torrents whose queue position changed are written
+        torrents["a"].queue, torrents["c"].queue = 2, 0
+        self.tm.queue_changed = True
+        snapshot, changes = save_state([])
+        self.assertEquals(snapshot, ["a", "c"])
+        self.assertEquals(sorted(changes), ["a", "c"])
+
+        # A full save snapshots every torrent with a fresh status
+        self.assertEquals(save_state([], full=True), (["a", "b", "c"], {}))
+        self.assertEquals(sorted(updated), ["a", "b", "c"])
@@ -0,0 +1,128 @@
+from twisted.trial import unittest
+
+import common
+from common import FakeComponent, FakeHandle, Struct
+
+import deluge.component as component
+from deluge.configmanager import ConfigManager
+
+from deluge.core.core import Core
+from deluge.core.pluginmanager import PluginManager
+from deluge.core.preferencesmanager import DEFAULT_PREFS
+from deluge.core.torrent import Torrent, status_tick
+
+KEYS = ["name", "state", "progress", "num_seeds", "total_seeds", "num_peers",
+        "total_peers", "download_payload_rate", "upload_payload_rate", "eta",
+        "ratio", "distributed_copies", "is_auto_managed", "time_added",
+        "tracker_host", "save_path", "total_done", "total_uploaded",
+        "max_download_speed", "max_upload_speed", "seeds_peers_ratio",
+        "queue", "label"]
+
+class StatusCore(Core):
+    """A Core with only the parts needed for getting the torrents status"""
+    def __init__(self, torrents):
+        self.torrentmanager = Struct(torrents=torrents)
+        self.pluginmanager = PluginManager.__new__(PluginManager)
+        self.pluginmanager.status_fields = {"label": lambda torrent_id: "label"}
+
+class TorrentsStatusTestCase(unittest.TestCase):
+    def setUp(self):
+        common.set_tmp_config_dir()
+        ConfigManager("core.conf", DEFAULT_PREFS)
+        self.session_id = 1
+        FakeComponent("RPCServer", get_session_id=lambda: self.session_id,
+                      is_session_valid=lambda session_id: session_id == 1)
+        FakeComponent("Core", session=Struct(is_paused=lambda: False))
+        self.events = []
+        FakeComponent("EventManager", emit=self.events.append)
+        self.create_torrents(10)
+
+    def create_torrents(self, num_torrents):
+        self.torrents = {}
+        for index in xrange(num_torrents):
+            torrent = Torrent(FakeHandle(index), {})
+            torrent.handle.status_calls = 0
+            self.torrents[torrent.torrent_id] = torrent
+        self.core = StatusCore(self.torrents)
+
+    def tearDown(self):
+        self.new_tick()
+        component._ComponentRegistry.components = {}
+
+    def new_tick(self):
+        if status_tick.delayed_call:
+            status_tick.delayed_call.cancel()
+        status_tick.advance()
+
+    def get_each_torrent_status(self, keys):
+        # The way get_torrents_status used to get the status
+        status = {}
+        for torrent_id in self.torrents:
+            status[torrent_id] = self.core.get_torrent_status(torrent_id, keys)
+        return status
+
+    def test_torrents_status(self):
+        self.new_tick()
+        expected = self.get_each_torrent_status(KEYS)
+        status = self.core.create_torrents_status(self.torrents.keys(), KEYS)
+        self.assertEquals(status, expected)
+        self.assertEquals(len(status), 10)
+        self.assertEquals(set(status.values()[0]), set(KEYS))
+
+    def test_torrents_status_one_status_per_tick(self):
+        self.new_tick()
+        self.core.create_torrents_status(self.torrents.keys(), KEYS)
+        self.core.create_torrents_status(self.torrents.keys(), ["state"])
+        for torrent in self.torrents.values():
+            self.assertEquals(torrent.handle.status_calls, 1)
+
+    def test_torrents_status_plugin_keys_only(self):
+        status = self.core.create_torrents_status(self.torrents.keys()[:2], ["label"])
+        self.assertEquals(status.values(), [{"label": "label"}] * 2)
+
+    def test_torrents_status_removed_torrent(self):
+        status = self.core.create_torrents_status(["removed"], KEYS)
+        self.assertEquals(status, {"removed": {}})
+
+    def test_torrent_status_diff(self):
+        torrent = self.torrents.values()[0]
+        keys = ["state", "message", "progress"]
+        self.assertEquals(set(torrent.get_status(keys, diff=True)), set(keys))
+        self.assertEquals(torrent.get_status(keys, diff=True), {})
+
+        torrent.set_status_message("Error")
+        self.assertEquals(torrent.get_status(keys, diff=True), {"message": "Error"})
+        self.assertEquals(torrent.get_status(keys, diff=True), {})
+
+        # Keys not asked for before are always included
+        self.assertEquals(torrent.get_status(keys + ["queue"], diff=True),
+                          {"queue": torrent.handle.index})
+
+    def test_torrent_status_diff_sessions(self):
+        torrent = self.torrents.values()[0]
+        keys = ["state", "message"]
+        torrent.get_status(keys, diff=True)
+        self.session_id = 2
+        torrent.get_status(keys, diff=True)
+
+        torrent.set_status_message("Error")
+        self.assertEquals(torrent.get_status(keys, diff=True), {"message": "Error"})
+        self.session_id = 1
+        self.assertEquals(torrent.get_status(keys, diff=True), {"message": "Error"})
+        self.assertEquals(torrent.get_status(keys, diff=True), {})
+
+        torrent.cleanup_prev_status()
+        self.assertEquals(torrent.prev_status.keys(), [1])
+
+    def test_update_state_emits_state_changed(self):
+        torrent = self.torrents.values()[0]
+        self.assertEquals(torrent.state, "Downloading")
+        torrent.update_state()
+        self.assertEquals(self.events, [])
+
+        torrent.handle.is_paused = lambda: True
+        torrent.handle.is_auto_managed = lambda: False
+        torrent.update_state()
+        self.assertEquals(torrent.state, "Paused")
+        self.assertEquals(len(self.events), 1)
+        self.assertEquals(self.events[0].args, [torrent.torrent_id, "Paused"])
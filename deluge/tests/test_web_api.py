@@ -0,0 +1,345 @@
+import time
+import zlib
+from StringIO import StringIO
+
+from twisted.trial import unittest
+from twisted.internet.defer import Deferred, maybeDeferred, succeed
+from twisted.internet.task import Clock
+from twisted.web import server
+
+import common
+from common import FakeComponent, Struct
+
+import deluge.component as component
+import deluge.ui.web.json_api
+from deluge.common import json
+from deluge.ui.web.json_api import EventQueue, UICache, SNAPSHOT_HISTORY, \
+    LISTENER_TIMEOUT, LONG_POLL_TIMEOUT, MAX_QUEUED_EVENTS, JSON, \
+    JSON_STREAM_ITEMS, export, iter_json
+
+class FakeRequest(object):
+    def __init__(self, body):
+        self.method = "POST"
+        self.content = StringIO(body)
+        self.headers = {}
+        self.code = 200
+        self.written = []
+        self.producer = None
+        self.finished = Deferred()
+
+    def setHeader(self, name, value):
+        self.headers[name] = value
+
+    def setResponseCode(self, code):
+        self.code = code
+
+    def write(self, data):
+        self.written.append(data)
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+    def unregisterProducer(self):
+        self.producer = None
+
+    def finish(self):
+        self.finished.callback(self)
+
+    def get_response(self):
+        return json.loads(zlib.decompress("".join(self.written), zlib.MAX_WBITS + 16))
+
+class Calls(object):
+    @export
+    def echo(self, value):
+        return value
+
+    @export
+    def later(self, value):
+        return succeed(value)
+
+    @export
+    def fail(self):
+        raise Exception("fail")
+
+    @export
+    def torrents(self, count):
+        return dict(("%040x" % index, {"name": "torrent %d" % index, "progress": 0.5})
+                    for index in range(count))
+
+class UICacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.torrents = {"a": {"state": "Seeding"}, "b": {"state": "Paused"}}
+        self.status_calls = []
+        FakeComponent("SessionProxy", get_torrents_status=self.get_torrents_status)
+        self.core_calls = []
+        core = Struct(
+            get_filter_tree=lambda: self.core_call({"state": [["All", 2]]}),
+            get_session_status=lambda keys: self.core_call(dict.fromkeys(keys, 10)),
+            get_num_connections=lambda: self.core_call(5),
+            get_free_space=lambda path: self.core_call(1024))
+        self.patch(deluge.ui.web.json_api, "client", Struct(core=core))
+        self.cache = UICache()
+
+    def tearDown(self):
+        component._ComponentRegistry.components = {}
+
+    def get_torrents_status(self, filter_dict, keys):
+        d = Deferred()
+        self.status_calls.append(d)
+        return d
+
+    def core_call(self, result):
+        self.core_calls.append(result)
+        return succeed(result)
+
+    def send_status(self):
+        self.status_calls.pop().callback(
+            dict((torrent_id, dict(status)) for torrent_id, status in self.torrents.items()))
+
+    def get_torrents(self, since=None, keys=["state"]):
+        results = []
+        self.cache.get_torrents(keys, {}, since).addCallback(results.append)
+        return results
+
+    def expire(self):
+        for snapshot in self.cache.snapshots.values():
+            snapshot.time -= 10
+
+    def test_requests_share_fetch(self):
+        first = self.get_torrents()
+        second = self.get_torrents()
+        self.assertEquals(len(self.status_calls), 1)
+        self.send_status()
+        self.assertEquals(first, second)
+        self.assertEquals(first[0], (1, self.torrents, [], False))
+
+        # Within the interval the snapshot is used again
+        self.assertEquals(self.get_torrents(), first)
+        self.assertEquals(self.status_calls, [])
+
+        # Other keys get their own snapshot
+        self.get_torrents(keys=["name"])
+        self.assertEquals(len(self.status_calls), 1)
+
+    def test_delta(self):
+        self.get_torrents()
+        self.send_status()
+
+        self.expire()
+        self.torrents["a"]["state"] = "Paused"
+        self.torrents["c"] = self.torrents.pop("b")
+        result = self.get_torrents(since=1)
+        self.send_status()
+        self.assertEquals(result, [(2, {"a": {"state": "Paused"},
+                                        "c": {"state": "Paused"}}, ["b"], True)])
+
+        # Nothing changed
+        self.expire()
+        result = self.get_torrents(since=2)
+        self.send_status()
+        self.assertEquals(result, [(3, {}, [], True)])
+
+        # The changes of all the snapshots since are included
+        self.assertEquals(self.get_torrents(since=1)[0][1:], (
+            {"a": {"state": "Paused"}, "c": {"state": "Paused"}}, ["b"], True))
+
+    def test_unknown_since(self):
+        self.get_torrents()
+        self.send_status()
+        for since in (None, 5, "x"):
+            self.assertEquals(self.get_torrents(since=since),
+                              [(1, self.torrents, [], False)])
+
+        # Snapshots too old to have the changes get everything
+        for index in range(SNAPSHOT_HISTORY):
+            self.expire()
+            self.get_torrents()
+            self.send_status()
+        self.assertEquals(self.get_torrents(since=1)[0][-1], False)
+
+    def test_status_failed(self):
+        result = self.get_torrents()
+        self.status_calls.pop().errback(Exception("disconnected"))
+        self.assertEquals(result, [(None, None, [], False)])
+        self.assertEquals(self.cache.snapshots.values()[0].waiting, None)
+
+    def test_session_info(self):
+        results = []
+        for index in range(3):
+            self.cache.get_session_info("/").addCallback(results.append)
+        self.assertEquals(len(self.core_calls), 4)
+        self.assertEquals(results[0]["filters"], {"state": [["All", 2]]})
+        self.assertEquals(results[0]["stats"]["num_connections"], 5)
+        self.assertEquals(results[0]["stats"]["free_space"], 1024)
+        self.assertEquals(results[0]["stats"]["upload_protocol_rate"], 0)
+        self.assertTrue(results[0] is results[2])
+
+        self.cache.clear()
+        self.cache.get_session_info("/")
+        self.assertEquals(len(self.core_calls), 8)
+
+class EventQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.patch(deluge.ui.web.json_api, "reactor", self.clock)
+        self.handlers = {}
+        self.patch(deluge.ui.web.json_api, "client", Struct(
+            register_event_handler=self.handlers.__setitem__,
+            deregister_event_handler=lambda event, handler: self.handlers.pop(event)))
+        self.queue = EventQueue()
+        self.queue.add_listener("a", "TorrentAddedEvent")
+        self.queue.add_listener("b", "TorrentAddedEvent")
+
+    def get_events(self, listener_id):
+        results = []
+        d = maybeDeferred(self.queue.get_events, listener_id)
+        d.addCallback(results.append)
+        return results
+
+    def test_waiting_request(self):
+        events = self.get_events("a")
+        self.assertEquals(events, [])
+        self.handlers["TorrentAddedEvent"]("1", False)
+        self.handlers["TorrentAddedEvent"]("2", False)
+        # The events are sent together on the next iteration
+        self.assertEquals(events, [])
+        self.clock.advance(0)
+        self.assertEquals(events, [[("TorrentAddedEvent", ("1", False)),
+                                    ("TorrentAddedEvent", ("2", False))]])
+        self.assertEquals(self.clock.getDelayedCalls(), [])
+        # b wasn't waiting, so gets them straight away
+        self.assertEquals(len(self.get_events("b")[0]), 2)
+
+    def test_timeout(self):
+        events = self.get_events("a")
+        self.clock.advance(LONG_POLL_TIMEOUT)
+        self.assertEquals(events, [[]])
+        self.assertEquals(self.clock.getDelayedCalls(), [])
+
+    def test_requests_of_one_listener(self):
+        # Two tabs sharing a session wait on the same listener
+        first = self.get_events("a")
+        second = self.get_events("a")
+        self.assertEquals((first, second), ([], []))
+        self.assertEquals(len(self.clock.getDelayedCalls()), 2)
+        self.handlers["TorrentAddedEvent"]("1", False)
+        self.clock.advance(0)
+        self.assertEquals(first, [[("TorrentAddedEvent", ("1", False))]])
+        self.assertEquals(second, first)
+        self.assertEquals(self.clock.getDelayedCalls(), [])
+
+    def test_requests_of_one_listener_timeout(self):
+        first = self.get_events("a")
+        self.clock.advance(LONG_POLL_TIMEOUT / 2)
+        second = self.get_events("a")
+        self.clock.advance(LONG_POLL_TIMEOUT / 2)
+        # Only the oldest request timed out
+        self.assertEquals((first, second), ([[]], []))
+        self.clock.advance(LONG_POLL_TIMEOUT / 2)
+        self.assertEquals(second, [[]])
+
+    def test_bounded_queue(self):
+        for index in range(MAX_QUEUED_EVENTS + 10):
+            self.handlers["TorrentAddedEvent"](str(index), False)
+        # The same event twice in a row is only queued once
+        self.handlers["TorrentAddedEvent"]("0", False)
+        self.handlers["TorrentAddedEvent"]("0", False)
+        events = self.get_events("a")[0]
+        self.assertEquals(len(events), MAX_QUEUED_EVENTS)
+        self.assertEquals(events[0], ("TorrentAddedEvent", ("11", False)))
+        self.assertEquals(events[-1], ("TorrentAddedEvent", ("0", False)))
+
+    def test_idle_listener(self):
+        self.queue.add_listener("a", "TorrentRemovedEvent")
+        events = self.get_events("a")
+        now = [time.time() + LISTENER_TIMEOUT + 1]
+        self.patch(time, "time", lambda: now[0])
+        # a is waiting for events so only the events of b are dropped
+        self.handlers["TorrentAddedEvent"]("1", False)
+        self.clock.advance(0)
+        self.assertEquals(events, [[("TorrentAddedEvent", ("1", False))]])
+        self.assertEquals(self.get_events("b"), [])
+
+        # An idle listener keeps its subscriptions
+        now[0] += LISTENER_TIMEOUT + 1
+        self.handlers["TorrentRemovedEvent"]("1")
+        self.assertEquals(sorted(self.handlers), ["TorrentAddedEvent", "TorrentRemovedEvent"])
+        events = self.get_events("a")
+        self.assertEquals(events, [])
+        self.handlers["TorrentRemovedEvent"]("2")
+        self.clock.advance(0)
+        self.assertEquals(events, [[("TorrentRemovedEvent", ("2",))]])
+
+class JSONTestCase(unittest.TestCase):
+    def setUp(self):
+        self.patch(deluge.ui.web.json_api, "client", Struct(is_classicmode=lambda: False))
+        FakeComponent("Auth", check_request=lambda *args, **kwargs: None)
+        self.json = JSON()
+        self.json.register_object(Calls(), "calls")
+
+    def tearDown(self):
+        component._ComponentRegistry.components = {}
+
+    def call(self, data):
+        request = FakeRequest(json.dumps(data))
+        self.assertEquals(self.json.render(request), server.NOT_DONE_YET)
+        return request.finished
+
+    def test_call(self):
+        d = self.call({"method": "calls.later", "params": ["x"], "id": 1})
+        d.addCallback(lambda request: self.assertEquals(request.get_response(),
+            {"result": "x", "error": None, "id": 1}))
+        return d
+
+    def test_batch(self):
+        def check(request):
+            self.assertEquals(request.get_response(), [
+                {"result": 1, "error": None, "id": 1},
+                {"result": [2], "error": None, "id": 2},
+                {"result": None, "error": {"message": "Unknown method", "code": 2}, "id": 3},
+                {"result": None, "error": {"message": "fail", "code": 3}, "id": 4},
+                {"result": None, "error": {"message": "Invalid JSON request", "code": 4}, "id": None}])
+
+        return self.call([
+            {"method": "calls.echo", "params": [1], "id": 1},
+            {"method": "calls.later", "params": [[2]], "id": 2},
+            {"method": "calls.unknown", "params": [], "id": 3},
+            {"method": "calls.fail", "params": [], "id": 4},
+            {"method": "calls.echo"}]).addCallback(check)
+
+    def test_invalid_request(self):
+        for data in ([], {"method": "calls.echo"}):
+            request = FakeRequest(json.dumps(data))
+            self.assertEquals(self.json.render(request), "")
+            self.assertEquals(request.code, 500)
+
+    def test_streamed_response(self):
+        count = JSON_STREAM_ITEMS * 3
+        def check(request):
+            self.assertEquals(request.producer, None)
+            self.assertTrue(len(request.written) > 1)
+            response = request.get_response()
+            self.assertEquals(len(response["result"]), count)
+            self.assertEquals(response, json.loads(json.dumps(response)))
+
+        return self.call({"method": "calls.torrents", "params": [count], "id": 1}
+                         ).addCallback(check)
+
+    def test_iter_json(self):
+        data = {"list": range(JSON_STREAM_ITEMS * 2), 1: None, None: [{"a": True}],
+                "torrents": dict((str(index), {"n": index}) for index in range(JSON_STREAM_ITEMS))}
+        self.assertEquals(json.loads("".join(iter_json(data))), json.loads(json.dumps(data)))
+        self.assertEquals("".join(iter_json([1, "a"])), json.dumps([1, "a"]))
+
+    def test_iter_json_nested(self):
+        # An update_ui response, where the torrents are two levels down
+        torrents = dict(("%040x" % index, {"name": "torrent %d" % index, "progress": 0.5})
+                        for index in range(JSON_STREAM_ITEMS * 5))
+        data = {"result": {"torrents": torrents, "stats": {"num_connections": 1},
+                           "filters": {}, "connected": True},
+                "error": None, "id": 1}
+        pieces = list(iter_json(data))
+        self.assertTrue(len(pieces) > len(torrents))
+        self.assertTrue(max(len(piece) for piece in pieces) < 100)
+        self.assertEquals(json.loads("".join(pieces)), json.loads(json.dumps(data)))
+
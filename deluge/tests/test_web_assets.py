@@ -0,0 +1,91 @@
+import os
+import tempfile
+import mimetypes
+
+from twisted.trial import unittest
+from twisted.web import http
+from twisted.web.server import Request
+from twisted.web.test.requesthelper import DummyChannel
+
+import common
+
+from deluge.ui.web.common import AssetCache, VERSIONED_MAX_AGE
+
+class AssetCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = AssetCache()
+        self.path = self.write("script.js", "var a = 1;")
+
+    def write(self, filename, data, mtime=1000000000):
+        path = os.path.join(self.directory, filename)
+        open(path, "wb").write(data)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def request(self, headers={}, args={}):
+        request = Request(DummyChannel(), False)
+        request.method = "GET"
+        request.args = args
+        for name, value in headers.items():
+            request.requestHeaders.setRawHeaders(name, [value])
+        return request
+
+    def test_cached(self):
+        asset = self.cache.get(self.path)
+        self.assertEquals(asset.data, "var a = 1;")
+        self.assertEquals(asset.mime_type, mimetypes.guess_type(self.path)[0])
+        self.assertTrue(self.cache.get(self.path) is asset)
+
+        # A change to the file is picked up
+        self.write("script.js", "var a = 2;", 1000000001)
+        self.assertEquals(self.cache.get(self.path).data, "var a = 2;")
+
+        self.assertEquals(self.cache.get(self.directory), None)
+        self.assertEquals(self.cache.get(self.path + ".missing"), None)
+
+    def test_render(self):
+        asset = self.cache.get(self.path)
+        request = self.request({"accept-encoding": "gzip, deflate"})
+        self.assertEquals(asset.render(request), asset.gzipped)
+        self.assertEquals(request.responseHeaders.getRawHeaders("content-encoding"), ["gzip"])
+        self.assertEquals(request.responseHeaders.getRawHeaders("etag"), [asset.etag])
+        self.assertEquals(request.responseHeaders.getRawHeaders("cache-control"),
+                          ["public, max-age=0"])
+
+        request = self.request(args={"v": [asset.version]})
+        self.assertEquals(asset.render(request), "var a = 1;")
+        self.assertEquals(request.responseHeaders.getRawHeaders("cache-control"),
+                          ["public, max-age=%d" % VERSIONED_MAX_AGE])
+
+    def test_not_modified(self):
+        asset = self.cache.get(self.path)
+        request = self.request({"if-none-match": asset.etag})
+        self.assertEquals(asset.render(request), "")
+        self.assertEquals(request.code, http.NOT_MODIFIED)
+
+        request = self.request({"if-modified-since": asset.last_modified})
+        self.assertEquals(asset.render(request), "")
+        self.assertEquals(request.code, http.NOT_MODIFIED)
+
+        # The etag is checked before the date
+        request = self.request({"if-none-match": '"other"',
+                                "if-modified-since": asset.last_modified})
+        self.assertEquals(asset.render(request), "var a = 1;")
+        self.assertEquals(request.code, http.OK)
+
+        request = self.request({"if-modified-since": http.datetimeToString(999999999)})
+        self.assertEquals(asset.render(request), "var a = 1;")
+
+    def test_bundle(self):
+        other = self.write("other.js", "var b = 1;", 1000000005)
+        bundle = self.cache.get_bundle("bundle.js", [self.path, other, self.path + ".missing"],
+                                       "application/javascript")
+        self.assertEquals(bundle.data, "var a = 1;\nvar b = 1;")
+        self.assertEquals(bundle.mtime, 1000000005)
+        self.assertTrue(self.cache.get_bundle("bundle.js", [self.path, other],
+                                              "application/javascript") is bundle)
+
+        self.write("other.js", "var b = 2;", 1000000006)
+        bundle = self.cache.get_bundle("bundle.js", [self.path, other], "application/javascript")
+        self.assertEquals(bundle.data, "var a = 1;\nvar b = 2;")
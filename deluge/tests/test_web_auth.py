@@ -0,0 +1,107 @@
+import time
+
+from twisted.trial import unittest
+
+import common
+from common import FakeComponent
+
+import deluge.component as component
+from deluge.configmanager import ConfigManager
+from deluge.ui.web import auth
+from deluge.ui.web.auth import Auth, AuthError, AUTH_LEVEL_ADMIN, AUTH_LEVEL_NORMAL
+
+TIMEOUT = 3600
+
+class FakeRequest(object):
+    base = "/"
+
+    def __init__(self, cookie=None):
+        self.cookie = cookie
+        self.cookies = []
+
+    def getCookie(self, name):
+        return self.cookie
+
+    def addCookie(self, name, value, **kwargs):
+        self.cookies.append((name, value, kwargs["expires"]))
+        self.cookie = value
+
+class AuthTestCase(unittest.TestCase):
+    def setUp(self):
+        common.set_tmp_config_dir()
+        self.config = ConfigManager("web.conf", {"session_timeout": TIMEOUT, "sessions": {}})
+        self.config.config["sessions"] = {
+            "old": {"login": "admin", "level": AUTH_LEVEL_ADMIN, "expires": time.time() - 1},
+            "broken": {"login": "admin", "level": AUTH_LEVEL_ADMIN},
+            "valid": {"login": "admin", "level": AUTH_LEVEL_ADMIN, "expires": time.time() + 60}
+        }
+        FakeComponent("JSON", register_object=lambda obj, name: None)
+        FakeComponent("DelugeWeb", config=self.config)
+        self.now = time.time()
+        self.patch(auth.time, "time", lambda: self.now)
+        self.auth = Auth()
+
+    def tearDown(self):
+        self.auth.worker.stop()
+        self.auth.save_timer.stop()
+        component._ComponentRegistry.components = {}
+
+    def login(self):
+        request = FakeRequest()
+        self.auth._create_session(request)
+        return request
+
+    def check(self, request):
+        self.auth.check_request(request, level=AUTH_LEVEL_NORMAL)
+        return request
+
+    def test_clean_sessions(self):
+        # Sessions without an expiry are dropped on loading, expired ones when cleaned
+        self.assertEquals(sorted(self.auth.sessions), ["valid"])
+        self.now += 120
+        self.auth._clean_sessions()
+        self.assertEquals(self.auth.sessions, {})
+        self.assertEquals(self.auth.expiries, [])
+
+    def test_refresh_expiry(self):
+        request = self.login()
+        session_id = request.cookie[:32]
+        expires = self.auth.sessions[session_id]["expires"]
+
+        # The expiry is pushed back only once some of the timeout has passed
+        self.now += TIMEOUT * 0.05
+        self.check(request)
+        self.assertEquals(len(request.cookies), 1)
+        self.assertEquals(self.auth.sessions[session_id]["expires"], expires)
+
+        self.now += TIMEOUT * 0.1
+        self.check(request)
+        self.assertEquals(len(request.cookies), 2)
+        self.assertTrue(self.auth.sessions[session_id]["expires"] > expires)
+        self.assertEquals(request.session_id, session_id)
+
+        # The old expiry in the heap doesn't remove the refreshed session
+        self.now = expires + 1
+        self.auth._clean_sessions()
+        self.assertTrue(session_id in self.auth.sessions)
+
+    def test_expired_session(self):
+        request = self.login()
+        self.now += TIMEOUT + 1
+        self.assertRaises(AuthError, self.check, request)
+        self.assertEquals(request.session_id, None)
+        self.assertEquals(len(self.auth.sessions), 1)
+
+    def test_save_sessions(self):
+        self.auth.save_sessions()
+        self.assertEquals(self.config["sessions"].keys(), ["valid"])
+        request = self.login()
+        self.assertEquals(len(self.config["sessions"]), 1)
+
+        self.auth.save_sessions()
+        self.assertEquals(len(self.config["sessions"]), 2)
+        self.assertFalse(self.auth.sessions_changed)
+
+        # Requests that don't refresh the expiry leave nothing to save
+        self.check(request)
+        self.assertFalse(self.auth.sessions_changed)
@@ -47,6 +47,22 @@
 from deluge.log import LOG as log
 
 MESSAGE_HEADER_SIZE = 5
+# The first byte of the header tells if the payload is compressed
+HEADER_COMPRESSED = "D"
+HEADER_RAW = "R"
+
+# The compression policies the client and daemon can agree on in daemon.login,
+# and their zlib levels
+COMPRESSION_NONE = "none"
+COMPRESSION_FAST = "fast"
+COMPRESSION_DEFAULT = "default"
+COMPRESSION_LEVELS = {
+    COMPRESSION_NONE: 0,
+    COMPRESSION_FAST: 1,
+    COMPRESSION_DEFAULT: 6
+}
+# Payloads smaller than this are sent uncompressed once a policy is agreed on
+COMPRESSION_THRESHOLD = 512
 
 class DelugeTransferProtocol(Protocol):
     """
@@ -54,32 +70,105 @@ class DelugeTransferProtocol(Protocol):
     Data messages are transfered with a header containing
     the length of the data to be transfered (payload).
 
+    The payload is decompressed as it arrives so the received data is never
+    buffered or copied as a whole, only the header of a message is buffered.
+
+    The payload is compressed with zlib unless the peers agreed on a
+    compression policy that leaves it raw, see :meth:`set_compression`.
+
     """
     def __init__(self):
+        # The received part of the header of the next message
         self._buffer = ""
         self._message_length = 0
+        # The payload bytes of the current message still to be received, 0
+        # when waiting for a header
+        self._bytes_remaining = 0
+        # The decompressor of the current message, None for a raw payload
+        self._decompressobj = None
+        # The decompressed parts of the current message
+        self._decompressed = []
         self._bytes_received = 0
         self._bytes_sent = 0
+        # Peers that don't know about compression policies always compress
+        self._compression_level = COMPRESSION_LEVELS[COMPRESSION_DEFAULT]
+        self._compression_threshold = 0
+
+    def set_compression(self, compression, threshold=COMPRESSION_THRESHOLD):
+        """
+        Sets the compression of the messages sent from now on.  Only use this
+        once the peer is known to accept raw payloads.
+
+        :param compression: one of COMPRESSION_NONE, COMPRESSION_FAST or
+            COMPRESSION_DEFAULT
+        :type compression: string
+        :param threshold: payloads smaller than this many bytes are sent raw
+        :type threshold: int
+
+        :raises ValueError: if the compression is unknown
+
+        """
+        if compression not in COMPRESSION_LEVELS:
+            raise ValueError("Unknown compression: %s" % compression)
+        self._compression_level = COMPRESSION_LEVELS[compression]
+        self._compression_threshold = threshold
+
+    def get_compression(self):
+        """
+        Returns the compression of the sent messages, protocols with the same
+        compression frame a payload the same way.
+
+        :returns: the zlib level and the threshold
+        :rtype: tuple
+
+        """
+        return (self._compression_level, self._compression_threshold)
 
     def transfer_message(self, data):
         """
         Transfer the data.
 
-        The data will be serialized and compressed before being sent.
-        First a header is sent - containing the length of the compressed payload
-        to come as a signed integer. After the header, the payload is transfered.
+        The data will be serialized and compressed before being sent, unless
+        the compression policy leaves it raw.  First a header is sent -
+        containing whether the payload is compressed and the length of the
+        payload to come as a signed integer. After the header, the payload is
+        transfered.  Both are sent in a single write.
 
         :param data: data to be transfered in a data structure serializable by rencode.
 
         """
-        compressed = zlib.compress(rencode.dumps(data))
-        size_data = len(compressed)
+        self.transfer_frames(self.frame_message(rencode.dumps(data)))
+
+    def frame_message(self, payload):
+        """
+        Compresses a serialized message according to the compression policy
+        and puts the header in front of it.
+
+        :param payload: the data serialized with rencode
+        :type payload: string
+
+        :returns: the message as it is sent on the network
+        :rtype: string
+
+        """
+        if self._compression_level and len(payload) >= self._compression_threshold:
+            payload = zlib.compress(payload, self._compression_level)
+            header = HEADER_COMPRESSED
+        else:
+            header = HEADER_RAW
         # Store length as a signed integer (using 4 bytes). "!" denotes network byte order.
-        payload_len = struct.pack("!i", size_data)
-        header = "D" + payload_len
-        self._bytes_sent += len(header) + len(compressed)
-        self.transport.write(header)
-        self.transport.write(compressed)
+        return header + struct.pack("!i", len(payload)) + payload
+
+    def transfer_frames(self, frames):
+        """
+        Sends messages framed by :meth:`frame_message`, in a single write.
+
+        :param frames: one or more framed messages joined together
+        :type frames: string
+
+        """
+        self._bytes_sent += len(frames)
+        self.transport.write(frames)
 
     def dataReceived(self, data):
         """
@@ -89,24 +178,60 @@ def dataReceived(self, data):
                      a messsage.
 
         Global variables:
-            _buffer         - contains the data received
+            _buffer         - contains the received part of a message header
             _message_length - the length of the payload of the current message.
 
         """
-        self._buffer += data
         self._bytes_received += len(data)
+        offset = 0
+        data_length = len(data)
 
-        while len(self._buffer) >= MESSAGE_HEADER_SIZE:
-            if self._message_length == 0:
+        while offset < data_length:
+            if not self._bytes_remaining:
+                # Read the header of a new message
+                needed = MESSAGE_HEADER_SIZE - len(self._buffer)
+                self._buffer += data[offset:offset + needed]
+                offset += needed
+                if len(self._buffer) < MESSAGE_HEADER_SIZE:
+                    break
                 self._handle_new_message()
-            # We have a complete packet
-            if len(self._buffer) >= self._message_length:
-                self._handle_complete_message(self._buffer[:self._message_length])
-                # Remove message data from buffer
-                self._buffer = self._buffer[self._message_length:]
-                self._message_length = 0
+                if not self._message_length:
+                    # The rest of the data can't be parsed
+                    self._buffer = ""
+                    break
+                self._bytes_remaining = self._message_length
+                self._decompressed = []
+                continue
+
+            # Only slice the data if it holds more than the rest of the payload
+            size = min(self._bytes_remaining, data_length - offset)
+            if size == data_length:
+                chunk = data
             else:
-                break
+                chunk = data[offset:offset + size]
+            offset += size
+            self._bytes_remaining -= size
+
+            if self._decompressobj is None:
+                self._decompressed.append(chunk)
+            elif self._decompressed is not None:
+                try:
+                    self._decompressed.append(self._decompressobj.decompress(chunk))
+                    if not self._bytes_remaining:
+                        self._decompressed.append(self._decompressobj.flush())
+                except zlib.error, e:
+                    log.warn("Failed to decompress message (%d bytes): %s" %
+                             (self._message_length, str(e)))
+                    # Skip the rest of this message
+                    self._decompressed = None
+
+            if not self._bytes_remaining:
+                decompressed = self._decompressed
+                self._decompressobj = None
+                self._decompressed = []
+                self._message_length = 0
+                if decompressed is not None:
+                    self._handle_complete_message(decompressed)
 
     def _handle_new_message(self):
         """
@@ -118,7 +243,11 @@ def _handle_new_message(self):
             # Read the first bytes of the message (MESSAGE_HEADER_SIZE bytes)
             header = self._buffer[:MESSAGE_HEADER_SIZE]
             payload_len = header[1:MESSAGE_HEADER_SIZE]
-            if header[0] != 'D':
+            if header[0] == HEADER_COMPRESSED:
+                self._decompressobj = zlib.decompressobj()
+            elif header[0] == HEADER_RAW:
+                self._decompressobj = None
+            else:
                 raise Exception("Invalid header format. First byte is %d" % ord(header[0]))
             # Extract the length stored as a signed integer (using 4 bytes)
             self._message_length = struct.unpack("!i", payload_len)[0]
@@ -132,18 +261,19 @@ def _handle_new_message(self):
             self._message_length = 0
             self._buffer = ""
 
-    def _handle_complete_message(self, data):
+    def _handle_complete_message(self, decompressed):
         """
         Handles a complete message as it is transfered on the network.
 
-        :param data: a zlib compressed string encoded with rencode.
+        :param decompressed: the decompressed parts of the payload, a string
+            encoded with rencode.
 
         """
         try:
-            self.message_received(rencode.loads(zlib.decompress(data), decode_utf8=True))
+            self.message_received(rencode.loads("".join(decompressed), decode_utf8=True))
         except Exception, e:
-            log.warn("Failed to decompress (%d bytes) and load serialized data "\
-                     "with rencode: %s" % (len(data), str(e)))
+            log.warn("Failed to load serialized data (%d bytes) with rencode: %s" %
+                     (sum(len(part) for part in decompressed), str(e)))
 
     def get_bytes_recv(self):
         """
@@ -43,7 +43,8 @@
 import deluge.common
 from deluge import error
 from deluge.event import known_events
-from deluge.transfer import DelugeTransferProtocol
+from deluge.transfer import (DelugeTransferProtocol, COMPRESSION_NONE,
+                             COMPRESSION_DEFAULT, COMPRESSION_THRESHOLD)
 
 RPC_RESPONSE = 1
 RPC_ERROR = 2
@@ -101,6 +102,8 @@ class DelugeRPCProtocol(DelugeTransferProtocol):
 
     def connectionMade(self):
         self.__rpc_requests = {}
+        # The requests waiting to be sent at the end of this reactor tick
+        self.__pending_requests = []
         # Set the protocol in the daemon so it can send data
         self.factory.daemon.protocol = self
         # Get the address of the daemon that we've connected to
@@ -185,7 +188,9 @@ def message_received(self, request):
 
     def send_request(self, request):
         """
-        Sends a RPCRequest to the server.
+        Sends a RPCRequest to the server.  The request is sent at the end of
+        this reactor tick, in a single message with the other requests made
+        in it.
 
         :param request: RPCRequest
 
@@ -196,8 +201,25 @@ def send_request(self, request):
             # out the error for debugging purposes.
             self.__rpc_requests[request.request_id] = request
             #log.debug("Sending RPCRequest %s: %s", request.request_id, request)
-            # Send the request in a tuple because multiple requests can be sent at once
-            self.transfer_message((request.format_message(),))
+            message = request.format_message()
+        except Exception, e:
+            log.warn("Error occured when sending message:" + str(e))
+            return
+        if not self.__pending_requests:
+            reactor.callLater(0, self.send_pending_requests)
+        self.__pending_requests.append(message)
+
+    def send_pending_requests(self):
+        """
+        Sends the queued requests to the server in a single message.
+        """
+        if not self.__pending_requests:
+            return
+        # Send the requests in a tuple because multiple requests can be sent at once
+        requests = tuple(self.__pending_requests)
+        self.__pending_requests = []
+        try:
+            self.transfer_message(requests)
         except Exception, e:
             log.warn("Error occured when sending message:" + str(e))
 
@@ -286,6 +308,9 @@ def connect(self, host, port):
     def disconnect(self):
         log.debug("sslproxy.disconnect()")
         self.disconnect_deferred = defer.Deferred()
+        if self.protocol:
+            # Don't drop the requests made in this reactor tick
+            self.protocol.send_pending_requests()
         self.__connector.disconnect()
         return self.disconnect_deferred
 
@@ -389,19 +414,37 @@ def on_info_fail(reason):
     def __on_connect_fail(self, reason):
         self.daemon_info_deferred.errback(reason)
 
+    def get_compression(self):
+        """
+        Returns the compression policy to use with the daemon, there is no
+        point in compressing the messages on a loopback connection.
+        """
+        if self.host in ("localhost", "::1") or self.host.startswith("127."):
+            return COMPRESSION_NONE
+        return COMPRESSION_DEFAULT
+
     def authenticate(self, username, password):
         log.debug("%s.authenticate: %s", self.__class__.__name__, username)
         self.login_deferred = defer.Deferred()
-        d = self.call("daemon.login", username, password,
-                      client_version=deluge.common.get_version())
-        d.addCallback(self.__on_login, username)
-        d.addErrback(self.__on_login_fail)
+        self.__login(username, password, self.get_compression())
         return self.login_deferred
 
-    def __on_login(self, result, username):
+    def __login(self, username, password, compression):
+        kwargs = {"client_version": deluge.common.get_version()}
+        if compression is not None:
+            kwargs["compression"] = compression
+            kwargs["compression_threshold"] = COMPRESSION_THRESHOLD
+        d = self.call("daemon.login", username, password, **kwargs)
+        d.addCallback(self.__on_login, username, compression)
+        d.addErrback(self.__on_login_fail, username, password, compression)
+
+    def __on_login(self, result, username, compression):
         log.debug("__on_login called: %s %s", username, result)
         self.username = username
         self.authentication_level = result
+        if compression is not None:
+            # The daemon has switched to the same compression policy
+            self.protocol.set_compression(compression, COMPRESSION_THRESHOLD)
         # We need to tell the daemon what events we're interested in receiving
         if self.__factory.event_handlers:
             self.call("daemon.set_event_interest",
@@ -413,8 +456,15 @@ def __on_login(self, result, username):
 
         self.login_deferred.callback(result)
 
-    def __on_login_fail(self, result):
+    def __on_login_fail(self, result, username, password, compression):
         log.debug("_on_login_fail(): %s", result.value)
+        if compression is not None and result.check(error.WrappedException) and \
+                result.value.type == "TypeError":
+            # Older daemons don't know about compression policies and reject
+            # the extra arguments, login again without them
+            log.debug("Daemon does not support compression policies, logging in without")
+            self.__login(username, password, None)
+            return
         self.login_deferred.errback(result)
 
     def __on_auth_levels_mappings(self, result):
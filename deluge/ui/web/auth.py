@@ -48,13 +48,12 @@ class AuthError(Exception):
     pass
 
 import time
+import heapq
 import random
 import hashlib
 import logging
-from datetime import datetime, timedelta
 from email.utils import formatdate
 
-from twisted.internet.defer import Deferred
 from twisted.internet.task import LoopingCall
 
 from deluge import component
@@ -62,6 +61,14 @@ class AuthError(Exception):
 
 log = logging.getLogger(__name__)
 
+# How often the expired sessions are removed
+CLEAN_INTERVAL = 60
+# How often changes to the sessions are saved to the config
+SAVE_INTERVAL = 30
+# The fraction of the session timeout that has to pass before the expiry of
+# a session is pushed back
+REFRESH_FRACTION = 0.1
+
 def make_checksum(session_id):
     return reduce(lambda x,y:x+y, map(ord, session_id))
 
@@ -84,8 +91,7 @@ def get_session_id(session_id):
         return None
 
 def make_expires(timeout):
-    dt = timedelta(seconds=timeout)
-    expires = time.mktime((datetime.now() + dt).timetuple())
+    expires = time.time() + timeout
     expires_str = formatdate(timeval=expires, localtime=False, usegmt=True)
     return expires, expires_str
 
@@ -96,24 +102,64 @@ class Auth(JSONComponent):
 
     def __init__(self):
         super(Auth, self).__init__("Auth")
+        self._load_sessions()
         self.worker = LoopingCall(self._clean_sessions)
-        self.worker.start(5)
+        self.worker.start(CLEAN_INTERVAL)
+        self.save_timer = LoopingCall(self.save_sessions)
+        self.save_timer.start(SAVE_INTERVAL, now=False)
 
-    def _clean_sessions(self):
+    def _load_sessions(self):
+        """
+        Loads the sessions saved in the config, along with a heap of their
+        expiry times so the expired ones can be found without a scan.
+        """
         config = component.get("DelugeWeb").config
-        session_ids = config["sessions"].keys()
-
-        now = time.gmtime()
-        for session_id in session_ids:
-            session = config["sessions"][session_id]
-
+        sessions = config["sessions"]
+        if type(sessions) is list:
+            sessions = {}
+
+        self.sessions = {}
+        self.expiries = []
+        self.sessions_changed = False
+        for session_id, session in sessions.iteritems():
             if "expires" not in session:
-                del config["sessions"][session_id]
+                self.sessions_changed = True
                 continue
+            self.sessions[session_id] = dict(session)
+            self.expiries.append((session["expires"], session_id))
+        heapq.heapify(self.expiries)
 
-            if time.gmtime(session["expires"]) < now:
-                del config["sessions"][session_id]
-                continue
+    def _set_expires(self, session_id, expires):
+        self.sessions[session_id]["expires"] = expires
+        heapq.heappush(self.expiries, (expires, session_id))
+        self.sessions_changed = True
+
+    def _remove_session(self, session_id):
+        del self.sessions[session_id]
+        self.sessions_changed = True
+
+    def _clean_sessions(self):
+        now = time.time()
+        while self.expiries and self.expiries[0][0] < now:
+            expires, session_id = heapq.heappop(self.expiries)
+            # The heap keeps the old expiry times of refreshed sessions
+            session = self.sessions.get(session_id)
+            if session and session["expires"] == expires:
+                log.debug("Session %s has expired", session_id)
+                self._remove_session(session_id)
+
+    def save_sessions(self):
+        """
+        Saves the sessions to the config, if they have changed since they were
+        last saved.
+        """
+        if not self.sessions_changed:
+            return
+        config = component.get("DelugeWeb").config
+        config.config["sessions"] = dict((session_id, dict(session))
+            for session_id, session in self.sessions.iteritems())
+        config.save()
+        self.sessions_changed = False
 
     def _create_session(self, request, login='admin'):
         """
@@ -139,16 +185,11 @@ def _create_session(self, request, login='admin'):
                 path=request.base+"json", expires=expires_str)
 
         log.debug("Creating session for %s", login)
-        config = component.get("DelugeWeb").config
-
-        if type(config["sessions"]) is list:
-            config.config["sessions"] = {}
-
-        config["sessions"][session_id] = {
+        self.sessions[session_id] = {
             "login": login,
-            "level": AUTH_LEVEL_ADMIN,
-            "expires": expires
+            "level": AUTH_LEVEL_ADMIN
         }
+        self._set_expires(session_id, expires)
         return True
 
     def check_password(self, password):
@@ -219,21 +260,30 @@ def check_request(self, request, method=None, level=None):
         :raises: Exception
         """
 
-        config = component.get("DelugeWeb").config
         session_id = get_session_id(request.getCookie("_session_id"))
+        session = self.sessions.get(session_id)
+        now = time.time()
+
+        if session and session["expires"] < now:
+            self._remove_session(session_id)
+            session = None
 
-        if session_id not in config["sessions"]:
+        if not session:
             auth_level = AUTH_LEVEL_NONE
             session_id = None
         else:
-            session = config["sessions"][session_id]
             auth_level = session["level"]
-            expires, expires_str = make_expires(config["session_timeout"])
-            session["expires"] = expires
 
-            _session_id = request.getCookie("_session_id")
-            request.addCookie('_session_id', _session_id,
-                    path=request.base+"json", expires=expires_str)
+            # Only push the expiry back once a part of the timeout has
+            # passed, rather than on every request.
+            timeout = component.get("DelugeWeb").config["session_timeout"]
+            if now + timeout - session["expires"] >= timeout * REFRESH_FRACTION:
+                expires, expires_str = make_expires(timeout)
+                self._set_expires(session_id, expires)
+
+                _session_id = request.getCookie("_session_id")
+                request.addCookie('_session_id', _session_id,
+                        path=request.base+"json", expires=expires_str)
 
         if method:
             if not hasattr(method, "_json_export"):
@@ -303,9 +353,7 @@ def delete_session(self):
         :param session_id: the id for the session to remove
         :type session_id: string
         """
-        d = Deferred()
-        config = component.get("DelugeWeb").config
-        del config["sessions"][__request__.session_id]
+        self._remove_session(__request__.session_id)
         return True
 
     @export(AUTH_LEVEL_NONE)
@@ -33,10 +33,23 @@
 #
 #
 
+import os
+import stat
 import zlib
 import gettext
+import hashlib
+import logging
+import mimetypes
+
+from twisted.web import http
+
 from deluge import common
 
+log = logging.getLogger(__name__)
+
+# The max-age of assets requested with their version
+VERSIONED_MAX_AGE = 365 * 24 * 60 * 60
+
 _ = lambda x: gettext.gettext(x).decode("utf-8")
 
 def escape(text):
@@ -50,14 +63,143 @@ def escape(text):
     text = text.replace('\n', '\\n')
     return text
 
-def compress(contents, request):
-    request.setHeader("content-encoding", "gzip")
-    compress = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS + 16,
+def gzip(contents, level=6):
+    compress = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS + 16,
         zlib.DEF_MEM_LEVEL,0)
     contents = compress.compress(contents)
     contents += compress.flush()
     return contents
 
+def compress(contents, request):
+    request.setHeader("content-encoding", "gzip")
+    return gzip(contents)
+
+class Asset(object):
+    """
+    A file served by the web server, along with its gzipped contents and the
+    headers needed for clients to cache it.
+    """
+
+    def __init__(self, data, mtime, mime_type, key=None):
+        self.data = data
+        self.gzipped = gzip(data, 9)
+        self.mtime = mtime
+        self.mime_type = mime_type
+        self.key = key
+        self.version = hashlib.sha1(data).hexdigest()
+        self.etag = '"%s"' % self.version
+        self.last_modified = http.datetimeToString(mtime)
+
+    def is_modified(self, request):
+        """
+        Checks the conditional headers of the request against the asset.
+        """
+        if request.getHeader("if-none-match"):
+            return request.setETag(self.etag) is not http.CACHED
+
+        since = request.getHeader("if-modified-since")
+        if since:
+            try:
+                since = http.stringToDatetime(since.split(";")[0])
+            except ValueError:
+                return True
+            if int(self.mtime) <= since:
+                request.setResponseCode(http.NOT_MODIFIED)
+                return False
+        return True
+
+    def render(self, request, max_age=0):
+        """
+        Writes the asset headers and returns the body for the request.
+
+        :param request: the request for the asset
+        :type request: twisted.web.server.Request
+        :param max_age: how long clients can cache the asset without asking
+            if it changed, when it wasn't requested with its version
+        :type max_age: int
+        """
+        if request.args.get("v", [None])[-1] == self.version:
+            max_age = VERSIONED_MAX_AGE
+        request.setHeader("content-type", self.mime_type)
+        request.setHeader("cache-control", "public, max-age=%d" % max_age)
+        request.setHeader("last-modified", self.last_modified)
+        request.setHeader("etag", self.etag)
+        request.setHeader("vary", "accept-encoding")
+
+        if not self.is_modified(request):
+            return ""
+
+        if "gzip" in (request.getHeader("accept-encoding") or ""):
+            request.setHeader("content-encoding", "gzip")
+            return self.gzipped
+        return self.data
+
+class AssetCache(object):
+    """
+    Keeps the files served by the web server in memory as Assets, so they are
+    only read and compressed again when their mtime or size changes.
+    """
+
+    def __init__(self):
+        self.__assets = {}
+
+    def get(self, path, mime_type=None):
+        """
+        Gets the asset for a file.
+
+        :param path: the path of the file
+        :type path: string
+        :param mime_type: the mime type, guessed from the path if None
+        :type mime_type: string
+        :returns: the asset or None if there is no such file
+        :rtype: Asset
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        key = (st.st_mtime, st.st_size)
+        asset = self.__assets.get(path)
+        if asset is None or asset.key != key:
+            if not mime_type:
+                mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            asset = Asset(open(path, "rb").read(), st.st_mtime, mime_type, key)
+            self.__assets[path] = asset
+        return asset
+
+    def get_bundle(self, name, paths, mime_type):
+        """
+        Gets the files joined together as a single asset.
+
+        :param name: the name of the bundle
+        :type name: string
+        :param paths: the paths of the files, in order
+        :type paths: list
+        :param mime_type: the mime type of the bundle
+        :type mime_type: string
+        :rtype: Asset
+        """
+        key = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError, e:
+                log.warning("Unable to add `%s` to %s: %s", path, name, e)
+                continue
+            key.append((path, st.st_mtime, st.st_size))
+        key = tuple(key)
+
+        asset = self.__assets.get(name)
+        if asset is None or asset.key != key:
+            data = "\n".join(open(path, "rb").read() for path, mtime, size in key)
+            mtime = max([mtime for path, mtime, size in key] or [0])
+            asset = Asset(data, mtime, mime_type, key)
+            self.__assets[name] = asset
+        return asset
+
 try:
     # This is beeing done like this in order to allow tests to use the above
     # `compress` without requiring Mako to be instaled
@@ -9178,7 +9178,14 @@ Deluge.Toolbar = Ext.extend(Ext.Toolbar, {
         return ids;
     },
 
-    update: function(torrents, wipe) {
+    /**
+     * Update the torrents in the grid.
+     * @param {Object} torrents The status of the torrents
+     * @param {Boolean} wipe Reload the whole grid
+     * @param {Array} removed When only the torrents that changed are
+     * given, the ids of the torrents to remove
+     */
+    update: function(torrents, wipe, removed) {
         var store = this.getStore();
 
         // Need to perform a complete reload of the torrent grid.
@@ -9212,12 +9219,20 @@ Deluge.Toolbar = Ext.extend(Ext.Toolbar, {
         store.add(newTorrents);
 
         // Remove any torrents that should not be in the store.
-        store.each(function(record) {
-            if (!torrents[record.id]) {
-                store.remove(record);
-                delete this.torrents[record.id];
-            }
-        }, this);
+        if (removed) {
+            Ext.each(removed, function(torrentId) {
+                var record = store.getById(torrentId);
+                if (record) store.remove(record);
+                delete this.torrents[torrentId];
+            }, this);
+        } else {
+            store.each(function(record) {
+                if (!torrents[record.id]) {
+                    store.remove(record);
+                    delete this.torrents[record.id];
+                }
+            }, this);
+        }
         store.commitChanges();
 
         var sortState = store.getSortState()
@@ -9381,7 +9396,13 @@ deluge.ui = {
         this.oldFilters = this.filters;
         this.filters = filters;
 
-        deluge.client.web.update_ui(Deluge.Keys.Grid, filters, {
+        // Only the changes since the last update are needed while the
+        // filters stay the same.
+        if (!Ext.areObjectsEqual(this.filters, this.oldFilters)) {
+            this.seq = null;
+        }
+
+        deluge.client.web.update_ui(Deluge.Keys.Grid, filters, this.seq, {
             success: this.onUpdate,
             failure: this.onUpdateError,
             scope: this
@@ -9437,11 +9458,14 @@ deluge.ui = {
                 ' U: ' + fsize_short(data['stats'].upload_rate, true) + ' - ' +
                 this.originalTitle;
         }
-        if (Ext.areObjectsEqual(this.filters, this.oldFilters)) {
+        if (data['delta']) {
+            deluge.torrents.update(data['torrents'], false, data['removed']);
+        } else if (Ext.areObjectsEqual(this.filters, this.oldFilters)) {
             deluge.torrents.update(data['torrents']);
         } else {
             deluge.torrents.update(data['torrents'], true);
         }
+        this.seq = data['seq'];
         deluge.statusbar.update(data['stats']);
         deluge.sidebar.update(data['filters']);
         this.errorCount = 0;
@@ -388,7 +388,14 @@
         return ids;
     },
 
-    update: function(torrents, wipe) {
+    /**
+     * Update the torrents in the grid.
+     * @param {Object} torrents The status of the torrents
+     * @param {Boolean} wipe Reload the whole grid
+     * @param {Array} removed When only the torrents that changed are
+     * given, the ids of the torrents to remove
+     */
+    update: function(torrents, wipe, removed) {
         var store = this.getStore();
 
         // Need to perform a complete reload of the torrent grid.
@@ -422,12 +429,20 @@
         store.add(newTorrents);
 
         // Remove any torrents that should not be in the store.
-        store.each(function(record) {
-            if (!torrents[record.id]) {
-                store.remove(record);
-                delete this.torrents[record.id];
-            }
-        }, this);
+        if (removed) {
+            Ext.each(removed, function(torrentId) {
+                var record = store.getById(torrentId);
+                if (record) store.remove(record);
+                delete this.torrents[torrentId];
+            }, this);
+        } else {
+            store.each(function(record) {
+                if (!torrents[record.id]) {
+                    store.remove(record);
+                    delete this.torrents[record.id];
+                }
+            }, this);
+        }
         store.commitChanges();
 
         var sortState = store.getSortState()
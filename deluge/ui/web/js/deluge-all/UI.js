@@ -133,7 +133,13 @@ deluge.ui = {
         this.oldFilters = this.filters;
         this.filters = filters;
 
-        deluge.client.web.update_ui(Deluge.Keys.Grid, filters, {
+        // Only the changes since the last update are needed while the
+        // filters stay the same.
+        if (!Ext.areObjectsEqual(this.filters, this.oldFilters)) {
+            this.seq = null;
+        }
+
+        deluge.client.web.update_ui(Deluge.Keys.Grid, filters, this.seq, {
             success: this.onUpdate,
             failure: this.onUpdateError,
             scope: this
@@ -189,11 +195,14 @@ deluge.ui = {
                 ' U: ' + fsize_short(data['stats'].upload_rate, true) + ' - ' +
                 this.originalTitle;
         }
-        if (Ext.areObjectsEqual(this.filters, this.oldFilters)) {
+        if (data['delta']) {
+            deluge.torrents.update(data['torrents'], false, data['removed']);
+        } else if (Ext.areObjectsEqual(this.filters, this.oldFilters)) {
             deluge.torrents.update(data['torrents']);
         } else {
             deluge.torrents.update(data['torrents'], true);
         }
+        this.seq = data['seq'];
         deluge.statusbar.update(data['stats']);
         deluge.sidebar.update(data['filters']);
         this.errorCount = 0;
@@ -35,17 +35,20 @@
 
 import os
 import time
+import zlib
 import base64
 import shutil
 import logging
 import hashlib
 import tempfile
+from collections import deque
 from urlparse import urljoin
 from urllib import unquote_plus
 
 from types import FunctionType
 from twisted.internet import reactor
-from twisted.internet.defer import Deferred, DeferredList
+from twisted.internet.defer import Deferred, DeferredList, maybeDeferred, succeed
+from twisted.internet.task import cooperate, TaskStopped
 from twisted.web import http, resource, server
 import twisted.web.client
 import twisted.web.error
@@ -65,6 +68,11 @@
 AUTH_LEVEL_DEFAULT = None
 AuthError = None
 
+# Responses with more items than this are encoded a piece at a time
+JSON_STREAM_ITEMS = 1000
+# The size of the pieces of a response that are compressed and written
+JSON_CHUNK_SIZE = 64 * 1024
+
 class JSONComponent(component.Component):
     def __init__(self, name, interval=1, depend=None):
         super(JSONComponent, self).__init__(name, interval, depend)
@@ -103,6 +111,116 @@ def __init__(self, inner_exception):
         self.inner_exception = inner_exception
         Exception.__init__(self, str(inner_exception))
 
+def count_items(obj, depth=3):
+    """
+    Counts the items of the dicts and lists in obj, up to `depth` levels deep.
+    """
+    if isinstance(obj, dict):
+        obj = obj.values()
+    elif not isinstance(obj, (list, tuple)):
+        return 0
+    count = len(obj)
+    if depth > 1:
+        for value in obj:
+            count += count_items(value, depth - 1)
+    return count
+
+def iter_json(obj):
+    """
+    Encodes obj as json a piece at a time.  The items of the dicts and lists
+    holding more than JSON_STREAM_ITEMS items are encoded separately, and
+    each of them is split the same way if it is large itself.
+    """
+    if isinstance(obj, dict) and count_items(obj) > JSON_STREAM_ITEMS:
+        yield "{"
+        first = True
+        for key, value in obj.iteritems():
+            if not first:
+                yield ", "
+            first = False
+            # json only has string keys
+            if not isinstance(key, basestring):
+                key = json.dumps(key)
+            yield json.dumps(key) + ": "
+            for piece in iter_json(value):
+                yield piece
+        yield "}"
+    elif isinstance(obj, (list, tuple)) and count_items(obj) > JSON_STREAM_ITEMS:
+        yield "["
+        first = True
+        for value in obj:
+            if not first:
+                yield ", "
+            first = False
+            for piece in iter_json(value):
+                yield piece
+        yield "]"
+    else:
+        yield json.dumps(obj)
+
+class JSONProducer(object):
+    """
+    Writes a large response to a request, encoding and compressing it a piece
+    at a time so the other requests are handled in the meantime.
+    """
+
+    def __init__(self, request, response):
+        self.request = request
+        self.response = response
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS + 16,
+            zlib.DEF_MEM_LEVEL, 0)
+        self.task = None
+        self.paused = False
+
+    def start(self):
+        self.request.setHeader("content-encoding", "gzip")
+        self.request.registerProducer(self, True)
+        self.task = cooperate(self._produce())
+        self.task.whenDone().addCallbacks(self._on_done, self._on_stopped)
+
+    def _write(self, data):
+        if data:
+            self.request.write(data)
+
+    def _produce(self):
+        pieces = []
+        size = 0
+        for piece in iter_json(self.response):
+            pieces.append(piece)
+            size += len(piece)
+            if size >= JSON_CHUNK_SIZE:
+                self._write(self.compressor.compress("".join(pieces)))
+                pieces = []
+                size = 0
+            yield None
+        self._write(self.compressor.compress("".join(pieces)) + self.compressor.flush())
+
+    def _on_done(self, result):
+        self.request.unregisterProducer()
+        self.request.finish()
+
+    def _on_stopped(self, reason):
+        if reason.check(TaskStopped):
+            # The connection was lost, there is no one to finish the request for
+            log.debug("Stopped sending the response")
+            return
+        log.error("Unable to send the response: %s", reason.getErrorMessage())
+        self.request.unregisterProducer()
+        self.request.finish()
+
+    def pauseProducing(self):
+        if not self.paused:
+            self.paused = True
+            self.task.pause()
+
+    def resumeProducing(self):
+        if self.paused:
+            self.paused = False
+            self.task.resume()
+
+    def stopProducing(self):
+        self.task.stop()
+
 class JSON(resource.Resource, component.Component):
     """
     A Twisted Web resource that exposes a JSON-RPC interface for web clients \
@@ -201,22 +319,38 @@ def _exec_remote(self, method, params, request):
     def _handle_request(self, request):
         """
         Takes some json data as a string and attempts to decode it, and process
-        the rpc object that should be contained, returning a deferred for all
-        procedure calls and the request id.
+        the rpc objects that should be contained, returning a deferred for the
+        response, or a list of responses for a batch of calls.
         """
         try:
             request.json = json.loads(request.json)
         except ValueError:
             raise JSONException("JSON not decodable")
 
-        if "method" not in request.json or "id" not in request.json or \
-           "params" not in request.json:
-            raise JSONException("Invalid JSON request")
+        if isinstance(request.json, list):
+            if not request.json:
+                raise JSONException("Invalid JSON request")
+            calls = [self._handle_call(call, request, batch=True)
+                     for call in request.json]
+            d = DeferredList(calls)
+            d.addCallback(lambda results: [response for success, response in results])
+            return d
+
+        return self._handle_call(request.json, request)
+
+    def _handle_call(self, call, request, batch=False):
+        """
+        Executes a single rpc call, returning a deferred for its response.
+        """
+        if not isinstance(call, dict) or "method" not in call or \
+           "id" not in call or "params" not in call:
+            if not batch:
+                raise JSONException("Invalid JSON request")
+            return succeed({"result": None, "id": None,
+                            "error": {"message": "Invalid JSON request", "code": 4}})
 
-        method, params = request.json["method"], request.json["params"]
-        request_id = request.json["id"]
-        result = None
-        error = None
+        method, params = call["method"], call["params"]
+        response = {"result": None, "error": None, "id": call["id"]}
 
         try:
             if method.startswith("system.") or method in self._local_methods:
@@ -224,30 +358,47 @@ def _handle_request(self, request):
             elif method in self._remote_methods:
                 result = self._exec_remote(method, params, request)
             else:
-                error = {"message": "Unknown method", "code": 2}
+                response["error"] = {"message": "Unknown method", "code": 2}
+                return succeed(response)
         except AuthError, e:
-            error = {"message": "Not authenticated", "code": 1}
+            response["error"] = {"message": "Not authenticated", "code": 1}
+            return succeed(response)
         except Exception, e:
             log.error("Error calling method `%s`", method)
             log.exception(e)
 
-            error = {"message": e.message, "code": 3}
+            response["error"] = {"message": e.message, "code": 3}
+            return succeed(response)
 
-        return request_id, result, error
+        d = maybeDeferred(lambda: result)
+        d.addCallback(self._on_rpc_request_finished, response)
+        if batch:
+            # A failed call in a batch doesn't fail the others
+            d.addErrback(self._on_batch_request_failed, response, method)
+        return d
 
-    def _on_rpc_request_finished(self, result, response, request):
+    def _on_rpc_request_finished(self, result, response):
         """
-        Sends the response of any rpc calls back to the json-rpc client.
+        Puts the result of an rpc call into its response.
         """
         response["result"] = result
-        return self._send_response(request, response)
+        return response
 
-    def _on_rpc_request_failed(self, reason, response, request):
+    def _on_batch_request_failed(self, reason, response, method):
+        """
+        Handles a failed rpc call in a batch by returning an error for it.
+        """
+        log.error("Error calling method `%s`: %s", method, reason.getErrorMessage())
+        response["error"] = {"message": reason.getErrorMessage(), "code": 3}
+        return response
+
+    def _on_rpc_request_failed(self, reason, request):
         """
         Handles any failures that occured while making an rpc call.
         """
+        log.debug("rpc request failed: %s", reason.getErrorMessage())
         request.setResponseCode(http.INTERNAL_SERVER_ERROR)
-        return ""
+        request.finish()
 
     def _on_json_request(self, request):
         """
@@ -255,16 +406,10 @@ def _on_json_request(self, request):
         _handle_request method for further processing.
         """
         log.debug("json-request: %s", request.json)
-        response = {"result": None, "error": None, "id": None}
-        response["id"], d, response["error"] = self._handle_request(request)
-
-        if isinstance(d, Deferred):
-            d.addCallback(self._on_rpc_request_finished, response, request)
-            d.addErrback(self._on_rpc_request_failed, response, request)
-            return d
-        else:
-            response["result"] = d
-            return self._send_response(request, response)
+        d = self._handle_request(request)
+        d.addCallback(self._send_response, request)
+        d.addErrback(self._on_rpc_request_failed, request)
+        return d
 
     def _on_json_request_failed(self, reason, request):
         """
@@ -274,10 +419,12 @@ def _on_json_request_failed(self, reason, request):
         request.setResponseCode(http.INTERNAL_SERVER_ERROR)
         return ""
 
-    def _send_response(self, request, response):
-        response = json.dumps(response)
+    def _send_response(self, response, request):
         request.setHeader("content-type", "application/x-json")
-        request.write(compress(response, request))
+        if count_items(response) > JSON_STREAM_ITEMS:
+            JSONProducer(request, response).start()
+            return
+        request.write(compress(json.dumps(response), request))
         request.finish()
 
     def render(self, request):
@@ -338,17 +485,253 @@ def register_object(self, obj, name=None):
 
 FILES_KEYS = ["files", "file_progress", "file_priorities"]
 
+# How long the information for update_ui is shared between requests
+SNAPSHOT_INTERVAL = 1.0
+# The number of snapshots a client can get the changes since
+SNAPSHOT_HISTORY = 30
+# How long a snapshot is kept when no client asks for it
+SNAPSHOT_TIMEOUT = 60
+
+# How long a request for events waits for one to come in
+LONG_POLL_TIMEOUT = 20
+# The most events kept for a listener that hasn't asked for them
+MAX_QUEUED_EVENTS = 1000
+# How long a listener is kept when it doesn't ask for events
+LISTENER_TIMEOUT = 120
+
+SESSION_STATUS_KEYS = [
+    "payload_download_rate",
+    "payload_upload_rate",
+    "download_rate",
+    "upload_rate",
+    "dht_nodes",
+    "has_incoming_connections"
+]
+
+class TorrentsSnapshot(object):
+    """
+    The status of the torrents for a set of keys and filter, along with which
+    torrents changed in the last snapshots, so a client only needs to be sent
+    the changes since the snapshot it already has.
+    """
+
+    def __init__(self):
+        self.seq = None
+        self.time = 0
+        self.last_used = time.time()
+        self.torrents = {}
+        # (seq, changed torrent_ids, removed torrent_ids) of each snapshot
+        self.changes = deque(maxlen=SNAPSHOT_HISTORY)
+        # The requests waiting on the status being fetched
+        self.waiting = None
+
+    def update(self, seq, torrents):
+        old_torrents = self.torrents
+        changed = set(torrent_id for torrent_id, status in torrents.iteritems()
+                      if old_torrents.get(torrent_id) != status)
+        removed = set(old_torrents).difference(torrents)
+        self.changes.append((seq, changed, removed))
+        self.torrents = torrents
+        self.seq = seq
+        self.time = time.time()
+
+    def get_changes(self, since):
+        """
+        Gets the torrents that changed since an earlier snapshot.
+
+        :param since: the seq of the earlier snapshot
+        :type since: int
+        :returns: the changed torrents status and the removed torrent_ids, or
+            None if the snapshot isn't known
+        :rtype: tuple
+        """
+        changed = set()
+        removed = set()
+        found = False
+        for seq, snapshot_changed, snapshot_removed in self.changes:
+            if found:
+                changed.update(snapshot_changed)
+                removed.update(snapshot_removed)
+            elif seq == since:
+                found = True
+        if not found:
+            return None
+
+        torrents = dict((torrent_id, self.torrents[torrent_id])
+                        for torrent_id in changed if torrent_id in self.torrents)
+        removed = [torrent_id for torrent_id in removed
+                   if torrent_id not in self.torrents]
+        return torrents, removed
+
+class UICache(object):
+    """
+    Shares the information gathered for update_ui between the clients asking
+    for it within SNAPSHOT_INTERVAL, so the daemon is queried once for them
+    all rather than once for each open web interface.
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.snapshots = {}
+        self.session_info = None
+        self.session_time = 0
+        self.session_waiting = None
+
+    def clear(self):
+        """
+        Forget the cached information, for when the daemon is disconnected.
+        """
+        self.snapshots = {}
+        self.session_info = None
+        self.session_time = 0
+
+    def _wait(self, waiting):
+        d = Deferred()
+        waiting.append(d)
+        return d
+
+    def _fire(self, waiting, result):
+        for d in waiting:
+            d.callback(result)
+
+    def get_session_info(self, download_location):
+        """
+        Gets the filter tree and the session stats.
+
+        :returns: {"filters": filter_tree, "stats": stats}, where a value is
+            missing if it couldn't be retrieved
+        :rtype: Deferred
+        """
+        if self.session_waiting is not None:
+            return self._wait(self.session_waiting)
+        if self.session_info and time.time() - self.session_time < SNAPSHOT_INTERVAL:
+            return succeed(self.session_info)
+
+        info = {"stats": {}}
+        self.session_waiting = []
+        d = self._wait(self.session_waiting)
+
+        def got_connections(connections):
+            info["stats"]["num_connections"] = connections
+
+        def got_stats(stats):
+            info["stats"]["upload_rate"] = stats["payload_upload_rate"]
+            info["stats"]["download_rate"] = stats["payload_download_rate"]
+            info["stats"]["download_protocol_rate"] = stats["download_rate"] - stats["payload_download_rate"]
+            info["stats"]["upload_protocol_rate"] = stats["upload_rate"] - stats["payload_upload_rate"]
+            info["stats"]["dht_nodes"] = stats["dht_nodes"]
+            info["stats"]["has_incoming_connections"] = stats["has_incoming_connections"]
+
+        def got_filters(filters):
+            info["filters"] = filters
+
+        def got_free_space(free_space):
+            info["stats"]["free_space"] = free_space
+
+        def on_complete(result):
+            self.session_info = info
+            self.session_time = time.time()
+            waiting, self.session_waiting = self.session_waiting, None
+            self._fire(waiting, info)
+
+        d1 = client.core.get_filter_tree()
+        d1.addCallback(got_filters)
+
+        d2 = client.core.get_session_status(SESSION_STATUS_KEYS)
+        d2.addCallback(got_stats)
+
+        d3 = client.core.get_num_connections()
+        d3.addCallback(got_connections)
+
+        d4 = client.core.get_free_space(download_location)
+        d4.addCallback(got_free_space)
+
+        dl = DeferredList([d1, d2, d3, d4], consumeErrors=True)
+        dl.addCallback(on_complete)
+        return d
+
+    def get_torrents(self, keys, filter_dict, since=None):
+        """
+        Gets the status of the torrents, or only of those that changed since
+        an earlier snapshot of the same keys and filter.
+
+        :param keys: the status keys
+        :type keys: list
+        :param filter_dict: the filter used to select the torrents
+        :type filter_dict: dict
+        :param since: the seq of the snapshot the client has
+        :type since: int
+        :returns: (seq, torrents, removed torrent_ids, is a delta), with
+            torrents None if the status couldn't be retrieved
+        :rtype: Deferred
+        """
+        now = time.time()
+        for snapshot_id, snapshot in self.snapshots.items():
+            if now - snapshot.last_used > SNAPSHOT_TIMEOUT and snapshot.waiting is None:
+                del self.snapshots[snapshot_id]
+
+        snapshot_id = (tuple(sorted(keys)), json.dumps(filter_dict, sort_keys=True))
+        snapshot = self.snapshots.get(snapshot_id)
+        if snapshot is None:
+            snapshot = self.snapshots[snapshot_id] = TorrentsSnapshot()
+        snapshot.last_used = now
+
+        def get_result(fetched):
+            if not fetched:
+                return (None, None, [], False)
+            if since is not None:
+                changes = snapshot.get_changes(since)
+                if changes is not None:
+                    return (snapshot.seq, changes[0], changes[1], True)
+            return (snapshot.seq, snapshot.torrents, [], False)
+
+        if snapshot.waiting is not None:
+            return self._wait(snapshot.waiting).addCallback(get_result)
+        if snapshot.seq is not None and now - snapshot.time < SNAPSHOT_INTERVAL:
+            return succeed(get_result(True))
+
+        snapshot.waiting = []
+        d = self._wait(snapshot.waiting).addCallback(get_result)
+
+        def on_status(torrents):
+            self.seq += 1
+            snapshot.update(self.seq, torrents)
+            return True
+
+        def on_status_failed(reason):
+            log.debug("Unable to get the torrents status: %s", reason.getErrorMessage())
+            return False
+
+        def on_complete(fetched):
+            waiting, snapshot.waiting = snapshot.waiting, None
+            self._fire(waiting, fetched)
+
+        status_d = component.get("SessionProxy").get_torrents_status(filter_dict, keys)
+        status_d.addCallbacks(on_status, on_status_failed)
+        status_d.addCallback(on_complete)
+        return d
+
 class EventQueue(object):
     """
     This class subscribes to events from the core and stores them until all
     the subscribed listeners have received the events.
+
+    A listener asking for events when it has none waits until one comes in,
+    or LONG_POLL_TIMEOUT passes.  Several requests of a listener, from the
+    tabs of a browser sharing a session, can wait at once and all of them get
+    the events.  At most MAX_QUEUED_EVENTS are kept for a listener, dropping
+    the oldest, and no events are kept for listeners that haven't asked for
+    events in LISTENER_TIMEOUT until they ask again.
     """
 
     def __init__(self):
         self.__events = {}
         self.__handlers = {}
         self.__queue = {}
+        # The waiting requests, {listener_id: {Deferred: timeout call}}
         self.__requests = {}
+        self.__last_seen = {}
+        self.__send_call = None
 
     def add_listener(self, listener_id, event):
         """
@@ -359,13 +742,11 @@ def add_listener(self, listener_id, event):
         :param event: The event name
         :type event: string
         """
+        self.__last_seen[listener_id] = time.time()
         if event not in self.__events:
 
             def on_event(*args):
-                for listener in self.__events[event]:
-                    if listener not in self.__queue:
-                        self.__queue[listener] = []
-                    self.__queue[listener].append((event, args))
+                self._queue_event(event, args)
 
             client.register_event_handler(event, on_event)
             self.__handlers[event] = on_event
@@ -373,6 +754,50 @@ def on_event(*args):
         elif listener_id not in self.__events[event]:
             self.__events[event].append(listener_id)
 
+    def _queue_event(self, event, args):
+        now = time.time()
+        for listener in self.__events[event]:
+            if listener not in self.__requests and \
+                    now - self.__last_seen.get(listener, 0) > LISTENER_TIMEOUT:
+                # Keep the subscriptions of an idle listener, but not its
+                # events, until it asks for events again
+                if self.__queue.pop(listener, None) is not None:
+                    log.debug("Dropping the events of the idle listener %s", listener)
+                continue
+            queue = self.__queue.get(listener)
+            if queue is None:
+                queue = self.__queue[listener] = deque(maxlen=MAX_QUEUED_EVENTS)
+            elif queue and queue[-1] == (event, args):
+                # The listener hasn't got the same event yet
+                continue
+            queue.append((event, args))
+
+        # Send the events to the waiting listeners once all the events of
+        # this reactor iteration are queued.
+        if self.__requests and self.__send_call is None:
+            self.__send_call = reactor.callLater(0, self._send_events)
+
+    def _send_events(self):
+        self.__send_call = None
+        for listener_id in self.__requests.keys():
+            if listener_id in self.__queue:
+                events = self._pop_queue(listener_id)
+                for d in self.__requests[listener_id].keys():
+                    self._finish_request(listener_id, d, events)
+
+    def _pop_queue(self, listener_id):
+        return list(self.__queue.pop(listener_id))
+
+    def _finish_request(self, listener_id, d, events):
+        requests = self.__requests[listener_id]
+        timeout_call = requests.pop(d)
+        if not requests:
+            del self.__requests[listener_id]
+        if timeout_call.active():
+            timeout_call.cancel()
+        self.__last_seen[listener_id] = time.time()
+        d.callback(events)
+
     def get_events(self, listener_id):
         """
         Retrieve the pending events for the listener.
@@ -380,45 +805,44 @@ def get_events(self, listener_id):
         :param listener_id: A unique id for the listener
         :type listener_id: string
         """
+        self.__last_seen[listener_id] = time.time()
 
         # Check to see if we have anything to return immediately
         if listener_id in self.__queue:
-            queue = self.__queue[listener_id]
-            del self.__queue[listener_id]
-            return queue
+            return self._pop_queue(listener_id)
 
-        # Create a deferred to and check again in 100ms
         d = Deferred()
-        reactor.callLater(0.1, self._get_events, listener_id, 0, d)
+        timeout_call = reactor.callLater(LONG_POLL_TIMEOUT,
+                                         self._finish_request, listener_id, d, [])
+        self.__requests.setdefault(listener_id, {})[d] = timeout_call
         return d
 
-    def _get_events(self, listener_id, count, d):
-        if listener_id in self.__queue:
-            queue = self.__queue[listener_id]
-            del self.__queue[listener_id]
-            d.callback(queue)
-        else:
-            # Prevent this loop going on indefinitely incase a client leaves
-            # the page or disconnects uncleanly.
-            if count >= 50:
-                d.callback(None)
-            else:
-                reactor.callLater(0.1, self._get_events, listener_id, count + 1, d)
-
-    def remove_listener(self, listener_id, event):
+    def remove_listener(self, listener_id, event=None):
         """
         Remove a listener from the event queue.
 
         :param listener_id: The unique id for the listener
         :type listener_id: string
-        :param event: The event name
+        :param event: The event name, if None the listener is removed from all
+            the events
         :type event: string
         """
-        self.__events[event].remove(listener_id)
-        if not self.__events[event]:
-            client.deregister_event_handler(event, self.__handlers[event])
-            del self.__events[event]
-            del self.__handlers[event]
+        if event is None:
+            events = [name for name, listeners in self.__events.items()
+                      if listener_id in listeners]
+            for d in self.__requests.get(listener_id, {}).keys():
+                self._finish_request(listener_id, d, [])
+            self.__queue.pop(listener_id, None)
+            self.__last_seen.pop(listener_id, None)
+        else:
+            events = [event]
+
+        for event in events:
+            self.__events[event].remove(listener_id)
+            if not self.__events[event]:
+                client.deregister_event_handler(event, self.__handlers[event])
+                del self.__events[event]
+                del self.__handlers[event]
 
 class WebApi(JSONComponent):
     """
@@ -432,6 +856,7 @@ def __init__(self):
         self.host_list = ConfigManager("hostlist.conf.1.2", DEFAULT_HOSTS)
         self.core_config = CoreConfig()
         self.event_queue = EventQueue()
+        self.ui_cache = UICache()
         try:
             self.sessionproxy = component.get("SessionProxy")
         except KeyError:
@@ -457,6 +882,7 @@ def start(self):
     def stop(self):
         self.core_config.stop()
         self.sessionproxy.stop()
+        self.ui_cache.clear()
 
     @export
     def connect(self, host_id):
@@ -495,14 +921,21 @@ def disconnect(self):
         return True
 
     @export
-    def update_ui(self, keys, filter_dict):
+    def update_ui(self, keys, filter_dict, since=None):
         """
         Gather the information required for updating the web interface.
 
+        The information is shared with the other clients asking for it at the
+        same time.  When `since` is the seq of an earlier response with the
+        same keys and filter only the torrents that changed are returned,
+        with delta set and the torrents no longer there in removed.
+
         :param keys: the information about the torrents to gather
         :type keys: list
         :param filter_dict: the filters to apply when selecting torrents.
         :type filter_dict: dictionary
+        :param since: the seq of the last update the client got
+        :type since: int
         :returns: The torrent and ui information.
         :rtype: dictionary
         """
@@ -511,6 +944,9 @@ def update_ui(self, keys, filter_dict):
             "connected": client.connected(),
             "torrents": None,
             "filters": None,
+            "seq": None,
+            "delta": False,
+            "removed": [],
             "stats": {
                 "max_download": self.core_config.get("max_download_speed"),
                 "max_upload": self.core_config.get("max_upload_speed"),
@@ -522,52 +958,23 @@ def update_ui(self, keys, filter_dict):
             d.callback(ui_info)
             return d
 
-        def got_connections(connections):
-            ui_info["stats"]["num_connections"] = connections
-
-        def got_stats(stats):
-            ui_info["stats"]["upload_rate"] = stats["payload_upload_rate"]
-            ui_info["stats"]["download_rate"] = stats["payload_download_rate"]
-            ui_info["stats"]["download_protocol_rate"] = stats["download_rate"] - stats["payload_download_rate"]
-            ui_info["stats"]["upload_protocol_rate"] = stats["upload_rate"] - stats["payload_upload_rate"]
-            ui_info["stats"]["dht_nodes"] = stats["dht_nodes"]
-            ui_info["stats"]["has_incoming_connections"] = stats["has_incoming_connections"]
-
-        def got_filters(filters):
-            ui_info["filters"] = filters
-
-        def got_free_space(free_space):
-            ui_info["stats"]["free_space"] = free_space
+        def got_session_info(info):
+            ui_info["filters"] = info.get("filters")
+            ui_info["stats"].update(info["stats"])
 
-        def got_torrents(torrents):
-            ui_info["torrents"] = torrents
+        def got_torrents(result):
+            ui_info["seq"], ui_info["torrents"], ui_info["removed"], ui_info["delta"] = result
 
         def on_complete(result):
             d.callback(ui_info)
 
-        d1 = component.get("SessionProxy").get_torrents_status(filter_dict, keys)
+        d1 = self.ui_cache.get_torrents(keys, filter_dict, since)
         d1.addCallback(got_torrents)
 
-        d2 = client.core.get_filter_tree()
-        d2.addCallback(got_filters)
-
-        d3 = client.core.get_session_status([
-            "payload_download_rate",
-            "payload_upload_rate",
-            "download_rate",
-            "upload_rate",
-            "dht_nodes",
-            "has_incoming_connections"
-        ])
-        d3.addCallback(got_stats)
-
-        d4 = client.core.get_num_connections()
-        d4.addCallback(got_connections)
-
-        d5 = client.core.get_free_space(self.core_config.get("download_location"))
-        d5.addCallback(got_free_space)
+        d2 = self.ui_cache.get_session_info(self.core_config.get("download_location"))
+        d2.addCallback(got_session_info)
 
-        dl = DeferredList([d1, d2, d3, d4, d5], consumeErrors=True)
+        dl = DeferredList([d1, d2], consumeErrors=True)
         dl.addCallback(on_complete)
         return d
 
@@ -41,7 +41,6 @@
 import hashlib
 import logging
 import tempfile
-import mimetypes
 
 from twisted.application import service, internet
 from twisted.internet import reactor, defer, error
@@ -53,7 +52,7 @@
 from deluge.ui import common as uicommon
 from deluge.ui.tracker_icons import TrackerIcons
 from deluge.ui.web.auth import Auth
-from deluge.ui.web.common import Template, compress
+from deluge.ui.web.common import AssetCache, Template, compress
 from deluge.ui.web.json_api import JSON, WebApi
 from deluge.ui.web.pluginmanager import PluginManager
 
@@ -91,6 +90,9 @@
     "show_session_speed", "base", "first_login"
 )
 
+# The name the normal scripts are served together as
+BUNDLE = "bundle.js"
+
 OLD_CONFIG_KEYS = (
     "port", "enabled_plugins", "base", "sidebar_show_zero",
     "sidebar_show_trackers", "show_keyword_search", "show_sidebar",
@@ -103,6 +105,9 @@ def rpath(*paths):
     """
     return common.resource_filename("deluge.ui.web", os.path.join(*paths))
 
+# The static files served
+assets = AssetCache()
+
 class GetText(resource.Resource):
     def render(self, request):
         request.setHeader("content-type", "text/javascript; encoding=utf-8")
@@ -204,16 +209,11 @@ def getChild(self, path, request):
         return self
 
     def render(self, request):
-        headers = {}
         path = ("data", "pixmaps", "flags", request.country.lower() + ".png")
         filename = common.resource_filename("deluge", os.path.join(*path))
-        if os.path.exists(filename):
-            request.setHeader("cache-control",
-                              "public, must-revalidate, max-age=86400")
-            request.setHeader("content-type", "image/png")
-            data = open(filename, "rb")
-            request.setResponseCode(http.OK)
-            return data.read()
+        asset = assets.get(filename, "image/png")
+        if asset:
+            return asset.render(request, 86400)
         else:
             request.setResponseCode(http.NOT_FOUND)
             return ""
@@ -254,12 +254,11 @@ def render(self, request):
 
         filename = os.path.basename(request.path)
         for directory in self.__paths[path]:
-            if os.path.join(directory, filename):
-                path = os.path.join(directory, filename)
+            path = os.path.join(directory, filename)
+            asset = assets.get(path)
+            if asset:
                 log.debug("Serving path: '%s'", path)
-                mime_type = mimetypes.guess_type(path)
-                request.setHeader("content-type", mime_type[0])
-                return compress(open(path, "rb").read(), request)
+                return asset.render(request)
 
         request.setResponseCode(http.NOT_FOUND)
         return "<h1>404 - Not Found</h1>"
@@ -283,6 +282,7 @@ def __init__(self):
                 "order": []
             }
         }
+        self.__scripts_cache = {}
 
     def add_script(self, path, filepath, type=None):
         """
@@ -300,6 +300,7 @@ def add_script(self, path, filepath, type=None):
 
         self.__scripts[type]["scripts"][path] = filepath
         self.__scripts[type]["order"].append(path)
+        self.__scripts_cache.pop(type, None)
 
     def add_script_folder(self, path, filepath, type=None, recurse=True):
         """
@@ -319,6 +320,7 @@ def add_script_folder(self, path, filepath, type=None, recurse=True):
 
         self.__scripts[type]["scripts"][path] = (filepath, recurse)
         self.__scripts[type]["order"].append(path)
+        self.__scripts_cache.pop(type, None)
 
     def remove_script(self, path, type=None):
         """
@@ -334,6 +336,7 @@ def remove_script(self, path, type=None):
 
         del self.__scripts[type]["scripts"][path]
         self.__scripts[type]["order"].remove(path)
+        self.__scripts_cache.pop(type, None)
 
     def get_scripts(self, type=None):
         """
@@ -347,6 +350,10 @@ def get_scripts(self, type=None):
         if type not in ("dev", "debug", "normal"):
             type = 'normal'
 
+        # The dev scripts are looked for each time, so new files are found
+        if type in self.__scripts_cache:
+            return list(self.__scripts_cache[type])
+
         _scripts = self.__scripts[type]["scripts"]
         _order = self.__scripts[type]["order"]
 
@@ -386,37 +393,78 @@ def get_scripts(self, type=None):
                     files = fnmatch.filter(os.listdir('.'), "*.js")
             else:
                 scripts.append("js/" + path)
+
+        if type != "dev":
+            self.__scripts_cache[type] = list(scripts)
         return scripts
 
-    def getChild(self, path, request):
-        if hasattr(request, "lookup_path"):
-            request.lookup_path += '/' + path
-        else:
-            request.lookup_path = path
-        return self
+    def get_script_urls(self, type=None):
+        """
+        Returns the urls of the scripts for producing script tags, with the
+        version of each script so browsers can cache them.  The normal
+        scripts are served together as a single bundle.
 
-    def render(self, request):
-        log.debug("Requested path: '%s'", request.lookup_path)
+        :keyword type: The type of scripts to get (dev, debug, normal)
+        :param type: string
+        """
+        if type not in ("dev", "debug"):
+            return ["js/%s?v=%s" % (BUNDLE, self.get_bundle().version)]
+
+        urls = []
+        for script in self.get_scripts(type):
+            asset = assets.get(self.find_script(script[3:]) or "")
+            if asset:
+                script += "?v=" + asset.version
+            urls.append(script)
+        return urls
+
+    def get_bundle(self):
+        """
+        Returns the normal scripts joined together as an Asset.
+        """
+        paths = [self.find_script(script[3:]) for script in self.get_scripts()]
+        return assets.get_bundle(BUNDLE, [path for path in paths if path],
+                                 "application/javascript")
+
+    def find_script(self, lookup_path):
+        """
+        Returns the physical location of a script, or None if it can't be
+        found.
 
+        :param lookup_path: The path of the script
+        :type lookup_path: string
+        """
         for type in ("dev", "debug", "normal"):
             scripts = self.__scripts[type]["scripts"]
             for pattern in scripts:
-                if not request.lookup_path.startswith(pattern):
+                if not lookup_path.startswith(pattern):
                     continue
 
                 filepath = scripts[pattern]
                 if isinstance(filepath, tuple):
                     filepath = filepath[0]
 
-                path = filepath + request.lookup_path[len(pattern):]
+                path = filepath + lookup_path[len(pattern):]
+                if os.path.isfile(path):
+                    return path
 
-                if not os.path.isfile(path):
-                    continue
+    def getChild(self, path, request):
+        if hasattr(request, "lookup_path"):
+            request.lookup_path += '/' + path
+        else:
+            request.lookup_path = path
+        return self
 
-                log.debug("Serving path: '%s'", path)
-                mime_type = mimetypes.guess_type(path)
-                request.setHeader("content-type", mime_type[0])
-                return compress(open(path, "rb").read(), request)
+    def render(self, request):
+        log.debug("Requested path: '%s'", request.lookup_path)
+
+        if request.lookup_path == BUNDLE:
+            return self.get_bundle().render(request)
+
+        path = self.find_script(request.lookup_path)
+        if path:
+            log.debug("Serving path: '%s'", path)
+            return assets.get(path).render(request)
 
         request.setResponseCode(http.NOT_FOUND)
         return "<h1>404 - Not Found</h1>"
@@ -546,7 +594,7 @@ def render(self, request):
         else:
             mode = None
 
-        scripts = component.get("Scripts").get_scripts(mode)
+        scripts = component.get("Scripts").get_script_urls(mode)
         scripts.insert(0, "gettext.js")
 
         template = Template(filename=rpath("index.html"))
@@ -665,6 +713,7 @@ def stop(self):
 
         self.plugins.disable_plugins()
         log.debug("Saving configuration file")
+        self.auth.save_sessions()
         self.config.save()
 
         if self.socket:
@@ -0,0 +1,38 @@
+"""
+Times receiving big messages in 1 KB parts with DelugeTransferProtocol, the
+time taken should grow linearly with the size of the message.  This is not
+part of the test suite, run it with:
+
+    python tests/benchmark_transfer.py
+
+"""
+import os
+import time
+
+from test_transfer import TransferTestClass
+
+# The message sizes in MB
+SIZES = (12.5, 25, 50)
+PACKET_SIZE = 1024
+
+def benchmark():
+    timings = []
+    for size in SIZES:
+        transfer = TransferTestClass()
+        # Random hex digits so the message doesn't compress to nothing
+        message = (os.urandom(int(size * 1024 * 1024) / 2).encode("hex"),)
+        transfer.transfer_message(message)
+        data = transfer.get_messages_out_joined()
+
+        start = time.time()
+        for offset in xrange(0, len(data), PACKET_SIZE):
+            transfer.dataReceived(data[offset:offset + PACKET_SIZE])
+        timings.append((size, time.time() - start))
+
+        assert transfer.get_messages_in() == [message]
+
+    print "Received in 1 KB parts: %s" % ", ".join(
+        "%g MB %.3fs" % timing for timing in timings)
+
+if __name__ == "__main__":
+    benchmark()
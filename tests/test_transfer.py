@@ -37,6 +37,7 @@
 
 from deluge.transfer import DelugeTransferProtocol
 
+import os
 import base64
 
 import deluge.rencode as rencode
@@ -323,6 +324,59 @@ def test_receive_middle_of_header(self):
         self.assertEquals(rencode.dumps(self.msg2), rencode.dumps(message2))
 
 
+    def test_send_uncompressed(self):
+        """
+        With no compression the messages are sent raw, and flagged so in the header.
+
+        """
+        self.transfer.set_compression("none")
+        self.transfer.transfer_message(self.msg2)
+        messages = self.transfer.get_messages_out_joined()
+        self.assertEquals(messages[0], "R")
+        self.assertEquals(messages[5:], rencode.dumps(self.msg2))
+
+        self.transfer.dataReceived(messages)
+        message = self.transfer.get_messages_in().pop(0)
+        self.assertEquals(rencode.dumps(self.msg2), rencode.dumps(message))
+
+    def test_send_compression_threshold(self):
+        """
+        Only messages at least as big as the threshold are compressed.
+
+        """
+        self.transfer.set_compression("fast", len(rencode.dumps(self.msg2)))
+        self.transfer.transfer_message(self.msg1)
+        self.transfer.transfer_message(self.msg2)
+        self.assertEquals([m[0] for m in self.transfer.messages_out], ["R", "D"])
+
+        for d in self.receive_parts_helper(self.transfer.get_messages_out_joined(), 7):
+            pass
+        message1 = self.transfer.get_messages_in().pop(0)
+        self.assertEquals(rencode.dumps(self.msg1), rencode.dumps(message1))
+        message2 = self.transfer.get_messages_in().pop(0)
+        self.assertEquals(rencode.dumps(self.msg2), rencode.dumps(message2))
+
+    def test_set_invalid_compression(self):
+        self.assertRaises(ValueError, self.transfer.set_compression, "best")
+
+    def test_receive_big_message_in_small_parts(self):
+        """
+        Receive a big message in 1 KB parts.
+
+        """
+        transfer = TransferTestClass()
+        # Random hex digits so the message doesn't compress to nothing
+        message = (os.urandom(512 * 1024).encode("hex"),)
+        transfer.transfer_message(message)
+        data = transfer.get_messages_out_joined()
+        packet_size = 1024
+
+        for offset in xrange(0, len(data), packet_size):
+            transfer.dataReceived(data[offset:offset + packet_size])
+
+        self.assertTrue(transfer.get_messages_in() == [message])
+        self.assertEquals(transfer._buffer, "")
+
     # Needs file containing big data structure e.g. like thetorrent list as it is transfered by the daemon
     #def test_simulate_big_transfer(self):
     #    filename = "../deluge.torrentlist"